@@ -0,0 +1,133 @@
+# core/blame.py
+# -*- coding: utf-8 -*-
+import sys
+import logging
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+class BlameCommit:
+    """blame 输出中的提交信息 (每个提交只在第一次出现时输出)"""
+    __slots__ = ("oid", "author", "author_time", "summary")
+
+    def __init__(self, oid: str):
+        self.oid = oid
+        self.author = ""
+        self.author_time = 0
+        self.summary = ""
+
+
+class BlameEntry:
+    """
+    一段来源相同的连续行: 最终文件中从 final_line 开始的 num_lines 行来自 commit 中的 orig_line 行。
+    previous 为该提交的父提交及文件在其中的路径，"追溯上一版本" 从那里继续。
+    """
+    __slots__ = ("commit", "orig_line", "final_line", "num_lines", "previous_oid", "previous_path", "filename")
+
+    def __init__(self, commit: BlameCommit, orig_line: int, final_line: int, num_lines: int):
+        self.commit = commit
+        self.orig_line = orig_line
+        self.final_line = final_line
+        self.num_lines = num_lines
+        self.previous_oid: Optional[str] = None
+        self.previous_path: Optional[str] = None
+        self.filename = ""
+
+
+class BlameParser:
+    """
+    解析 'git blame --incremental' 输出: 每条记录以 "<哈希> <原行号> <最终行号> <行数>" 开头，
+    之后是提交信息 (仅首次出现的提交) 和 previous，以 "filename" 行结束。输出可以分批喂入。
+    """
+
+    def __init__(self, commits: Dict[str, BlameCommit]):
+        self._commits = commits
+        self._current: Optional[BlameEntry] = None
+
+    def feed(self, lines: List[str]) -> List[BlameEntry]:
+        """喂入若干输出行，返回其中完整的记录"""
+        done: List[BlameEntry] = []
+        for line in lines:
+            entry = self._current
+            if entry is None:
+                parts = line.split(' ')
+                if len(parts) != 4:
+                    if line.strip():
+                        logging.warning(f"无法解析 blame 记录头: {repr(line[:120])}")
+                    continue
+                oid = parts[0]
+                try:
+                    orig_line, final_line, num_lines = int(parts[1]), int(parts[2]), int(parts[3])
+                except ValueError:
+                    logging.warning(f"无法解析 blame 记录头: {repr(line[:120])}")
+                    continue
+                commit = self._commits.get(oid)
+                if commit is None:
+                    commit = self._commits[oid] = BlameCommit(oid)
+                self._current = BlameEntry(commit, orig_line, final_line, num_lines)
+                continue
+
+            key, _, value = line.partition(' ')
+            if key == "filename":
+                entry.filename = value
+                done.append(entry)
+                self._current = None
+            elif key == "previous":
+                previous_oid, _, previous_path = value.partition(' ')
+                entry.previous_oid, entry.previous_path = previous_oid, previous_path
+            elif key == "author":
+                entry.commit.author = value
+            elif key == "author-time":
+                try:
+                    entry.commit.author_time = int(value)
+                except ValueError:
+                    pass
+            elif key == "summary":
+                entry.commit.summary = value
+        return done
+
+
+class BlameResult:
+    """一个文件在某个提交中的 blame 结果: 文件内容和每行所属的记录 (尚未确定的行为 -1)"""
+
+    def __init__(self, commit_oid: str, blob_oid: str, path: str, lines: List[str]):
+        self.commit_oid = commit_oid
+        self.blob_oid = blob_oid
+        self.path = path
+        self.lines = lines
+        self.commits: Dict[str, BlameCommit] = {}
+        self.entries: List[BlameEntry] = []
+        self._line_entry = array('i', [-1]) * len(lines)
+        self.assigned_lines = 0
+        self.complete = False
+
+    @property
+    def cache_key(self) -> Tuple[str, str, str]:
+        return (self.blob_oid, self.commit_oid, self.path)
+
+    def add_entry(self, entry: BlameEntry) -> Tuple[int, int]:
+        """记录一段行的来源，返回受影响的行范围 (从 0 开始，含两端)"""
+        index = len(self.entries)
+        self.entries.append(entry)
+        first = max(0, entry.final_line - 1)
+        last = min(len(self.lines), first + entry.num_lines) - 1
+        for row in range(first, last + 1):
+            if self._line_entry[row] < 0:
+                self.assigned_lines += 1
+            self._line_entry[row] = index
+        return first, last
+
+    def entry_at(self, row: int) -> Optional[BlameEntry]:
+        if 0 <= row < len(self._line_entry):
+            index = self._line_entry[row]
+            if index >= 0:
+                return self.entries[index]
+        return None
+
+    def row_for_line(self, line_number: int) -> int:
+        """文件行号 (从 1 开始) 转换为行索引"""
+        return max(0, min(len(self.lines) - 1, line_number - 1))
+
+    def estimated_size(self) -> int:
+        """LRU 缓存用的内存估算"""
+        return sum(sys.getsizeof(line) for line in self.lines) + len(self.entries) * 200 + len(self.commits) * 300
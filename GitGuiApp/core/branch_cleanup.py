@@ -0,0 +1,87 @@
+# core/branch_cleanup.py
+# -*- coding: utf-8 -*-
+import logging
+from typing import List, Optional, Set
+
+# 'git for-each-ref refs/heads' 的字段: 完整引用名、上游、上游状态 (gone 表示上游已删除)、最后提交时间、是否当前分支
+BRANCH_CLEANUP_FORMAT = "%(refname)%00%(upstream)%00%(upstream:track,nobracket)%00%(committerdate:unix)%00%(HEAD)"
+# 最后提交早于这么多天的未合并分支视为过期
+STALE_BRANCH_DAYS = 90
+
+CATEGORY_MERGED = "merged"
+CATEGORY_GONE = "gone"
+CATEGORY_STALE = "stale"
+CATEGORY_ACTIVE = "active"
+CATEGORY_TITLES = {
+    CATEGORY_MERGED: "已合并",
+    CATEGORY_GONE: "上游已删除",
+    CATEGORY_STALE: "过期",
+    CATEGORY_ACTIVE: "活跃",
+}
+
+
+class CleanupBranch:
+    """待清理分析的一个本地分支；category 由 classify_branches 填写，当前分支和基准分支不参与分类 (为 None)"""
+    __slots__ = ("name", "upstream", "upstream_gone", "committer_time", "is_current", "category")
+
+    def __init__(self, name: str, upstream: str, upstream_gone: bool, committer_time: int, is_current: bool):
+        self.name = name
+        self.upstream = upstream
+        self.upstream_gone = upstream_gone
+        self.committer_time = committer_time
+        self.is_current = is_current
+        self.category: Optional[str] = None
+
+    def age_days(self, now: float) -> int:
+        return max(0, int((now - self.committer_time) // 86400)) if self.committer_time else 0
+
+    def __repr__(self):
+        return f"CleanupBranch({self.name!r} {self.category})"
+
+
+def parse_cleanup_branches(output: str) -> List[CleanupBranch]:
+    """解析 BRANCH_CLEANUP_FORMAT 的输出"""
+    branches: List[CleanupBranch] = []
+    for line in output.split('\n'):
+        if not line:
+            continue
+        fields = line.split('\0')
+        if len(fields) < 5:
+            logging.warning(f"跳过无法识别的分支记录: {repr(line[:80])}")
+            continue
+        refname, upstream, track, date, head = fields[:5]
+        try:
+            committer_time = int(date)
+        except ValueError:
+            committer_time = 0
+        branches.append(CleanupBranch(refname[len("refs/heads/"):], upstream, track == "gone", committer_time, head == '*'))
+    return branches
+
+
+def parse_merged_branches(output: str) -> Set[str]:
+    """解析 'git for-each-ref --merged=<基准> --format=%(refname) refs/heads' 的输出，返回短分支名"""
+    return {line[len("refs/heads/"):] for line in output.split('\n') if line.startswith("refs/heads/")}
+
+
+def classify_branches(branches: List[CleanupBranch], merged: Set[str], base_branch: str, now: float,
+                      stale_days: int = STALE_BRANCH_DAYS):
+    """
+    按优先级分类: 已合并到基准 > 上游已删除 > 最后提交超过 stale_days 天 > 活跃。
+    当前分支和基准分支本身不能删除，不分类。
+    """
+    for branch in branches:
+        if branch.is_current or branch.name == base_branch:
+            branch.category = None
+        elif branch.name in merged:
+            branch.category = CATEGORY_MERGED
+        elif branch.upstream_gone:
+            branch.category = CATEGORY_GONE
+        elif branch.committer_time and branch.age_days(now) >= stale_days:
+            branch.category = CATEGORY_STALE
+        else:
+            branch.category = CATEGORY_ACTIVE
+
+
+def build_delete_command(names: List[str], force: bool = False) -> List[str]:
+    """一次删除多个本地分支的命令 ('--' 之后的名称不会被当作选项)"""
+    return ['git', 'branch', '-D' if force else '-d', '--'] + list(names)
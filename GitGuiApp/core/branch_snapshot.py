@@ -0,0 +1,192 @@
+# core/branch_snapshot.py
+# -*- coding: utf-8 -*-
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .lru_cache import LRUCache
+
+# 'git branch -a --format' (与 for-each-ref 相同的格式化) 的字段，以 NUL 分隔，每个引用一行
+BRANCH_SNAPSHOT_FORMAT = "%(HEAD)%00%(refname)%00%(objectname)%00%(upstream)%00%(committerdate:unix)"
+# 标签列表的字段: 附注标签另外给出它指向的提交 (%(*objectname))
+TAG_SNAPSHOT_FORMAT = "%(refname)%00%(objectname)%00%(*objectname)%00%(creatordate:unix)"
+# 领先/落后计数的格式: 'git for-each-ref' 只对给出的分支计算 %(upstream:track)
+BRANCH_TRACK_FORMAT = "%(refname)%00%(upstream:track,nobracket)"
+# 领先/落后计数缓存的容量 (按分支和上游的提交 id 缓存)
+BRANCH_TRACK_CACHE_BYTES = 2 * 1024 * 1024
+
+_TRACK_RE = re.compile(r'(ahead|behind) (\d+)')
+
+
+class BranchInfo:
+    """
+    分支快照中的一个分支 (或标签)。name 为显示和命令中使用的名称: 本地分支和标签为短名称，远程分支为 "remotes/<远程>/<分支>"，
+    分离头指针为 "(Detached HEAD at ...)"。ahead/behind 为相对上游的提交数，尚未计算或没有上游时为 None；
+    gone 表示配置了上游但上游分支已不存在。
+    """
+    __slots__ = ("name", "refname", "oid", "upstream", "upstream_oid", "committer_time", "is_current", "ahead", "behind", "gone")
+
+    def __init__(self, name: str, refname: str, oid: str, upstream: str, committer_time: int, is_current: bool):
+        self.name = name
+        self.refname = refname
+        self.oid = oid
+        self.upstream = upstream
+        self.upstream_oid = ""
+        self.committer_time = committer_time
+        self.is_current = is_current
+        self.ahead: Optional[int] = None
+        self.behind: Optional[int] = None
+        self.gone = False
+
+    @property
+    def is_remote(self) -> bool:
+        return self.refname.startswith("refs/remotes/")
+
+    @property
+    def is_tag(self) -> bool:
+        return self.refname.startswith("refs/tags/")
+
+    @property
+    def remote_name(self) -> str:
+        """远程分支所属的远程，其他分支为空"""
+        return self.refname.split('/', 3)[2] if self.is_remote else ""
+
+    @property
+    def short_name(self) -> str:
+        """在所属分组中显示的名称: 远程分支去掉 "remotes/<远程>/" 前缀"""
+        return self.name.split('/', 2)[2] if self.is_remote else self.name
+
+    @property
+    def is_detached(self) -> bool:
+        return not self.refname.startswith("refs/")
+
+    @property
+    def track_key(self) -> Optional[Tuple[str, str]]:
+        """领先/落后计数的缓存键: 两端的提交 id 不变，计数就不变"""
+        if not self.upstream or not self.upstream_oid:
+            return None
+        return self.oid, self.upstream_oid
+
+    def track_text(self) -> str:
+        """与上游的关系，如 "↑2 ↓1"；同步时为空"""
+        if self.gone:
+            return "上游已删除"
+        parts = []
+        if self.ahead:
+            parts.append(f"↑{self.ahead}")
+        if self.behind:
+            parts.append(f"↓{self.behind}")
+        return ' '.join(parts)
+
+    def __repr__(self):
+        return f"BranchInfo({self.name!r} {self.oid[:7]} ↑{self.ahead} ↓{self.behind})"
+
+
+def _display_name(refname: str) -> str:
+    if refname.startswith("refs/heads/"):
+        return refname[len("refs/heads/"):]
+    if refname.startswith("refs/remotes/"):
+        return "remotes/" + refname[len("refs/remotes/"):]
+    match = re.match(r'\(HEAD detached (?:at|from) (.*?)\)', refname)
+    if match:
+        return f"(Detached HEAD at {match.group(1)})"
+    return refname
+
+
+def parse_branch_snapshot(output: str) -> List[BranchInfo]:
+    """
+    解析 BRANCH_SNAPSHOT_FORMAT 的输出 (顺序保持不变)。远程的 HEAD 符号引用只是别名，跳过。
+    上游是快照中的分支时顺便填上它的提交 id；上游不在快照中 (已删除) 时 upstream_oid 为空。
+    """
+    branches: List[BranchInfo] = []
+    oids: Dict[str, str] = {}
+    for line in output.split('\n'):
+        if not line:
+            continue
+        fields = line.split('\0')
+        if len(fields) < 5:
+            logging.warning(f"跳过无法识别的分支记录: {repr(line[:80])}")
+            continue
+        head, refname, oid, upstream, date = fields[:5]
+        oids[refname] = oid
+        if refname.startswith("refs/remotes/") and refname.endswith("/HEAD"):
+            continue
+        try:
+            committer_time = int(date)
+        except ValueError:
+            committer_time = 0
+        branches.append(BranchInfo(_display_name(refname), refname, oid, upstream, committer_time, head == '*'))
+    for branch in branches:
+        if branch.upstream:
+            branch.upstream_oid = oids.get(branch.upstream, "")
+    return branches
+
+
+def parse_tag_snapshot(output: str) -> List[BranchInfo]:
+    """解析 TAG_SNAPSHOT_FORMAT 的输出，提交时间为标签的创建时间，oid 为标签最终指向的对象"""
+    tags: List[BranchInfo] = []
+    for line in output.split('\n'):
+        if not line:
+            continue
+        fields = line.split('\0')
+        if len(fields) < 4:
+            logging.warning(f"跳过无法识别的标签记录: {repr(line[:80])}")
+            continue
+        refname, oid, peeled_oid, date = fields[:4]
+        try:
+            created = int(date)
+        except ValueError:
+            created = 0
+        tags.append(BranchInfo(refname[len("refs/tags/"):], refname, peeled_oid or oid, "", created, False))
+    return tags
+
+
+def parse_track_output(output: str) -> Dict[str, Optional[Tuple[int, int]]]:
+    """解析 BRANCH_TRACK_FORMAT 的输出: {引用名: (领先, 落后)}，上游已删除的为 None"""
+    counts: Dict[str, Optional[Tuple[int, int]]] = {}
+    for line in output.split('\n'):
+        refname, _, track = line.partition('\0')
+        if not refname:
+            continue
+        if track == "gone":
+            counts[refname] = None
+            continue
+        values = {kind: int(number) for kind, number in _TRACK_RE.findall(track)}
+        counts[refname] = (values.get("ahead", 0), values.get("behind", 0))
+    return counts
+
+
+def apply_cached_track_counts(branches: List[BranchInfo], cache: LRUCache) -> List[BranchInfo]:
+    """
+    从缓存填上各分支的领先/落后计数，返回仍需计算的分支 (有上游且分支或上游的提交变化过)。
+    上游已删除的分支直接标记，不需要计算。
+    """
+    stale: List[BranchInfo] = []
+    for branch in branches:
+        if not branch.upstream or branch.is_remote:
+            continue
+        key = branch.track_key
+        if key is None:
+            branch.gone = True
+            continue
+        counts = cache.get(key)
+        if counts is None:
+            stale.append(branch)
+        else:
+            branch.ahead, branch.behind = counts
+    return stale
+
+
+def store_track_counts(branches: List[BranchInfo], counts: Dict[str, Optional[Tuple[int, int]]], cache: LRUCache):
+    """把计算出的计数填入分支并按两端提交 id 缓存"""
+    for branch in branches:
+        if branch.refname not in counts:
+            continue
+        value = counts[branch.refname]
+        if value is None:
+            branch.gone = True
+            continue
+        branch.ahead, branch.behind = value
+        key = branch.track_key
+        if key is not None:
+            cache.put(key, value)
@@ -0,0 +1,480 @@
+# core/commit_cache.py
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import hashlib
+import heapq
+import logging
+import time
+import appdirs
+from typing import Optional, List, Tuple, Iterable
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from .db_handler import APP_NAME, DB_DIR_NAME
+
+COMMIT_CACHE_DIR_NAME = "commits"
+COMMIT_CACHE_SCHEMA_VERSION = "3"
+# 缓存更新使用的 'git log' 格式: 不含 %ar 之类随时间变化的字段，结果可以长期保存。
+# 记录以 \x1e 开头，正文 (%b) 可能跨多行，直到下一个 \x1e 为止
+COMMIT_CACHE_RECORD_MARK = "\x1e"
+COMMIT_CACHE_LOG_FORMAT = "%x1e%H%x1f%P%x1f%an%x1f%at%x1f%ct%x1f%s%x1f%b"
+# 记住的已知提交顶端数量上限，作为下次增量更新的 '^known' 排除条件
+MAX_KNOWN_TIPS = 64
+
+# (oid, 父提交 oid 拼接, 作者, 作者时间, 提交时间, 标题)
+CachedCommit = Tuple[bytes, bytes, str, int, int, str]
+# 搜索结果: (oid, 作者, 提交时间, 标题)
+SearchHit = Tuple[bytes, str, int, str]
+SEARCH_RESULT_LIMIT = 200
+
+
+def commit_cache_path(repo_path: str) -> str:
+    """仓库对应的缓存数据库路径，与快捷键数据库同在用户数据目录下"""
+    key = hashlib.sha1(os.path.normcase(os.path.realpath(repo_path)).encode('utf-8')).hexdigest()
+    return os.path.join(appdirs.user_data_dir(APP_NAME), DB_DIR_NAME, COMMIT_CACHE_DIR_NAME, f"{key}.db")
+
+
+class CommitCache:
+    """
+    单个仓库的提交元数据缓存 (SQLite)。只保存不随时间变化的字段，
+    缓存中的提交集合对祖先关系封闭: 某个提交在缓存中，则它的全部祖先也在缓存中。
+    写入提交时同步维护搜索表 (标题、正文、作者)，供 search() 使用。
+    """
+
+    def __init__(self, repo_path: str, db_path: Optional[str] = None):
+        self.repo_path = repo_path
+        self.db_path = db_path or commit_cache_path(repo_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._fts = False
+        self._trigram = False
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            # 自动提交模式，更新时显式使用 BEGIN/COMMIT，使一次增量更新整体生效或整体回滚
+            self._conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+            logging.info(f"提交缓存已打开: {self.db_path} ({self.commit_count()} 个提交)")
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"打开提交缓存失败 ({self.db_path}): {e}")
+            self.close()
+
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"关闭提交缓存时出错: {e}")
+            self._conn = None
+
+    def _create_tables(self):
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row and row[0] != COMMIT_CACHE_SCHEMA_VERSION:
+                logging.warning(f"提交缓存版本 {row[0]} 与当前版本 {COMMIT_CACHE_SCHEMA_VERSION} 不符，重建缓存。")
+                self._conn.execute("DROP TABLE IF EXISTS commits")
+                self._conn.execute("DROP TABLE IF EXISTS tips")
+                self._conn.execute("DROP TABLE IF EXISTS commit_text")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS commits (
+                    id INTEGER PRIMARY KEY,
+                    oid BLOB UNIQUE NOT NULL,
+                    parents BLOB NOT NULL,
+                    author TEXT NOT NULL,
+                    author_time INTEGER NOT NULL,
+                    commit_time INTEGER NOT NULL,
+                    subject TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS tips (oid BLOB PRIMARY KEY, seen INTEGER NOT NULL)")
+            self._create_search_table()
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (COMMIT_CACHE_SCHEMA_VERSION,))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('repo_path', ?)", (self.repo_path,))
+            self._conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _create_search_table(self):
+        """
+        搜索表 commit_text 的 rowid 与 commits.id 相同。SQLite 支持 FTS5 时为全文索引: 优先使用 trigram 分词
+        (任意位置的子串匹配，中文标题中间的词也能搜到)，旧版 SQLite 没有 trigram 时使用 unicode61 和前缀索引。
+        不支持 FTS5 时退化为普通表，搜索时使用 LIKE 扫描。
+        """
+        row = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'commit_text'").fetchone()
+        if row:
+            sql = (row[0] or "").lower()
+            self._fts = "fts5" in sql
+            self._trigram = "trigram" in sql
+            return
+        for tokenize in ("tokenize='trigram'", "tokenize='unicode61', prefix='2 3'"):
+            try:
+                self._conn.execute(f"CREATE VIRTUAL TABLE commit_text USING fts5(author, subject, body, {tokenize})")
+                self._fts = True
+                self._trigram = "trigram" in tokenize
+                return
+            except sqlite3.OperationalError as e:
+                logging.warning(f"无法创建全文索引 ({tokenize}): {e}")
+        logging.warning("SQLite 不支持 FTS5，提交搜索将使用 LIKE 扫描。")
+        self._conn.execute(
+            "CREATE TABLE commit_text (rowid INTEGER PRIMARY KEY, author TEXT, subject TEXT, body TEXT)"
+        )
+        self._fts = False
+
+    # --- 查询 ---
+
+    def commit_count(self) -> int:
+        if not self._conn:
+            return 0
+        return self._conn.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    def is_empty(self) -> bool:
+        if not self._conn:
+            return True
+        return self._conn.execute("SELECT 1 FROM commits LIMIT 1").fetchone() is None
+
+    def get_commit(self, oid: bytes) -> Optional[CachedCommit]:
+        if not self._conn:
+            return None
+        row = self._conn.execute(
+            "SELECT oid, parents, author, author_time, commit_time, subject FROM commits WHERE oid = ?", (oid,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def missing_oids(self, oids: Iterable[str]) -> List[str]:
+        """返回不在缓存中的提交 (十六进制)"""
+        if not self._conn:
+            return list(oids)
+        keys = {}
+        for oid in oids:
+            try:
+                keys[oid] = bytes.fromhex(oid)
+            except ValueError:
+                continue
+        wanted = list(set(keys.values()))
+        found = set()
+        # SQLite 的参数个数有限制，分批查询
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            found.update(row[0] for row in self._conn.execute(f"SELECT oid FROM commits WHERE oid IN ({placeholders})", batch))
+        return [oid for oid, key in keys.items() if key not in found]
+
+    def known_tips(self) -> List[str]:
+        if not self._conn:
+            return []
+        rows = self._conn.execute("SELECT oid FROM tips ORDER BY seen DESC LIMIT ?", (MAX_KNOWN_TIPS,)).fetchall()
+        return [row[0].hex() for row in rows]
+
+    def search(self, text: str, limit: int = SEARCH_RESULT_LIMIT) -> List[SearchHit]:
+        """
+        在标题、正文和作者中搜索 (每个词都须出现；trigram 索引下按子串匹配，unicode61 下按词前缀匹配)；
+        只有一个十六进制词时同时按哈希前缀查找。结果按提交时间倒序。
+        """
+        terms = text.split()
+        if not self._conn or not terms:
+            return []
+        hits: List[SearchHit] = []
+        seen = set()
+        try:
+            if len(terms) == 1:
+                for hit in self._search_oid_prefix(terms[0], limit):
+                    hits.append(hit)
+                    seen.add(hit[0])
+            conditions, params = [], []
+            if self._fts:
+                match_terms = []
+                for term in terms:
+                    # trigram 索引只能匹配至少 3 个字符的词；unicode61 把连续的中文当作一个词，
+                    # 这些词改为在搜索表上逐行查找子串
+                    if len(term) < 3 if self._trigram else not term.isascii():
+                        conditions.append("(instr(lower(t.subject), ?) > 0 OR instr(lower(t.author), ?) > 0 "
+                                          "OR instr(lower(t.body), ?) > 0)")
+                        params.extend([term.lower()] * 3)
+                    else:
+                        match_terms.append(term)
+                if match_terms:
+                    suffix = "" if self._trigram else "*"
+                    conditions.insert(0, "commit_text MATCH ?")
+                    params.insert(0, " ".join('"' + term.replace('"', '""') + '"' + suffix for term in match_terms))
+            else:
+                for term in terms:
+                    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    conditions.append("(t.subject LIKE ? ESCAPE '\\' OR t.author LIKE ? ESCAPE '\\' OR t.body LIKE ? ESCAPE '\\')")
+                    params.extend([pattern, pattern, pattern])
+            rows = self._conn.execute(
+                "SELECT c.oid, c.author, c.commit_time, c.subject FROM commit_text t JOIN commits c ON c.id = t.rowid "
+                f"WHERE {' AND '.join(conditions)} ORDER BY c.commit_time DESC LIMIT ?", (*params, limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"搜索提交缓存失败 ({repr(text)}): {e}")
+            return hits
+        for row in rows:
+            if row[0] not in seen and len(hits) < limit:
+                hits.append(tuple(row))
+        return hits
+
+    def _search_oid_prefix(self, prefix: str, limit: int) -> List[SearchHit]:
+        """按哈希前缀查找: 在 oid 的唯一索引上做范围查询"""
+        prefix = prefix.lower()
+        if len(prefix) < 4 or any(ch not in "0123456789abcdef" for ch in prefix):
+            return []
+        even = prefix if len(prefix) % 2 == 0 else prefix + "0"
+        lower = bytes.fromhex(even)
+        upper_value = int(prefix, 16) + 1
+        if upper_value >= 16 ** len(prefix):
+            condition, params = "oid >= ?", (lower,)
+        else:
+            upper = f"{upper_value:0{len(prefix)}x}"
+            upper = upper if len(upper) % 2 == 0 else upper + "0"
+            condition, params = "oid >= ? AND oid < ?", (lower, bytes.fromhex(upper))
+        rows = self._conn.execute(
+            f"SELECT oid, author, commit_time, subject FROM commits WHERE {condition} ORDER BY commit_time DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    # --- 更新 ---
+
+    def begin_update(self) -> bool:
+        if not self._conn:
+            return False
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"开始提交缓存更新失败: {e}")
+            return False
+
+    def insert_log_records(self, records: List[str]) -> int:
+        """
+        在 begin_update() 开启的事务中写入 COMMIT_CACHE_LOG_FORMAT 格式的记录 (已去掉开头的 \x1e，正文行以换行连接)，
+        同时写入搜索表。返回新增的提交数。
+        """
+        if not self._conn:
+            return 0
+        inserted = 0
+        for record in records:
+            fields = record.split('\x1f', 6)
+            if len(fields) != 7:
+                if record.strip():
+                    logging.warning(f"无法解析提交缓存记录: {repr(record[:120])}")
+                continue
+            oid, parents, author, author_time, commit_time, subject, body = fields
+            try:
+                values = (
+                    bytes.fromhex(oid),
+                    b"".join(bytes.fromhex(p) for p in parents.split()),
+                    author,
+                    int(author_time or 0),
+                    int(commit_time or 0),
+                    subject,
+                )
+            except ValueError:
+                logging.warning(f"提交缓存记录包含无效字段: {repr(record[:120])}")
+                continue
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO commits (oid, parents, author, author_time, commit_time, subject) VALUES (?, ?, ?, ?, ?, ?)",
+                values
+            )
+            if cursor.rowcount > 0:
+                self._conn.execute(
+                    "INSERT INTO commit_text (rowid, author, subject, body) VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, author, subject, body.strip())
+                )
+                inserted += 1
+        return inserted
+
+    def commit_update(self, tips: Iterable[str]) -> bool:
+        """记录已完整缓存 (含全部祖先) 的提交顶端并提交事务，只保留最近的 MAX_KNOWN_TIPS 个顶端"""
+        if not self._conn:
+            return False
+        now = int(time.time())
+        try:
+            self._conn.executemany("INSERT OR REPLACE INTO tips (oid, seen) VALUES (?, ?)",
+                                   [(bytes.fromhex(t), now) for t in tips])
+            self._conn.execute(
+                "DELETE FROM tips WHERE oid NOT IN (SELECT oid FROM tips ORDER BY seen DESC LIMIT ?)", (MAX_KNOWN_TIPS,)
+            )
+            self._conn.execute("COMMIT")
+            return True
+        except (sqlite3.Error, ValueError) as e:
+            logging.error(f"提交缓存更新失败: {e}")
+            self.rollback_update()
+            return False
+
+    def rollback_update(self):
+        if self._conn and self._conn.in_transaction:
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error as e:
+                logging.error(f"回滚提交缓存更新失败: {e}")
+
+
+class CachedLogWalker:
+    """
+    从缓存中按提交时间倒序遍历历史 (与 'git log' 默认顺序相同: 子提交总在父提交之前)。
+    每次 next_page() 只读取需要的行，不会一次载入整个历史。
+    """
+
+    def __init__(self, cache: CommitCache, start_oids: List[str]):
+        self._cache = cache
+        self._heap: List[Tuple[int, int, CachedCommit]] = []
+        self._seen = set()
+        self._seq = 0
+        self.missing = 0
+        for oid in start_oids:
+            try:
+                self._push(bytes.fromhex(oid))
+            except ValueError:
+                logging.warning(f"忽略无效的起始提交: {repr(oid)}")
+
+    def _push(self, oid: bytes):
+        if oid in self._seen:
+            return
+        self._seen.add(oid)
+        record = self._cache.get_commit(oid)
+        if record is None:
+            self.missing += 1
+            return
+        heapq.heappush(self._heap, (-record[4], self._seq, record))
+        self._seq += 1
+
+    def exhausted(self) -> bool:
+        return not self._heap
+
+    def next_page(self, limit: int) -> List[CachedCommit]:
+        page: List[CachedCommit] = []
+        while self._heap and len(page) < limit:
+            _, _, record = heapq.heappop(self._heap)
+            page.append(record)
+            parents = record[1]
+            size = len(record[0])
+            for i in range(0, len(parents), size):
+                self._push(parents[i:i + size])
+        return page
+
+
+class CommitCacheUpdater(QObject):
+    """
+    增量更新提交缓存: 'git log --stdin' 读入 "新顶端" 与 "^已知顶端"，只输出缓存中没有的提交。
+    已知顶端包括当前引用中已在缓存里的提交，以及以前记录的顶端 (可能已被 gc 清理，
+    此时 git 报错退出 (错误信息可能被翻译，不依赖其内容)，改为只排除当前引用后重试一次)。
+    以低优先级分批读取，每批写入后让出事件循环再请求下一批。
+    整个更新在一个事务中进行，失败或取消时回滚，保证缓存对祖先关系封闭。
+    """
+    finished = pyqtSignal(bool, int)
+
+    def __init__(self, git_handler, cache: CommitCache, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._git_handler = git_handler
+        self._cache = cache
+        self._worker = None
+        self._generation = 0
+        self._tips: List[str] = []
+        self._missing: List[str] = []
+        self._present: List[str] = []
+        self._used_known = False
+        self._inserted = 0
+        self._partial: List[str] = []
+
+    def is_running(self) -> bool:
+        return self._worker is not None
+
+    def start(self, tips: List[str]) -> bool:
+        """开始更新，缓存无需更新或无法启动时返回 False"""
+        if self._worker is not None or not self._cache.is_open():
+            return False
+        missing = self._cache.missing_oids(tips)
+        if not missing:
+            return False
+        if not self._cache.begin_update():
+            return False
+        self._tips = list(tips)
+        self._missing = missing
+        self._present = [oid for oid in tips if oid not in missing]
+        self._inserted = 0
+        if not self._run_log(use_known=True):
+            self._cache.rollback_update()
+            return False
+        return True
+
+    def _run_log(self, use_known: bool) -> bool:
+        exclude = list(dict.fromkeys(self._present + (self._cache.known_tips() if use_known else [])))
+        self._used_known = use_known
+        self._partial = []
+        stdin_data = "".join(f"{oid}\n" for oid in self._missing) + "".join(f"^{oid}\n" for oid in exclude)
+        self._generation += 1
+        generation = self._generation
+        logging.info(f"增量更新提交缓存: {len(self._missing)} 个新顶端，排除 {len(exclude)} 个已知顶端。")
+        self._worker = self._git_handler.execute_streaming_async(
+            ['git', 'log', '--stdin', f'--format={COMMIT_CACHE_LOG_FORMAT}'],
+            lambda lines, g=generation: self._on_chunk(g, lines),
+            lambda rc, so, se, g=generation: self._on_finished(g, rc, se),
+            batch_lines=2000, pause_after_batch=True, low_priority=True, stdin_data=stdin_data
+        )
+        return self._worker is not None
+
+    def cancel(self):
+        if self._worker is not None:
+            self._generation += 1
+            self._worker.terminate()
+            self._worker = None
+            self._cache.rollback_update()
+
+    def _take_records(self, lines: list) -> List[str]:
+        """把输出行组合成完整的记录，最后一条记录可能还有后续正文行，留到下一批"""
+        records = []
+        for line in lines:
+            if line.startswith(COMMIT_CACHE_RECORD_MARK):
+                if self._partial:
+                    records.append("\n".join(self._partial))
+                self._partial = [line[1:]]
+            elif self._partial:
+                self._partial.append(line)
+        return records
+
+    def _insert_records(self, records: List[str]) -> bool:
+        try:
+            self._inserted += self._cache.insert_log_records(records)
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"写入提交缓存失败: {e}")
+            self.cancel()
+            self._cache.rollback_update()
+            self.finished.emit(False, 0)
+            return False
+
+    def _on_chunk(self, generation: int, lines: list):
+        if generation != self._generation:
+            return
+        if not self._insert_records(self._take_records(lines)):
+            return
+        worker = self._worker
+        if worker is not None:
+            QTimer.singleShot(0, lambda: worker.request_more())
+
+    def _on_finished(self, generation: int, return_code: int, stderr: str):
+        if generation != self._generation:
+            return
+        self._worker = None
+        if return_code != 0 and self._used_known:
+            logging.info(f"排除以前记录的提交顶端时失败 (可能已被清理)，只排除当前引用后重试: {stderr.strip()}")
+            if self._run_log(use_known=False):
+                return
+        if return_code == 0:
+            partial, self._partial = self._partial, []
+            if partial and not self._insert_records(["\n".join(partial)]):
+                return
+        if return_code == 0 and self._cache.commit_update(self._tips):
+            logging.info(f"提交缓存更新完成，新增 {self._inserted} 个提交。")
+            self.finished.emit(True, self._inserted)
+        else:
+            logging.warning(f"提交缓存更新失败 (RC={return_code}): {stderr.strip()}")
+            self._cache.rollback_update()
+            self.finished.emit(False, 0)
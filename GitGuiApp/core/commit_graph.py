@@ -0,0 +1,160 @@
+# core/commit_graph.py
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+# 一条连线: (起始列, 结束列, 颜色编号)
+GraphEdge = Tuple[int, int, int]
+
+
+class GraphRowLayout:
+    """一行的图形布局: 节点所在列、上半行连线 (行顶 -> 中线) 和下半行连线 (中线 -> 行底)"""
+    __slots__ = ("node", "color", "up", "down", "width", "is_merge")
+
+    def __init__(self, node: int, color: int, up: List[GraphEdge], down: List[GraphEdge], is_merge: bool):
+        self.node = node
+        self.color = color
+        self.up = up
+        self.down = down
+        self.is_merge = is_merge
+        width = node + 1
+        for a, b, _ in up:
+            width = max(width, a + 1, b + 1)
+        for a, b, _ in down:
+            width = max(width, a + 1, b + 1)
+        self.width = width
+
+
+class _LaneState:
+    """布局状态: 每列正在等待的提交哈希及其颜色"""
+    __slots__ = ("lanes", "colors", "next_color")
+
+    def __init__(self, lanes: Optional[List[Optional[str]]] = None, colors: Optional[List[int]] = None, next_color: int = 0):
+        self.lanes = lanes if lanes is not None else []
+        self.colors = colors if colors is not None else []
+        self.next_color = next_color
+
+    def copy(self) -> "_LaneState":
+        return _LaneState(list(self.lanes), list(self.colors), self.next_color)
+
+    def _free_slot(self) -> int:
+        for i, value in enumerate(self.lanes):
+            if value is None:
+                return i
+        self.lanes.append(None)
+        self.colors.append(0)
+        return len(self.lanes) - 1
+
+    def step(self, oid: str, parents: List[str]) -> GraphRowLayout:
+        lanes, colors = self.lanes, self.colors
+        hits = [i for i, value in enumerate(lanes) if value == oid]
+        if hits:
+            node = hits[0]
+            color = colors[node]
+        else:
+            # 分支顶端: 没有子提交在等待它
+            node = self._free_slot()
+            color = self.next_color
+            self.next_color += 1
+
+        up: List[GraphEdge] = []
+        for i, value in enumerate(lanes):
+            if value is None:
+                continue
+            up.append((i, node if value == oid else i, colors[i]))
+        for i in hits:
+            lanes[i] = None
+
+        down: List[GraphEdge] = []
+        touched = set()
+        if parents:
+            first = parents[0]
+            existing = next((i for i, value in enumerate(lanes) if value == first), None)
+            if existing is None:
+                lanes[node] = first
+                colors[node] = color
+                down.append((node, node, color))
+                touched.add(node)
+            else:
+                # 第一个父提交已有列在等待，汇入该列
+                down.append((node, existing, colors[existing]))
+            for parent in parents[1:]:
+                k = next((i for i, value in enumerate(lanes) if value == parent), None)
+                if k is None:
+                    k = self._free_slot()
+                    lanes[k] = parent
+                    colors[k] = self.next_color
+                    self.next_color += 1
+                    touched.add(k)
+                down.append((node, k, colors[k]))
+        for i, value in enumerate(lanes):
+            if value is not None and i not in touched:
+                down.append((i, i, colors[i]))
+
+        while lanes and lanes[-1] is None:
+            lanes.pop()
+            colors.pop()
+        return GraphRowLayout(node, color, up, down, len(parents) > 1)
+
+
+class CommitGraph:
+    """
+    增量的提交图列分配引擎，基于每个提交的父提交列表计算布局，不依赖 'git log --graph'。
+    只保存每隔 CHECKPOINT_INTERVAL 行的状态快照，绘制某行时从最近的快照重算，
+    近期计算过的行缓存在 LRU 中，内存占用与显示的行数相关而与历史的宽度无关。
+    """
+    CHECKPOINT_INTERVAL = 256
+    CACHE_ROWS = 4096
+
+    def __init__(self, oid_at: Callable[[int], str], parents_at: Callable[[int], List[str]], row_of: Callable[[str], Optional[int]]):
+        self._oid_at = oid_at
+        self._parents_at = parents_at
+        self._row_of = row_of
+        self.clear()
+
+    def clear(self):
+        self._state = _LaneState()
+        self._computed = 0
+        self._checkpoints: List[_LaneState] = []
+        self._cache: "OrderedDict[int, GraphRowLayout]" = OrderedDict()
+        self.max_width = 0
+
+    def __len__(self):
+        return self._computed
+
+    def _visible_parents(self, row: int) -> List[str]:
+        # 已经出现在更早行中的父提交不会再出现，不为它保留列 (输出顺序异常时避免连线永不结束)
+        parents = self._parents_at(row)
+        return [p for p in parents if (r := self._row_of(p)) is None or r > row]
+
+    def extend(self, row_count: int):
+        """布局新到达的行 (行号 < row_count)"""
+        while self._computed < row_count:
+            row = self._computed
+            if row % self.CHECKPOINT_INTERVAL == 0:
+                self._checkpoints.append(self._state.copy())
+            layout = self._state.step(self._oid_at(row), self._visible_parents(row))
+            self.max_width = max(self.max_width, layout.width)
+            self._remember(row, layout)
+            self._computed += 1
+
+    def row_layout(self, row: int) -> Optional[GraphRowLayout]:
+        if row < 0 or row >= self._computed:
+            return None
+        layout = self._cache.get(row)
+        if layout is not None:
+            self._cache.move_to_end(row)
+            return layout
+        checkpoint_index = row // self.CHECKPOINT_INTERVAL
+        state = self._checkpoints[checkpoint_index].copy()
+        start = checkpoint_index * self.CHECKPOINT_INTERVAL
+        for r in range(start, row + 1):
+            layout = state.step(self._oid_at(r), self._visible_parents(r))
+            self._remember(r, layout)
+        return layout
+
+    def _remember(self, row: int, layout: GraphRowLayout):
+        self._cache[row] = layout
+        self._cache.move_to_end(row)
+        while len(self._cache) > self.CACHE_ROWS:
+            self._cache.popitem(last=False)
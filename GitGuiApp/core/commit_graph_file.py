@@ -0,0 +1,59 @@
+# core/commit_graph_file.py
+# -*- coding: utf-8 -*-
+import os
+import struct
+import logging
+from typing import List, Optional, Set
+
+COMMIT_GRAPH_SIGNATURE = b"CGPH"
+# 路径变更 Bloom 过滤器所在的两个块 ('git commit-graph write --changed-paths' 写入)
+BLOOM_INDEX_CHUNK = b"BIDX"
+BLOOM_DATA_CHUNK = b"BDAT"
+
+
+def read_chunk_ids(graph_path: str) -> Optional[Set[bytes]]:
+    """读取 commit-graph 文件头和块目录，返回其中的块 ID；文件无效时返回 None"""
+    try:
+        with open(graph_path, 'rb') as f:
+            header = f.read(8)
+            if len(header) != 8 or header[:4] != COMMIT_GRAPH_SIGNATURE:
+                return None
+            chunk_count = header[6]
+            # 块目录: chunk_count + 1 项，每项 4 字节 ID + 8 字节偏移，最后一项 ID 为 0 作为结束标记
+            table = f.read(12 * (chunk_count + 1))
+    except OSError as e:
+        logging.debug(f"读取 commit-graph 失败 ({graph_path}): {e}")
+        return None
+    if len(table) != 12 * (chunk_count + 1):
+        return None
+    ids = set()
+    for i in range(chunk_count):
+        chunk_id, _offset = struct.unpack_from(">4sQ", table, i * 12)
+        ids.add(chunk_id)
+    return ids
+
+
+def commit_graph_files(objects_info_dir: str) -> List[str]:
+    """单文件 commit-graph 或分层 commit-graph 链中的全部文件"""
+    single = os.path.join(objects_info_dir, 'commit-graph')
+    if os.path.isfile(single):
+        return [single]
+    chain_dir = os.path.join(objects_info_dir, 'commit-graphs')
+    try:
+        with open(os.path.join(chain_dir, 'commit-graph-chain'), 'r', encoding='ascii') as f:
+            hashes = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return []
+    return [os.path.join(chain_dir, f"graph-{h}.graph") for h in hashes]
+
+
+def has_changed_path_filters(objects_info_dir: str) -> bool:
+    """commit-graph 是否 (在每一层都) 包含路径变更 Bloom 过滤器，有则 'git log -- <path>' 可以跳过大部分提交的树比较"""
+    files = commit_graph_files(objects_info_dir)
+    if not files:
+        return False
+    for path in files:
+        ids = read_chunk_ids(path)
+        if ids is None or BLOOM_INDEX_CHUNK not in ids or BLOOM_DATA_CHUNK not in ids:
+            return False
+    return True
@@ -0,0 +1,166 @@
+# core/commit_store.py
+# -*- coding: utf-8 -*-
+import logging
+from array import array
+from typing import Optional, Dict, List
+
+# 'git log' 记录格式: 字段之间以 \x1f 分隔，记录以 \x1e 开头
+LOG_RECORD_MARK = "\x1e"
+LOG_FIELD_SEP = "\x1f"
+LOG_PRETTY_FORMAT = "%x1e%H%x1f%P%x1f%an%x1f%at%x1f%D%x1f%s"
+
+
+class _StringTable:
+    """字符串驻留表，重复出现的字符串 (作者) 只保存一份，行内只保存编号"""
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self._strings)
+            self._strings.append(value)
+            self._index[value] = idx
+        return idx
+
+    def get(self, idx: int) -> str:
+        return self._strings[idx]
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class CommitStore:
+    """
+    紧凑的提交列表存储。每个字段保存在数组中而不是每行一个对象:
+    哈希以二进制保存，作者驻留，标题以 UTF-8 连续保存，引用装饰只对少数行存在。
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._oid_size = 0
+        self._oids = bytearray()
+        self._parent_offsets = array('I', [0])
+        self._parent_oids = bytearray()
+        self._author_ids = array('I')
+        self._authors = _StringTable()
+        self._timestamps = array('q')
+        self._subject_offsets = array('Q', [0])
+        self._subject_data = bytearray()
+        self._refs: Dict[int, str] = {}
+        self._row_by_oid: Dict[bytes, int] = {}
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def append(self, oid: str, parents: List[str], author: str, timestamp: int, refs: str, subject: str) -> Optional[int]:
+        """追加一个提交，返回行号；哈希无效或重复时返回 None"""
+        try:
+            oid_bytes = bytes.fromhex(oid)
+            parent_bytes = b"".join(bytes.fromhex(p) for p in parents)
+        except ValueError:
+            logging.warning(f"跳过哈希无效的提交: {repr(oid)} {parents}")
+            return None
+        return self.append_binary(oid_bytes, parent_bytes, author, timestamp, refs, subject)
+
+    def append_binary(self, oid: bytes, parents: bytes, author: str, timestamp: int, refs: str, subject: str) -> Optional[int]:
+        """与 append() 相同，哈希为二进制 (父提交哈希首尾相接)，供提交缓存直接使用"""
+        if not self._oid_size:
+            self._oid_size = len(oid)
+        if len(oid) != self._oid_size or oid in self._row_by_oid:
+            return None
+        row = len(self._timestamps)
+        self._oids += oid
+        self._parent_oids += parents
+        self._parent_offsets.append(len(self._parent_oids))
+        self._author_ids.append(self._authors.intern(author))
+        self._timestamps.append(timestamp)
+        self._subject_data += subject.encode('utf-8', 'replace')
+        self._subject_offsets.append(len(self._subject_data))
+        if refs:
+            self._refs[row] = refs
+        self._row_by_oid[oid] = row
+        return row
+
+    def append_log_line(self, line: str) -> Optional[int]:
+        """解析并追加一行 LOG_PRETTY_FORMAT 输出，非提交行返回 None"""
+        mark = line.find(LOG_RECORD_MARK)
+        if mark < 0:
+            return None
+        fields = line[mark + 1:].split(LOG_FIELD_SEP, 5)
+        if len(fields) != 6:
+            logging.warning(f"无法解析日志记录: {repr(line[:120])}")
+            return None
+        oid, parents, author, timestamp, refs, subject = fields
+        try:
+            ts = int(timestamp)
+        except ValueError:
+            ts = 0
+        return self.append(oid, parents.split(), author, ts, refs, subject)
+
+    def oid(self, row: int) -> str:
+        size = self._oid_size
+        return self._oids[row * size:(row + 1) * size].hex()
+
+    def short_oid(self, row: int, length: int = 7) -> str:
+        return self.oid(row)[:length]
+
+    def parents(self, row: int) -> List[str]:
+        size = self._oid_size
+        start, end = self._parent_offsets[row], self._parent_offsets[row + 1]
+        return [self._parent_oids[i:i + size].hex() for i in range(start, end, size)]
+
+    def author(self, row: int) -> str:
+        return self._authors.get(self._author_ids[row])
+
+    def timestamp(self, row: int) -> int:
+        return self._timestamps[row]
+
+    def subject(self, row: int) -> str:
+        return self._subject_data[self._subject_offsets[row]:self._subject_offsets[row + 1]].decode('utf-8', 'replace')
+
+    def refs(self, row: int) -> str:
+        return self._refs.get(row, "")
+
+    def row_of(self, oid: str) -> Optional[int]:
+        try:
+            return self._row_by_oid.get(bytes.fromhex(oid))
+        except ValueError:
+            return None
+
+
+def _plural(count: int, unit: str) -> str:
+    return f"{count} {unit}{'' if count == 1 else 's'}"
+
+
+def format_relative_date(timestamp: int, now: int) -> str:
+    """与 'git log --format=%ar' 相同的相对时间格式，在客户端计算以免为每行保存字符串"""
+    diff = now - timestamp
+    if diff < 0:
+        return "in the future"
+    if diff < 90:
+        return f"{_plural(diff, 'second')} ago"
+    diff = (diff + 30) // 60
+    if diff < 90:
+        return f"{_plural(diff, 'minute')} ago"
+    diff = (diff + 30) // 60
+    if diff < 36:
+        return f"{_plural(diff, 'hour')} ago"
+    diff = (diff + 12) // 24
+    if diff < 14:
+        return f"{_plural(diff, 'day')} ago"
+    if diff < 70:
+        return f"{_plural((diff + 3) // 7, 'week')} ago"
+    if diff < 365:
+        return f"{_plural((diff + 15) // 30, 'month')} ago"
+    if diff < 1825:
+        total_months = (diff * 12 * 2 + 365) // (365 * 2)
+        years, months = divmod(total_months, 12)
+        if months:
+            return f"{_plural(years, 'year')}, {_plural(months, 'month')} ago"
+        return f"{_plural(years, 'year')} ago"
+    return f"{_plural((diff + 183) // 365, 'year')} ago"
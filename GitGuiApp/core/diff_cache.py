@@ -0,0 +1,230 @@
+# core/diff_cache.py
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import logging
+import time
+import zlib
+import appdirs
+from typing import Optional, Dict, Iterable, List, Set, Tuple
+
+from .db_handler import APP_NAME, DB_DIR_NAME
+from .diff_parser import DiffFile, NULL_OID, split_patch_by_file
+
+DIFF_CACHE_FILE_NAME = "diff_cache.db"
+DIFF_CACHE_SCHEMA_VERSION = "2"
+DIFF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 压缩后超过该大小的补丁不缓存
+DIFF_CACHE_MAX_ENTRY_BYTES = 16 * 1024 * 1024
+# 补丁的生成选项，作为缓存键的一部分: 选项变化 (上下文行数、忽略空白等) 时不会取到旧结果
+PATCH_OPTIONS = "--no-ext-diff"
+
+
+def diff_cache_path() -> str:
+    return os.path.join(appdirs.user_data_dir(APP_NAME), DB_DIR_NAME, DIFF_CACHE_FILE_NAME)
+
+
+def diff_cache_key(diff_file: DiffFile, options: str = PATCH_OPTIONS) -> Optional[str]:
+    """
+    单个文件补丁的缓存键: 两侧文件模式和 blob id、路径和选项。这些相同则补丁相同 (模式变化会出现在补丁头部)，
+    与从哪个视图 (状态、提交、比较) 得到无关。
+    工作区一侧尚无 blob id (全零) 或文件未合并时返回 None。
+    """
+    if diff_file.status == 'U':
+        return None
+    if diff_file.new_oid == NULL_OID and diff_file.status != 'D':
+        return None
+    return '\0'.join((diff_file.old_mode, diff_file.new_mode, diff_file.old_oid, diff_file.new_oid,
+                      diff_file.old_path or '', diff_file.path, options))
+
+
+class DiffCache:
+    """
+    按 blob id 持久缓存单个文件的补丁 (SQLite，所有仓库共用)。
+    补丁压缩保存；总大小超过上限时按最近使用时间淘汰最旧的条目。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: int = DIFF_CACHE_MAX_BYTES):
+        self.db_path = db_path or diff_cache_path()
+        self._max_bytes = max_bytes
+        self._total_bytes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+            row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM patches").fetchone()
+            self._total_bytes = row[1]
+            logging.info(f"差异缓存已打开: {self.db_path} ({row[0]} 个补丁, {self._total_bytes // 1024} KB)")
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"打开差异缓存失败 ({self.db_path}): {e}")
+            self.close()
+
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error as e:
+                logging.error(f"关闭差异缓存时出错: {e}")
+            self._conn = None
+
+    def _create_tables(self):
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row and row[0] != DIFF_CACHE_SCHEMA_VERSION:
+                logging.warning(f"差异缓存版本 {row[0]} 与当前版本 {DIFF_CACHE_SCHEMA_VERSION} 不符，重建缓存。")
+                self._conn.execute("DROP TABLE IF EXISTS patches")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS patches (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS patches_last_used ON patches (last_used)")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (DIFF_CACHE_SCHEMA_VERSION,))
+            self._conn.execute("COMMIT")
+        except sqlite3.Error:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def get_many(self, keys: Iterable[Optional[str]]) -> Dict[str, str]:
+        """查询多个键，返回其中命中的 {键: 补丁}，并更新它们的使用时间"""
+        wanted = [key for key in set(keys) if key]
+        if self._conn is None or not wanted:
+            return {}
+        found: Dict[str, str] = {}
+        try:
+            # SQLite 的参数个数有限制，分批查询
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                for key, data in self._conn.execute(f"SELECT key, data FROM patches WHERE key IN ({placeholders})", batch):
+                    found[key] = zlib.decompress(data).decode('utf-8')
+            if found:
+                now = int(time.time())
+                self._conn.executemany("UPDATE patches SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        except (sqlite3.Error, zlib.error, UnicodeDecodeError) as e:
+            logging.error(f"读取差异缓存失败: {e}")
+        return found
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        return self.get_many([key]).get(key) if key else None
+
+    def missing(self, keys: Iterable[Optional[str]]) -> Set[str]:
+        """返回其中尚未缓存的键 (不读取内容)；键为 None 的忽略"""
+        wanted = [key for key in set(keys) if key]
+        if self._conn is None:
+            return set(wanted)
+        try:
+            found: Set[str] = set()
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                found.update(key for (key,) in self._conn.execute(f"SELECT key FROM patches WHERE key IN ({placeholders})", batch))
+            return set(wanted) - found
+        except sqlite3.Error as e:
+            logging.error(f"查询差异缓存失败: {e}")
+            return set(wanted)
+
+    def contains_all(self, keys: Iterable[Optional[str]]) -> bool:
+        """这些键是否都已缓存；有无法生成的键 (None) 时返回 False"""
+        key_list = list(keys)
+        if self._conn is None or not key_list or any(key is None for key in key_list):
+            return False
+        return not self.missing(key_list)
+
+    def put_many(self, items: List[Tuple[Optional[str], str]]):
+        """写入多个补丁 (键为 None 的跳过)，超过总大小上限时淘汰最久未使用的条目"""
+        if self._conn is None:
+            return
+        now = int(time.time())
+        rows = []
+        for key, patch in items:
+            if not key:
+                continue
+            data = zlib.compress(patch.encode('utf-8'), 1)
+            if len(data) > DIFF_CACHE_MAX_ENTRY_BYTES:
+                logging.debug(f"补丁过大 ({len(data)} 字节)，不放入差异缓存。")
+                continue
+            rows.append((key, data, len(data), now))
+        if not rows:
+            return
+        try:
+            self._conn.execute("BEGIN")
+            for key, data, size, last_used in rows:
+                old = self._conn.execute("SELECT size FROM patches WHERE key = ?", (key,)).fetchone()
+                if old:
+                    self._total_bytes -= old[0]
+                self._conn.execute("INSERT OR REPLACE INTO patches (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                                   (key, data, size, last_used))
+                self._total_bytes += size
+            self._conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logging.error(f"写入差异缓存失败: {e}")
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return
+        if self._total_bytes > self._max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # 淘汰到上限的 90%，避免每次写入都触发淘汰
+        target = int(self._max_bytes * 0.9)
+        try:
+            self._conn.execute("BEGIN")
+            while self._total_bytes > target:
+                rows = self._conn.execute("SELECT key, size FROM patches ORDER BY last_used LIMIT 200").fetchall()
+                if not rows:
+                    self._total_bytes = 0
+                    break
+                self._conn.executemany("DELETE FROM patches WHERE key = ?", [(key,) for key, _ in rows])
+                self._total_bytes -= sum(size for _, size in rows)
+            self._conn.execute("COMMIT")
+            logging.info(f"差异缓存已淘汰旧条目，当前 {self._total_bytes // 1024} KB。")
+        except sqlite3.Error as e:
+            logging.error(f"淘汰差异缓存条目失败: {e}")
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+def load_patches(cache: DiffCache, files: List[DiffFile], done, fetch):
+    """
+    按文件加载补丁: 先查差异缓存，未命中的文件调用 fetch(文件列表, 回调) 一次获取 (回调参数为 git 的返回码、输出、错误输出)，
+    结果按文件写入缓存。完成后调用 done({路径: 补丁}, "")，失败时 done(None, 错误信息)。
+    """
+    keys = {diff_file.path: diff_cache_key(diff_file) for diff_file in files}
+    cached = cache.get_many(keys.values())
+    patches = {path: cached[key] for path, key in keys.items() if key in cached}
+    missing = [diff_file for diff_file in files if diff_file.path not in patches]
+    if not missing:
+        logging.debug(f"{len(files)} 个文件的补丁全部来自差异缓存。")
+        done(patches, "")
+        return
+
+    def on_fetched(return_code: int, stdout: str, stderr: str):
+        if return_code != 0:
+            logging.error(f"获取 {len(missing)} 个文件的补丁失败: {stderr.strip()}")
+            done(None, stderr.strip())
+            return
+        fetched = split_patch_by_file(stdout, missing)
+        cache.put_many([(keys.get(path), patch) for path, patch in fetched.items()])
+        patches.update(fetched)
+        done(patches, "")
+
+    fetch(missing, on_fetched)
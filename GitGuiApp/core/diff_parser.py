@@ -0,0 +1,248 @@
+# core/diff_parser.py
+# -*- coding: utf-8 -*-
+import logging
+from typing import Optional, Dict, Tuple, List
+
+NULL_OID = "0" * 40
+
+
+class RawDiffEntry:
+    """'git diff --raw -z --no-abbrev' 输出中的一条记录"""
+    __slots__ = ("old_mode", "new_mode", "old_oid", "new_oid", "status", "path", "old_path")
+
+    def __init__(self, old_mode: str, new_mode: str, old_oid: str, new_oid: str, status: str, path: str, old_path: Optional[str] = None):
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.old_oid = old_oid
+        self.new_oid = new_oid
+        self.status = status
+        self.path = path
+        self.old_path = old_path
+
+    def __repr__(self):
+        return f"RawDiffEntry({self.status} {self.old_oid[:7]}..{self.new_oid[:7]} {self.path!r})"
+
+
+def parse_raw_z(output: str) -> List[RawDiffEntry]:
+    """
+    解析 'git diff --raw -z --no-abbrev' 的输出。
+    格式: ":old_mode new_mode old_oid new_oid STATUS\\0path\\0"，重命名/复制时为 "...R86\\0old\\0new\\0"
+    """
+    entries: List[RawDiffEntry] = []
+    tokens = output.split('\0')
+    i = 0
+    while i < len(tokens):
+        header = tokens[i]
+        i += 1
+        if not header:
+            continue
+        header = header.lstrip('\n')
+        if not header.startswith(':'):
+            logging.warning(f"跳过无法识别的 raw diff 记录: {repr(header[:80])}")
+            continue
+        fields = header[1:].split()
+        if len(fields) < 5:
+            logging.warning(f"raw diff 记录字段不足: {repr(header[:80])}")
+            continue
+        old_mode, new_mode, old_oid, new_oid, status = fields[:5]
+        if status[:1] in ('R', 'C'):
+            if i + 1 >= len(tokens):
+                logging.warning(f"重命名/复制记录缺少路径: {repr(header[:80])}")
+                break
+            old_path, new_path = tokens[i], tokens[i + 1]
+            i += 2
+            entries.append(RawDiffEntry(old_mode, new_mode, old_oid, new_oid, status[0], new_path, old_path))
+        else:
+            if i >= len(tokens):
+                logging.warning(f"raw diff 记录缺少路径: {repr(header[:80])}")
+                break
+            path = tokens[i]
+            i += 1
+            entries.append(RawDiffEntry(old_mode, new_mode, old_oid, new_oid, status[0], path))
+    return entries
+
+
+def parse_numstat_z(output: str) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """
+    解析 'git diff --numstat -z' 的输出，返回 {路径: (新增行数, 删除行数)}。
+    二进制文件的行数为 None。重命名记录为 "added\\tdeleted\\t\\0old\\0new\\0"，以新路径为键。
+    """
+    stats: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+    tokens = output.split('\0')
+    i = 0
+    while i < len(tokens):
+        record = tokens[i]
+        i += 1
+        if not record:
+            continue
+        record = record.lstrip('\n')
+        parts = record.split('\t', 2)
+        if len(parts) != 3:
+            logging.warning(f"跳过无法识别的 numstat 记录: {repr(record[:80])}")
+            continue
+        added_raw, removed_raw, path = parts
+        if not path:
+            # 重命名: 路径为空，随后是 old\0new\0
+            if i + 1 >= len(tokens):
+                break
+            path = tokens[i + 1]
+            i += 2
+        added = int(added_raw) if added_raw.isdigit() else None
+        removed = int(removed_raw) if removed_raw.isdigit() else None
+        stats[path] = (added, removed)
+    return stats
+
+
+_C_ESCAPES = {'a': 7, 'b': 8, 't': 9, 'n': 10, 'v': 11, 'f': 12, 'r': 13, '"': 34, '\\': 92}
+
+
+def unquote_git_path(path: str) -> str:
+    """
+    还原 git 输出中带引号的路径 (core.quotePath: 特殊字符和非 ASCII 字节写作 C 风格转义，如 "\\346\\226\\207.txt")。
+    未加引号的路径原样返回。
+    """
+    if len(path) < 2 or path[0] != '"' or path[-1] != '"':
+        return path
+    text = path[1:-1]
+    data = bytearray()
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch != '\\' or i + 1 >= len(text):
+            data.extend(ch.encode('utf-8'))
+            i += 1
+        elif text[i + 1] in _C_ESCAPES:
+            data.append(_C_ESCAPES[text[i + 1]])
+            i += 2
+        elif text[i + 1:i + 4].isdigit():
+            data.append(int(text[i + 1:i + 4], 8) & 0xFF)
+            i += 4
+        else:
+            data.extend(text[i + 1].encode('utf-8'))
+            i += 2
+    return data.decode('utf-8', errors='replace')
+
+
+def parse_name_status_line(line: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    解析 'git log --name-status' 的一行 ("M\\tpath"，重命名/复制为 "R100\\told\\tnew")，
+    返回 (状态, 路径列表)；不是文件记录的行返回 None。
+    """
+    fields = line.split('\t')
+    if len(fields) < 2 or not fields[0][:1].isalpha():
+        return None
+    return fields[0][:1], [unquote_git_path(field) for field in fields[1:]]
+
+
+def format_diffstat(added: Optional[int], removed: Optional[int]) -> str:
+    """将行数统计格式化为 '+a -d'，二进制文件显示为 'bin'"""
+    if added is None or removed is None:
+        return "bin"
+    return f"+{added} -{removed}"
+
+
+class DiffFile:
+    """差异中的一个文件: 状态、路径、文件模式、blob id 和行数统计 (二进制文件的行数为 None)"""
+    __slots__ = ("status", "path", "old_path", "old_oid", "new_oid", "old_mode", "new_mode", "added", "removed")
+
+    def __init__(self, status: str, path: str, old_path: Optional[str] = None,
+                 old_oid: str = NULL_OID, new_oid: str = NULL_OID, old_mode: str = "", new_mode: str = ""):
+        self.status = status
+        self.path = path
+        self.old_path = old_path
+        self.old_oid = old_oid
+        self.new_oid = new_oid
+        self.old_mode = old_mode
+        self.new_mode = new_mode
+        self.added: Optional[int] = None
+        self.removed: Optional[int] = None
+
+    @property
+    def is_binary(self) -> bool:
+        return self.added is None or self.removed is None
+
+    @property
+    def changed_lines(self) -> int:
+        return 0 if self.is_binary else self.added + self.removed
+
+    @property
+    def pathspecs(self) -> List[str]:
+        """获取该文件补丁时使用的路径: 重命名/复制需要同时给出旧路径，git 才能检测到"""
+        return [self.old_path, self.path] if self.old_path else [self.path]
+
+    @property
+    def display_path(self) -> str:
+        return f"{self.old_path} → {self.path}" if self.old_path else self.path
+
+    def __repr__(self):
+        return f"DiffFile({self.status} {self.display_path!r} {format_diffstat(self.added, self.removed)})"
+
+
+def parse_raw_numstat_z(output: str) -> List[DiffFile]:
+    """
+    解析 'git diff --raw --numstat -z --no-abbrev' 的输出: 先是全部 raw 记录，然后是 numstat 记录。
+    """
+    tokens = output.split('\0')
+    # raw 记录的头部以 ':' 开头，numstat 记录不会；路径可能含 ':'，所以按记录逐个跳过
+    i = 0
+    while i < len(tokens) and tokens[i].lstrip('\n').startswith(':'):
+        fields = tokens[i].lstrip('\n')[1:].split()
+        i += 3 if len(fields) >= 5 and fields[4][:1] in ('R', 'C') else 2
+    i = min(i, len(tokens))
+
+    files: List[DiffFile] = []
+    by_path: Dict[str, DiffFile] = {}
+    for entry in parse_raw_z('\0'.join(tokens[:i])):
+        diff_file = DiffFile(entry.status, entry.path, entry.old_path, entry.old_oid, entry.new_oid,
+                             entry.old_mode, entry.new_mode)
+        files.append(diff_file)
+        by_path[entry.path] = diff_file
+    for path, (added, removed) in parse_numstat_z('\0'.join(tokens[i:])).items():
+        diff_file = by_path.get(path)
+        if diff_file is None:
+            logging.warning(f"numstat 记录没有对应的 raw 记录: {path!r}")
+            continue
+        diff_file.added, diff_file.removed = added, removed
+    return files
+
+
+def split_commit_summary(output: str) -> Tuple[str, List[DiffFile]]:
+    """
+    拆分 'git show --raw --numstat -z' 的输出为提交头部文本和文件列表。
+    头部中的提交说明都有缩进，第一个以 ':' 开头的行就是第一条 raw 记录。
+    """
+    if output.startswith(':'):
+        return "", parse_raw_numstat_z(output)
+    index = output.find('\n:')
+    if index < 0:
+        return output.rstrip('\n'), []
+    return output[:index].rstrip('\n'), parse_raw_numstat_z(output[index + 1:])
+
+
+def split_patch_by_file(patch_text: str, files: List[DiffFile]) -> Dict[str, str]:
+    """
+    把多个文件的补丁按 "diff --git" 行拆开，返回 {路径: 补丁}。
+    git 按请求文件的列表顺序输出，数量一致时按顺序对应；否则按标题行中的新路径匹配。
+    """
+    sections: List[str] = []
+    lines = patch_text.split('\n')
+    start = None
+    for number, line in enumerate(lines):
+        if line.startswith(('diff --git ', 'diff --cc ', 'diff --combined ')):
+            if start is not None:
+                sections.append('\n'.join(lines[start:number]))
+            start = number
+    if start is not None:
+        sections.append('\n'.join(lines[start:]).rstrip('\n'))
+
+    if len(sections) == len(files):
+        return {diff_file.path: section for diff_file, section in zip(files, sections)}
+    logging.warning(f"补丁段数 ({len(sections)}) 与文件数 ({len(files)}) 不一致，按路径匹配。")
+    patches: Dict[str, str] = {}
+    for section in sections:
+        header = section.split('\n', 1)[0]
+        for diff_file in files:
+            if diff_file.path not in patches and header.endswith((f" b/{diff_file.path}", f" {diff_file.path}")):
+                patches[diff_file.path] = section
+                break
+    return patches
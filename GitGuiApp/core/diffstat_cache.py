@@ -0,0 +1,61 @@
+# core/diffstat_cache.py
+# -*- coding: utf-8 -*-
+import os
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple, Hashable
+
+from .diff_parser import NULL_OID, RawDiffEntry
+
+DiffStatValue = Tuple[Optional[int], Optional[int]]
+
+
+class DiffStatCache:
+    """
+    按 blob id 缓存 numstat 结果，内容未变的文件无需再次计算。
+    暂存区一侧的 blob id 由 'git diff --raw' 直接给出；工作区一侧没有 blob id，
+    以 (暂存区 blob id, 路径, mtime, 大小) 代替。
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, DiffStatValue]" = OrderedDict()
+
+    def make_key(self, entry: RawDiffEntry, repo_path: Optional[str]) -> Optional[Hashable]:
+        """为一条 raw diff 记录生成缓存键，无法可靠生成时返回 None"""
+        if entry.status == 'U':
+            return None
+        if entry.new_oid != NULL_OID:
+            return (entry.old_oid, entry.new_oid)
+        if entry.status == 'D':
+            return (entry.old_oid, NULL_OID)
+        if not repo_path:
+            return None
+        try:
+            st = os.stat(os.path.join(repo_path, entry.path))
+        except OSError:
+            return None
+        return (entry.old_oid, entry.path, st.st_mtime_ns, st.st_size)
+
+    def get(self, key: Optional[Hashable]) -> Optional[DiffStatValue]:
+        if key is None:
+            return None
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Optional[Hashable], value: DiffStatValue):
+        if key is None:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        logging.debug("DiffStat 缓存已清空。")
+
+    def __len__(self):
+        return len(self._entries)
@@ -4,17 +4,26 @@ import subprocess
 import os
 import sys
 import logging
+import threading
+import codecs
 from PyQt6.QtCore import QObject, pyqtSignal, QThread, pyqtSlot, QTimer
 from typing import Union, Optional, List
 
+from .commit_graph_file import commit_graph_files, has_changed_path_filters
+from .branch_snapshot import BRANCH_SNAPSHOT_FORMAT, BRANCH_TRACK_FORMAT, TAG_SNAPSHOT_FORMAT
+from .branch_cleanup import BRANCH_CLEANUP_FORMAT, build_delete_command
+from .push_utils import build_push_command
+
 class GitWorker(QObject):
     finished = pyqtSignal(int, str, str)
     progress = pyqtSignal(str)
 
-    def __init__(self, command_list: list, effective_cwd: Optional[str]):
+    def __init__(self, command_list: list, effective_cwd: Optional[str], low_priority: bool = False, stdin_data: Optional[str] = None):
         super().__init__()
         self.command_list = command_list
         self.effective_cwd = effective_cwd
+        self.low_priority = low_priority
+        self.stdin_data = stdin_data
         self.process: Optional[subprocess.Popen] = None
 
     def run(self):
@@ -38,24 +47,29 @@ class GitWorker(QObject):
             self.progress.emit(f"执行: {display_cmd[:100]}...")
 
             startupinfo = None
+            creationflags = 0
             if sys.platform == "win32":
                 startupinfo = subprocess.STARTUPINFO()
                 startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
                 startupinfo.wShowWindow = subprocess.SW_HIDE
+                if self.low_priority:
+                    creationflags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
 
             self.process = subprocess.Popen(
                 self.command_list,
                 cwd=popen_cwd,
+                stdin=subprocess.PIPE if self.stdin_data is not None else None,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
                 encoding='utf-8',
                 errors='replace',
                 startupinfo=startupinfo,
+                creationflags=creationflags,
                 shell=False
             )
 
-            stdout_full, stderr_full = self.process.communicate()
+            stdout_full, stderr_full = self.process.communicate(input=self.stdin_data)
             return_code = self.process.returncode
             self.process = None
 
@@ -90,11 +104,207 @@ class GitWorker(QObject):
             self.process = None
 
 
+class GitStreamWorker(QObject):
+    """
+    流式执行 Git 命令，按批次发出输出行。
+    pause_after_batch 为 True 时每批之后暂停读取，直到调用 request_more()；
+    未读取的输出留在管道中，git 进程随之阻塞，内存占用不会随输出总量增长。
+    emit_as_available 为 True 时不等凑满 batch_lines，每次读到数据就发出其中完整的行，
+    适合输出断断续续、需要尽快显示的命令 (如 git blame --incremental)。
+    """
+    chunk = pyqtSignal(list)
+    finished = pyqtSignal(int, str, str)
+    progress = pyqtSignal(str)
+
+    def __init__(self, command_list: list, effective_cwd: Optional[str], batch_lines: int = 500,
+                 pause_after_batch: bool = False, low_priority: bool = False, stdin_data: Optional[str] = None,
+                 emit_as_available: bool = False):
+        super().__init__()
+        self.command_list = command_list
+        self.effective_cwd = effective_cwd
+        self.stdin_data = stdin_data
+        self.batch_lines = max(1, batch_lines)
+        self.pause_after_batch = pause_after_batch
+        self.emit_as_available = emit_as_available
+        self.low_priority = low_priority
+        self.process: Optional[subprocess.Popen] = None
+        self._more = threading.Event()
+        self._cancelled = False
+
+    def request_more(self):
+        """允许读取下一批输出 (可在任意线程调用)"""
+        self._more.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def run(self):
+        stderr_parts: List[str] = []
+        return_code = -1
+        display_cmd = ' '.join(self.command_list)
+        line_count = 0
+
+        try:
+            popen_cwd = self.effective_cwd
+            if popen_cwd and not os.path.isdir(popen_cwd):
+                 logging.warning(f"工作目录无效 '{popen_cwd}'，在默认环境执行。")
+                 popen_cwd = None
+
+            logging.info(f"流式执行: {display_cmd}")
+            self.progress.emit(f"执行: {display_cmd[:100]}...")
+
+            startupinfo = None
+            creationflags = 0
+            if sys.platform == "win32":
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+                startupinfo.wShowWindow = subprocess.SW_HIDE
+                if self.low_priority:
+                    creationflags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+
+            self.process = subprocess.Popen(
+                self.command_list,
+                cwd=popen_cwd,
+                stdin=subprocess.PIPE if self.stdin_data is not None else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                startupinfo=startupinfo,
+                creationflags=creationflags,
+                shell=False
+            )
+            process = self.process
+            if self.stdin_data is not None:
+                # 需要 --stdin 的命令 (如 git log --stdin) 在读完输入后才开始输出，先写完再读取不会死锁
+                try:
+                    process.stdin.write(self.stdin_data)
+                    process.stdin.close()
+                except BrokenPipeError:
+                    logging.warning(f"进程提前关闭了标准输入: {display_cmd}")
+            # 暂停读取 stdout 期间 stderr 仍需持续读取，否则 git 可能因 stderr 管道写满而阻塞
+            stderr_reader = threading.Thread(target=lambda: stderr_parts.append(process.stderr.read()), daemon=True)
+            stderr_reader.start()
+
+            if self.emit_as_available:
+                line_count = self._read_as_available(process)
+            else:
+                batch: List[str] = []
+                for line in process.stdout:
+                    if self._cancelled:
+                        break
+                    batch.append(line.rstrip('\n'))
+                    if len(batch) >= self.batch_lines:
+                        line_count += len(batch)
+                        self._more.clear()
+                        self.chunk.emit(batch)
+                        batch = []
+                        if self.pause_after_batch:
+                            self._more.wait()
+                if batch and not self._cancelled:
+                    line_count += len(batch)
+                    self.chunk.emit(batch)
+
+            if self._cancelled and process.poll() is None:
+                process.terminate()
+            process.stdout.close()
+            return_code = process.wait()
+            stderr_reader.join(timeout=5)
+            self.process = None
+
+            if return_code == 0:
+                logging.info(f"流式命令完成，共 {line_count} 行: {display_cmd}")
+            elif not self._cancelled:
+                logging.warning(f"流式命令失败 (返回码 {return_code}): {display_cmd}\n标准错误: {''.join(stderr_parts).strip()}")
+
+        except FileNotFoundError:
+            stderr_parts = [f"错误: 命令 '{self.command_list[0]}' 未找到。请确保 Git 已安装并在系统 PATH 中。"]
+            logging.error(stderr_parts[0])
+            return_code = -1
+        except Exception as e:
+            stderr_parts = [f"执行命令时发生意外错误: {e}\n命令: {display_cmd}"]
+            logging.exception(f"流式执行命令时发生意外错误: {display_cmd}")
+            return_code = -2
+        finally:
+            self.finished.emit(return_code, "", ''.join(stderr_parts))
+
+    def _read_as_available(self, process: subprocess.Popen) -> int:
+        """直接读取底层字节流，每次读到数据就发出其中完整的行，返回发出的行数"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        raw = process.stdout.buffer
+        pending = ""
+        line_count = 0
+        while not self._cancelled:
+            data = raw.read1(65536)
+            if not data:
+                break
+            lines = (pending + decoder.decode(data)).split('\n')
+            pending = lines.pop()
+            if lines:
+                line_count += len(lines)
+                self.chunk.emit([line.rstrip('\r') for line in lines])
+        pending += decoder.decode(b"", final=True)
+        if pending and not self._cancelled:
+            line_count += 1
+            self.chunk.emit([pending.rstrip('\r')])
+        return line_count
+
+    def terminate(self):
+        self._cancelled = True
+        self._more.set()
+        process = self.process
+        if process and process.poll() is None:
+            logging.debug(f"终止流式进程: {' '.join(self.command_list)}")
+            try:
+                process.terminate()
+            except Exception as e:
+                logging.error(f"终止进程时出错: {e}")
+
+
+class _OperationRelay(QObject):
+    """
+    把工作线程发出的信号转发给调用方的回调。
+    PyQt 会在发送者所在的线程调用 lambda 之类的普通回调，而回调通常会操作界面，
+    因此信号先连接到本对象 (属于 GUI 线程) 的槽上，以排队方式回到 GUI 线程再调用回调。
+    """
+
+    def __init__(self, handler: 'GitHandler', thread: QThread, worker: QObject, finished_slot, progress_slot=None, chunk_slot=None):
+        super().__init__(handler)
+        self._handler = handler
+        self._thread = thread
+        self._worker = worker
+        self._finished_slot = finished_slot
+        self._progress_slot = progress_slot
+        self._chunk_slot = chunk_slot
+
+    @pyqtSlot(str)
+    def on_progress(self, message: str):
+        if self._progress_slot:
+            self._progress_slot(message)
+
+    @pyqtSlot(list)
+    def on_chunk(self, lines: list):
+        if self._chunk_slot:
+            self._chunk_slot(lines)
+
+    @pyqtSlot(int, str, str)
+    def on_finished(self, return_code: int, stdout: str, stderr: str):
+        try:
+            self._handler._on_worker_finished(self._thread, self._worker)
+            if self._finished_slot:
+                self._finished_slot(return_code, stdout, stderr)
+        finally:
+            self._worker = None
+
+
 class GitHandler(QObject):
     def __init__(self, repo_path: Optional[str] = None):
         super().__init__()
         self._repo_path: Optional[str] = None
-        self.active_operations: list[tuple[QThread, GitWorker]] = []
+        self._scope_pathspecs: List[str] = []
+        self.active_operations: list[tuple[QThread, Union[GitWorker, GitStreamWorker]]] = []
         self.set_repo_path(repo_path)
 
     def set_repo_path(self, path: Optional[str], check_valid=True):
@@ -105,10 +315,12 @@ class GitHandler(QObject):
                  logging.warning(f"设置的路径 '{self._repo_path}' 不是有效的 Git 仓库。")
             if old_path != self._repo_path:
                 logging.info(f"仓库路径设为: {self._repo_path}")
+                self._scope_pathspecs = []
         elif not path:
             if self._repo_path is not None:
                 logging.info("仓库路径已清除。")
             self._repo_path = None
+            self._scope_pathspecs = []
         else:
             logging.error(f"设置路径失败，无效目录: '{path}'")
             raise ValueError(f"路径 '{path}' 不是一个有效的目录。")
@@ -116,6 +328,22 @@ class GitHandler(QObject):
     def get_repo_path(self) -> Optional[str]:
         return self._repo_path
 
+    def set_scope(self, pathspecs: Optional[List[str]]):
+        """设置查询范围 (pathspec 列表)，状态、差异和日志查询只针对这些路径，空列表表示整个仓库"""
+        new_scope = [p for p in (pathspecs or []) if p]
+        if new_scope != self._scope_pathspecs:
+            logging.info(f"查询范围设为: {new_scope if new_scope else '(整个仓库)'}")
+        self._scope_pathspecs = new_scope
+
+    def get_scope(self) -> List[str]:
+        return list(self._scope_pathspecs)
+
+    def _with_scope(self, cmd: list) -> list:
+        # 已显式指定路径 ('--' 之后) 的命令不再追加范围
+        if not self._scope_pathspecs or '--' in cmd:
+            return cmd
+        return cmd + ['--'] + self._scope_pathspecs
+
     def is_valid_repo(self) -> bool:
         if not self._repo_path:
             return False
@@ -124,6 +352,23 @@ class GitHandler(QObject):
         git_dir = os.path.join(self._repo_path, '.git')
         return os.path.isdir(git_dir)
 
+    def has_commit_graph(self) -> bool:
+        """仓库是否有 commit-graph 文件 (有则 --topo-order 可以增量输出，无需先遍历全部历史)"""
+        if not self.is_valid_repo():
+            return False
+        return bool(commit_graph_files(os.path.join(self._repo_path, '.git', 'objects', 'info')))
+
+    def has_changed_path_filters(self) -> bool:
+        """commit-graph 是否包含路径变更 Bloom 过滤器 (按路径查询历史时可跳过大部分提交)"""
+        if not self.is_valid_repo():
+            return False
+        return has_changed_path_filters(os.path.join(self._repo_path, '.git', 'objects', 'info'))
+
+    def write_commit_graph_async(self, finished_slot, progress_slot=None):
+        """写入包含全部可达提交和路径变更 Bloom 过滤器的 commit-graph"""
+        cmd = ['git', 'commit-graph', 'write', '--reachable', '--changed-paths']
+        self.execute_command_async(cmd, finished_slot, progress_slot)
+
     @pyqtSlot(QThread, GitWorker)
     def _on_worker_finished(self, thread: QThread, worker: GitWorker):
         op_tuple = (thread, worker)
@@ -137,7 +382,8 @@ class GitHandler(QObject):
             logging.warning(f"完成的操作未在活动列表中找到: {' '.join(worker.command_list)}")
 
     def get_active_process_count(self) -> int:
-        return len(self.active_operations)
+        # 已请求终止的流式读取正在退出，不再计入
+        return sum(1 for _, worker in self.active_operations if not getattr(worker, 'cancelled', False))
 
     def terminate_all_processes(self):
         logging.warning(f"请求终止 {len(self.active_operations)} 个活动操作...")
@@ -151,12 +397,13 @@ class GitHandler(QObject):
                 logging.error(f"终止操作 '{' '.join(worker.command_list)}' 时出错: {e}")
         logging.warning(f"已尝试终止 {terminated_count} 个进程。")
 
-    def execute_command_async(self, command: list, finished_slot, progress_slot=None, cwd: Optional[str] = None):
+    def _resolve_async_cwd(self, command: list, cwd: Optional[str], finished_slot) -> tuple[bool, Optional[str]]:
+        """检查异步命令能否执行并确定工作目录；不能执行时已通过 finished_slot 报告错误"""
         if not command:
             logging.error("尝试执行空命令列表。")
             if finished_slot:
                 QTimer.singleShot(0, lambda: finished_slot(-10, "", "错误：尝试执行空命令。"))
-            return
+            return False, None
 
         effective_cwd = cwd
         is_global_cmd = command[0].lower() == 'git' and '--global' in command
@@ -176,29 +423,54 @@ class GitHandler(QObject):
             logging.warning(f"阻止执行 '{' '.join(command)}'，因为仓库无效: {self._repo_path}")
             if finished_slot:
                 QTimer.singleShot(0, lambda: finished_slot(-3, "", error_msg))
-            return
+            return False, None
+        return True, effective_cwd
 
+    def _start_operation(self, worker: Union[GitWorker, GitStreamWorker], finished_slot, progress_slot=None, chunk_slot=None, low_priority: bool = False):
         thread = QThread()
-        worker = GitWorker(command, effective_cwd)
         worker.moveToThread(thread)
 
         op_tuple = (thread, worker)
-        worker.finished.connect(lambda rc, so, se, t=thread, w=worker: self._on_worker_finished(t, w))
-
-        if finished_slot:
-            worker.finished.connect(finished_slot)
-        if progress_slot:
-            worker.progress.connect(progress_slot)
+        relay = _OperationRelay(self, thread, worker, finished_slot, progress_slot, chunk_slot)
+        worker.finished.connect(relay.on_finished)
+        worker.progress.connect(relay.on_progress)
+        if isinstance(worker, GitStreamWorker):
+            worker.chunk.connect(relay.on_chunk)
 
         worker.finished.connect(thread.quit)
         worker.finished.connect(worker.deleteLater)
         thread.finished.connect(thread.deleteLater)
+        # 转发对象持有线程的引用，线程真正结束后才释放
+        thread.finished.connect(relay.deleteLater)
 
         thread.started.connect(worker.run)
 
         self.active_operations.append(op_tuple)
-        logging.debug(f"开始异步操作: {' '.join(command)}. 活动计数: {len(self.active_operations)}")
-        thread.start()
+        logging.debug(f"开始异步操作: {' '.join(worker.command_list)}. 活动计数: {len(self.active_operations)}")
+        if low_priority:
+            thread.start(QThread.Priority.LowPriority)
+        else:
+            thread.start()
+
+    def execute_command_async(self, command: list, finished_slot, progress_slot=None, cwd: Optional[str] = None, low_priority: bool = False,
+                              stdin_data: Optional[str] = None):
+        ok, effective_cwd = self._resolve_async_cwd(command, cwd, finished_slot)
+        if not ok:
+            return
+        worker = GitWorker(command, effective_cwd, low_priority=low_priority, stdin_data=stdin_data)
+        self._start_operation(worker, finished_slot, progress_slot, low_priority=low_priority)
+
+    def execute_streaming_async(self, command: list, chunk_slot, finished_slot, progress_slot=None, batch_lines: int = 500,
+                                pause_after_batch: bool = False, cwd: Optional[str] = None, low_priority: bool = False,
+                                stdin_data: Optional[str] = None, emit_as_available: bool = False) -> Optional[GitStreamWorker]:
+        """流式执行命令，输出行按批次交给 chunk_slot；返回工作对象以便调用 request_more()/terminate()"""
+        ok, effective_cwd = self._resolve_async_cwd(command, cwd, finished_slot)
+        if not ok:
+            return None
+        worker = GitStreamWorker(command, effective_cwd, batch_lines=batch_lines, pause_after_batch=pause_after_batch,
+                                 low_priority=low_priority, stdin_data=stdin_data, emit_as_available=emit_as_available)
+        self._start_operation(worker, finished_slot, progress_slot, chunk_slot, low_priority=low_priority)
+        return worker
 
 
     def execute_command_sync(self, command: list) -> subprocess.CompletedProcess:
@@ -267,22 +539,186 @@ class GitHandler(QObject):
             return subprocess.CompletedProcess(command, -2, "", error_msg)
 
     def get_status_porcelain_async(self, finished_slot, progress_slot=None):
-        self.execute_command_async(['git', 'status', '--porcelain=v1', '--untracked-files=all'], finished_slot, progress_slot)
-
-    def get_branches_formatted_async(self, finished_slot, progress_slot=None):
-        cmd = ['git', 'branch', '-a', '--format=%(HEAD) %(refname:short)', '--sort=-committerdate']
+        cmd = ['git', 'status', '--porcelain=v1', '--untracked-files=all']
+        self.execute_command_async(self._with_scope(cmd), finished_slot, progress_slot)
+
+    def get_branch_snapshot_async(self, finished_slot, progress_slot=None):
+        """
+        一次列出全部本地和远程分支: 是否当前、完整引用名、提交 id、上游和提交时间 (见 BRANCH_SNAPSHOT_FORMAT)。
+        用 'git branch -a' 而不是 for-each-ref，分离头指针时也有一行。
+        """
+        cmd = ['git', 'branch', '-a', f'--format={BRANCH_SNAPSHOT_FORMAT}', '--sort=-committerdate']
         self.execute_command_async(cmd, finished_slot, progress_slot)
 
+    def get_tag_snapshot_async(self, finished_slot):
+        """列出全部标签 (见 TAG_SNAPSHOT_FORMAT)，按创建时间从新到旧"""
+        cmd = ['git', 'for-each-ref', f'--format={TAG_SNAPSHOT_FORMAT}', '--sort=-creatordate', 'refs/tags']
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_branch_track_counts_async(self, refnames: Optional[List[str]], finished_slot):
+        """一次计算多个本地分支相对上游的领先/落后数；refnames 为 None 时计算全部本地分支"""
+        cmd = ['git', 'for-each-ref', f'--format={BRANCH_TRACK_FORMAT}']
+        cmd.extend(refnames if refnames is not None else ['refs/heads'])
+        self.execute_command_async(cmd, finished_slot, low_priority=True)
+
+    def get_cleanup_branches_async(self, finished_slot):
+        """清理分析用: 一次列出全部本地分支的上游状态和最后提交时间 (见 BRANCH_CLEANUP_FORMAT)"""
+        cmd = ['git', 'for-each-ref', f'--format={BRANCH_CLEANUP_FORMAT}', 'refs/heads']
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_merged_branches_async(self, base: str, finished_slot):
+        """一次列出已合并到 base 的全部本地分支"""
+        cmd = ['git', 'for-each-ref', f'--merged={base}', '--format=%(refname)', 'refs/heads']
+        self.execute_command_async(cmd, finished_slot)
+
+    def delete_branches_async(self, names: List[str], force: bool, finished_slot):
+        """用一条 'git branch -d/-D' 删除多个本地分支 (能删的都会删掉，其余的在 stderr 中报错)"""
+        self.execute_command_async(build_delete_command(names, force), finished_slot)
+
+    def push_refspecs_async(self, remote: str, refspecs: List[str], finished_slot, progress_slot=None, options: Optional[List[str]] = None):
+        """用一次原子推送更新/删除多个远程引用，结果为 --porcelain 格式 (见 core.push_utils)"""
+        self.execute_command_async(build_push_command(remote, refspecs, options or []), finished_slot, progress_slot)
+
     def get_log_formatted_async(self, count=50, format: Optional[str] = None, extra_args: Optional[list] = None, finished_slot=None, progress_slot=None):
         format_str = format if format is not None else "%h\t%H\t%an\t%ar\t%s"
         cmd = ['git', 'log', f'--pretty=format:{format_str}', f'-n{count}']
         if extra_args:
             cmd.extend(extra_args)
+        self.execute_command_async(self._with_scope(cmd), finished_slot, progress_slot)
+
+    def get_log_stream_async(self, format_str: str, extra_args: Optional[list], chunk_slot, finished_slot, page_lines: int = 500) -> Optional[GitStreamWorker]:
+        """保持一个 git log 进程打开，每读取 page_lines 行后暂停，调用 request_more() 继续"""
+        cmd = ['git', 'log', f'--format={format_str}']
+        if extra_args:
+            cmd.extend(extra_args)
+        return self.execute_streaming_async(self._with_scope(cmd), chunk_slot, finished_slot,
+                                            batch_lines=page_lines, pause_after_batch=True)
+
+    def get_ref_tips_async(self, finished_slot, progress_slot=None):
+        """列出 HEAD 及全部分支、标签、远程分支指向的提交 (HEAD 在第一行)，每行为 "哈希\x1f引用装饰" """
+        cmd = ['git', 'log', '--no-walk=unsorted', '--format=%H%x1f%D', 'HEAD', '--branches', '--tags', '--remotes']
         self.execute_command_async(cmd, finished_slot, progress_slot)
 
-    def get_commit_details_async(self, commit_hash: str, finished_slot, progress_slot=None):
+    def is_ancestor_async(self, commit_hash: str, ref: str, finished_slot):
+        """'git merge-base --is-ancestor': 返回码 0 表示 commit_hash 在 ref 的历史中，1 表示不在"""
+        cmd = ['git', 'merge-base', '--is-ancestor', commit_hash, ref]
+        self.execute_command_async(cmd, finished_slot)
+
+    def resolve_blob_async(self, revision: str, path: str, finished_slot):
+        """解析提交和该提交中文件的 blob id，输出两行: 提交哈希、blob 哈希"""
+        cmd = ['git', 'rev-parse', f'{revision}^{{commit}}', f'{revision}:{path}']
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_blob_content_async(self, blob_oid: str, finished_slot):
+        cmd = ['git', 'cat-file', 'blob', blob_oid]
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_blame_stream_async(self, commit_oid: str, path: str, chunk_slot, finished_slot) -> Optional[GitStreamWorker]:
+        """'git blame --incremental': 每确定一段行的来源就输出一条记录，读到即交给 chunk_slot"""
+        cmd = ['git', 'blame', '--incremental', commit_oid, '--', path]
+        return self.execute_streaming_async(cmd, chunk_slot, finished_slot, emit_as_available=True)
+
+    def get_commit_details_async(self, commit_hash: str, finished_slot, progress_slot=None, low_priority=False,
+                                 paths: Optional[List[str]] = None):
         if not commit_hash:
             if finished_slot: QTimer.singleShot(0, lambda: finished_slot(-9, "", "错误：需要提供 Commit Hash。"))
             return
         cmd = ['git', 'show', '--no-ext-diff', commit_hash]
-        self.execute_command_async(cmd, finished_slot, progress_slot)
+        if paths:
+            cmd += ['--'] + list(paths)
+        self.execute_command_async(self._with_scope(cmd), finished_slot, progress_slot, low_priority=low_priority)
+
+    def get_commit_summary_async(self, commit_hash: str, finished_slot, low_priority=False, with_stats=True):
+        """
+        提交头部和文件列表 (raw + numstat，不含补丁)；合并提交与第一个父提交比较。
+        with_stats=False 时只有 raw 记录: 不需要比较文件内容，文件很多时也能很快返回。
+        """
+        cmd = ['git', 'show', '--no-ext-diff', '-M', '--raw'] + (['--numstat'] if with_stats else []) + [
+               '-z', '--no-abbrev', '--diff-merges=first-parent', commit_hash]
+        self.execute_command_async(self._with_scope(cmd), finished_slot, low_priority=low_priority)
+
+    def get_commit_numstat_async(self, commit_hash: str, finished_slot, low_priority=False):
+        """提交的行数统计 (numstat，无头部)；接在 with_stats=False 的摘要之后即为完整摘要"""
+        cmd = ['git', 'show', '--no-ext-diff', '-M', '--numstat', '-z', '--format=', '--diff-merges=first-parent', commit_hash]
+        self.execute_command_async(self._with_scope(cmd), finished_slot, low_priority=low_priority)
+
+    def get_commit_patch_async(self, commit_hash: str, paths: List[str], finished_slot, low_priority=False):
+        """只获取提交中指定文件的补丁 (不含提交头部)"""
+        cmd = ['git', 'show', '--no-ext-diff', '-M', '--format=', '--diff-merges=first-parent', commit_hash, '--'] + list(paths)
+        self.execute_command_async(cmd, finished_slot, low_priority=low_priority)
+
+    def get_diff_files_async(self, cached: bool, paths: Optional[List[str]], finished_slot, low_priority=False):
+        """工作区/暂存区差异的文件列表 (raw + numstat)"""
+        cmd = ['git', 'diff', '--raw', '--numstat', '-z', '--no-abbrev']
+        if cached:
+            cmd.append('--cached')
+        if paths:
+            cmd += ['--'] + list(paths)
+        self.execute_command_async(self._with_scope(cmd), finished_slot, low_priority=low_priority)
+
+    def hash_objects_async(self, paths: List[str], finished_slot, low_priority=False):
+        """计算工作区文件的 blob id (不写入对象库)，按输入顺序每行输出一个；路径从标准输入传入"""
+        cmd = ['git', 'hash-object', '--stdin-paths']
+        self.execute_command_async(cmd, finished_slot, low_priority=low_priority, stdin_data=''.join(f"{path}\n" for path in paths))
+
+    def get_diff_patch_async(self, cached: bool, paths: List[str], finished_slot, low_priority=False):
+        cmd = ['git', 'diff', '--no-ext-diff']
+        if cached:
+            cmd.append('--cached')
+        cmd += ['--'] + list(paths)
+        self.execute_command_async(cmd, finished_slot, low_priority=low_priority)
+
+    def resolve_commits_async(self, revisions: List[str], finished_slot):
+        """把多个引用解析为提交哈希，按输入顺序每行输出一个"""
+        cmd = ['git', 'rev-parse'] + [f'{revision}^{{commit}}' for revision in revisions]
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_merge_base_async(self, commit_a: str, commit_b: str, finished_slot):
+        """'git merge-base': 返回码 1 且无输出表示两者没有共同祖先"""
+        cmd = ['git', 'merge-base', commit_a, commit_b]
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_compare_files_async(self, base: str, tip: str, finished_slot):
+        """
+        两个提交之间的文件列表 (只有 raw 记录，检测重命名)：不需要比较文件内容，文件很多时也能很快返回。
+        行数统计由 get_compare_numstat_async 另外获取，两者的输出拼接后即为 raw + numstat 的输出。
+        """
+        cmd = ['git', 'diff', '-M', '--raw', '-z', '--no-abbrev', base, tip]
+        self.execute_command_async(self._with_scope(cmd), finished_slot)
+
+    def get_compare_numstat_async(self, base: str, tip: str, finished_slot):
+        """两个提交之间各文件的行数统计 (numstat，检测重命名)"""
+        cmd = ['git', 'diff', '-M', '--numstat', '-z', base, tip]
+        self.execute_command_async(self._with_scope(cmd), finished_slot)
+
+    def get_merge_tree_async(self, ours: str, theirs: str, finished_slot):
+        """
+        在内存中合并两个提交 ('git merge-tree --write-tree')，不改动索引和工作区。
+        返回码 0 为无冲突，1 且有输出为有冲突 (输出格式见 core.merge_preview)，其他为出错。
+        """
+        cmd = ['git', 'merge-tree', '--write-tree', '--name-only', '-z', ours, theirs]
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_merge_preview_files_async(self, ours: str, tree: str, finished_slot):
+        """合并预览: 我方提交到合并结果树的文件列表 (raw + numstat，检测重命名，不受仓库范围限制)"""
+        cmd = ['git', 'diff', '-M', '--raw', '--numstat', '-z', '--no-abbrev', ours, tree]
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_compare_patch_async(self, base: str, tip: str, paths: List[str], finished_slot):
+        cmd = ['git', 'diff', '--no-ext-diff', '-M', base, tip, '--'] + list(paths)
+        self.execute_command_async(cmd, finished_slot)
+
+    def get_diff_raw_async(self, cached: bool, finished_slot, progress_slot=None, low_priority=False):
+        cmd = ['git', 'diff', '--raw', '-z', '--no-abbrev']
+        if cached:
+            cmd.append('--cached')
+        self.execute_command_async(self._with_scope(cmd), finished_slot, progress_slot, low_priority=low_priority)
+
+    def get_diff_numstat_async(self, cached: bool, paths: Optional[List[str]], finished_slot, progress_slot=None, low_priority=False):
+        cmd = ['git', 'diff', '--numstat', '-z']
+        if cached:
+            cmd.append('--cached')
+        if paths:
+            cmd.append('--')
+            cmd.extend(paths)
+        self.execute_command_async(self._with_scope(cmd), finished_slot, progress_slot, low_priority=low_priority)
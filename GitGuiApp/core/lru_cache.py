@@ -0,0 +1,61 @@
+# core/lru_cache.py
+# -*- coding: utf-8 -*-
+import sys
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    按占用字节数限制大小的 LRU 缓存。每个条目的大小由 sizer 估算 (默认 sys.getsizeof)，
+    超过总容量时淘汰最久未使用的条目；单个条目超过容量的 max_entry_fraction 时不缓存，以免一个大结果挤掉全部条目。
+    """
+
+    def __init__(self, max_bytes: int, sizer: Callable[[Any], int] = sys.getsizeof, max_entry_fraction: float = 0.25):
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self._sizer = sizer
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """放入缓存，条目过大而未缓存时返回 False"""
+        size = self._sizer(value)
+        if size > self._max_entry_bytes:
+            logging.debug(f"条目过大 ({size} 字节)，不放入缓存: {key}")
+            self.discard(key)
+            return False
+        self.discard(key)
+        self._entries[key] = (value, size)
+        self._total_bytes += size
+        while self._total_bytes > self._max_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+        return True
+
+    def discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
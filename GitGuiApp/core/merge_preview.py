@@ -0,0 +1,66 @@
+# core/merge_preview.py
+# -*- coding: utf-8 -*-
+import sys
+import logging
+from typing import List, Optional, Tuple
+
+# 合并预览缓存的容量 (按 (我方提交, 对方提交) 缓存)
+MERGE_PREVIEW_CACHE_BYTES = 4 * 1024 * 1024
+
+
+class MergePreview:
+    """
+    'git merge-tree --write-tree' 在内存中合并的结果: 合并后的树、冲突的文件、git 的合并信息 [(路径, 冲突类型, 信息)]，
+    以及我方提交到合并结果的文件列表 (raw + numstat -z 输出，第二步才填上)。
+    """
+    __slots__ = ("tree", "conflicts", "messages", "files_output")
+
+    def __init__(self, tree: str, conflicts: List[str], messages: List[Tuple[List[str], str, str]]):
+        self.tree = tree
+        self.conflicts = conflicts
+        self.messages = messages
+        self.files_output: Optional[str] = None
+
+    @property
+    def clean(self) -> bool:
+        return not self.conflicts
+
+    def messages_for(self, path: str) -> List[str]:
+        return [message for paths, _, message in self.messages if path in paths]
+
+    def estimated_size(self) -> int:
+        return (sys.getsizeof(self) + sum(len(path) + 50 for path in self.conflicts)
+                + sum(len(message) + 100 for _, _, message in self.messages) + len(self.files_output or ""))
+
+    def __repr__(self):
+        return f"MergePreview({self.tree[:7]} 冲突 {len(self.conflicts)})"
+
+
+def parse_merge_tree_z(output: str) -> Optional[MergePreview]:
+    """
+    解析 'git merge-tree --write-tree --name-only -z' 的输出:
+    树 id，然后每个冲突文件一项，空项之后是信息 (<路径数>, 路径..., 冲突类型, 信息)。输出无法识别时返回 None。
+    """
+    fields = output.split('\0')
+    if not fields or len(fields[0]) < 40:
+        return None
+    tree = fields[0]
+    conflicts: List[str] = []
+    position = 1
+    while position < len(fields) and fields[position]:
+        conflicts.append(fields[position])
+        position += 1
+    position += 1
+    messages: List[Tuple[List[str], str, str]] = []
+    while position < len(fields) and fields[position]:
+        try:
+            count = int(fields[position])
+        except ValueError:
+            logging.warning(f"无法识别的合并信息: {repr(fields[position][:80])}")
+            break
+        end = position + 1 + count
+        if end + 1 >= len(fields):
+            break
+        messages.append((fields[position + 1:end], fields[end], fields[end + 1].rstrip('\n')))
+        position = end + 2
+    return MergePreview(tree, conflicts, messages)
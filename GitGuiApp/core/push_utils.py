@@ -0,0 +1,91 @@
+# core/push_utils.py
+# -*- coding: utf-8 -*-
+import logging
+from typing import Dict, List, Iterable
+
+# 'git push --porcelain' 每个引用一行: <标志>\t<本地>:<远程>\t<摘要> (<原因>)
+PUSH_FLAG_TITLES = {
+    ' ': "快进",
+    '+': "强制更新",
+    '-': "已删除",
+    '*': "新建",
+    '=': "已是最新",
+    '!': "被拒绝",
+}
+
+
+class PushRefResult:
+    """'git push --porcelain' 中一个引用的结果"""
+    __slots__ = ("flag", "source", "destination", "summary", "reason")
+
+    def __init__(self, flag: str, source: str, destination: str, summary: str, reason: str):
+        self.flag = flag
+        self.source = source
+        self.destination = destination
+        self.summary = summary
+        self.reason = reason
+
+    @property
+    def ok(self) -> bool:
+        return self.flag != '!'
+
+    @property
+    def short_name(self) -> str:
+        """远程引用的短名称: 分支去掉 refs/heads/，标签显示为 "标签 <名称>" """
+        if self.destination.startswith("refs/heads/"):
+            return self.destination[len("refs/heads/"):]
+        if self.destination.startswith("refs/tags/"):
+            return f"标签 {self.destination[len('refs/tags/'):]}"
+        return self.destination
+
+    def describe(self) -> str:
+        text = f"{PUSH_FLAG_TITLES.get(self.flag, self.flag)}: {self.short_name}"
+        if self.flag in (' ', '+', '!') and self.summary:
+            text += f" ({self.summary})"
+        if self.reason:
+            text += f" — {self.reason}"
+        return text
+
+    def __repr__(self):
+        return f"PushRefResult({self.flag!r} {self.destination} {self.summary} {self.reason})"
+
+
+def parse_push_porcelain(output: str) -> List[PushRefResult]:
+    """解析 'git push --porcelain' 的标准输出 ("To <url>" 和 "Done" 行忽略)"""
+    results: List[PushRefResult] = []
+    for line in output.split('\n'):
+        if len(line) < 2 or line[1] != '\t':
+            continue
+        fields = line[2:].split('\t')
+        if len(fields) < 2:
+            logging.warning(f"跳过无法识别的推送结果: {repr(line[:80])}")
+            continue
+        source, _, destination = fields[0].rpartition(':')
+        summary, reason = fields[1], ""
+        if summary.endswith(')') and ' (' in summary:
+            summary, _, reason = summary[:-1].partition(' (')
+        results.append(PushRefResult(line[0], source, destination, summary, reason))
+    return results
+
+
+def delete_refspecs(branches: Iterable[str] = (), tags: Iterable[str] = ()) -> List[str]:
+    """删除远程分支和标签的引用规格 (":refs/heads/<分支>"，":refs/tags/<标签>")"""
+    return [f":refs/heads/{branch}" for branch in branches] + [f":refs/tags/{tag}" for tag in tags]
+
+
+def branch_refspecs(branches: Iterable[str]) -> List[str]:
+    """推送本地分支到远程同名分支的引用规格 (写全引用名，避免与同名标签混淆)"""
+    return [f"refs/heads/{branch}:refs/heads/{branch}" for branch in branches]
+
+
+def force_with_lease_options(expected: Dict[str, str]) -> List[str]:
+    """
+    每个分支一个 --force-with-lease=<远程引用>:<期望值>，期望值为上次看到的远程提交 id，
+    为空表示远程应当还没有该分支。远程分支已被他人更新时该引用被拒绝 (原子推送时全部不更新)。
+    """
+    return [f"--force-with-lease=refs/heads/{branch}:{oid}" for branch, oid in expected.items()]
+
+
+def build_push_command(remote: str, refspecs: List[str], options: Iterable[str] = ()) -> List[str]:
+    """一次推送多个引用: --atomic 保证要么全部更新要么全部不变，--porcelain 给出逐个引用的结果"""
+    return ['git', 'push', '--atomic', '--porcelain'] + list(options) + [remote] + list(refspecs)
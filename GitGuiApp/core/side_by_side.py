@@ -0,0 +1,78 @@
+# core/side_by_side.py
+# -*- coding: utf-8 -*-
+import re
+from typing import List, Optional, Tuple
+
+_HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,\d+)? \+(\d+)(?:,\d+)? @@')
+# 每栏先是 5 列行号和一个空格，之后是带 +/-/空格 前缀的补丁行
+LINE_NUMBER_WIDTH = 5
+CELL_TEXT_OFFSET = LINE_NUMBER_WIDTH + 1
+SEPARATOR = " │ "
+
+# 每行显示内容的来源: (旧侧补丁行号, 新侧补丁行号)，没有内容的一侧为 -1；整行显示的行 (文件头、"@@" 行等) 为 None
+RowSource = Optional[Tuple[int, int]]
+
+
+def expand_patch_tabs(line: str, tab_size: int = 4) -> str:
+    """并排显示需要按列对齐，补丁行中 +/- 前缀之后的制表符展开为空格"""
+    if '\t' not in line:
+        return line
+    return line[:1] + line[1:].expandtabs(tab_size)
+
+
+def side_by_side_rows(patch_lines: List[str]) -> Tuple[List[str], List[RowSource], int]:
+    """
+    把统一格式的补丁排成左右两栏: 上下文行两侧都显示，连续的删除行和其后的新增行逐行配对，
+    多出的行对面留空。返回 (显示的行, 每行的来源, 右栏起始列)。
+    """
+    sources: List[RowSource] = []
+    cells: List[Tuple[str, str]] = []
+    old_number = new_number = 0
+    in_hunk = False
+    index = 0
+    while index < len(patch_lines):
+        line = patch_lines[index]
+        match = _HUNK_HEADER_RE.match(line)
+        if match:
+            old_number, new_number = int(match.group(1)), int(match.group(2))
+            in_hunk = True
+        elif in_hunk and line[:1] == ' ':
+            sources.append((index, index))
+            cells.append((f"{old_number:>{LINE_NUMBER_WIDTH}} {line}", f"{new_number:>{LINE_NUMBER_WIDTH}} {line}"))
+            old_number += 1
+            new_number += 1
+            index += 1
+            continue
+        elif in_hunk and line[:1] in ('-', '+'):
+            removed = []
+            while index < len(patch_lines) and patch_lines[index].startswith('-'):
+                removed.append(index)
+                index += 1
+            added = []
+            while index < len(patch_lines) and patch_lines[index].startswith('+'):
+                added.append(index)
+                index += 1
+            for offset in range(max(len(removed), len(added))):
+                old_index = removed[offset] if offset < len(removed) else -1
+                new_index = added[offset] if offset < len(added) else -1
+                left = right = ""
+                if old_index >= 0:
+                    left = f"{old_number:>{LINE_NUMBER_WIDTH}} {patch_lines[old_index]}"
+                    old_number += 1
+                if new_index >= 0:
+                    right = f"{new_number:>{LINE_NUMBER_WIDTH}} {patch_lines[new_index]}"
+                    new_number += 1
+                sources.append((old_index, new_index))
+                cells.append((left, right))
+            continue
+        elif line.startswith('diff '):
+            in_hunk = False
+        # 文件头、"@@" 行和 "\ No newline at end of file" 等整行显示
+        sources.append(None)
+        cells.append((line, ""))
+        index += 1
+
+    left_width = max((len(left) for source, (left, _) in zip(sources, cells) if source is not None), default=0)
+    rows = [left if source is None else left.ljust(left_width) + SEPARATOR + right
+            for source, (left, right) in zip(sources, cells)]
+    return rows, sources, left_width + len(SEPARATOR)
@@ -0,0 +1,169 @@
+# core/syntax_highlight.py
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from .lru_cache import LRUCache
+
+# 语法词元缓存的容量 (所有视图共用)
+SYNTAX_CACHE_BYTES = 16 * 1024 * 1024
+# 超过该长度的行不做语法分析 (压缩过的 js/css 等)，只按差异着色
+SYNTAX_MAX_LINE_CHARS = 1000
+
+# 词元种类
+TOKEN_KEYWORD = "keyword"
+TOKEN_STRING = "string"
+TOKEN_COMMENT = "comment"
+TOKEN_NUMBER = "number"
+TOKEN_DECORATOR = "decorator"
+
+# (起始列, 长度, 种类)
+Token = Tuple[int, int, str]
+
+_NUMBER_PATTERN = r'\b(?:0[xX][0-9a-fA-F_]+|0[bB][01_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)[a-zA-Z]*\b'
+_C_STRINGS = r'"(?:[^"\\]|\\.)*"?|\'(?:[^\'\\]|\\.)*\'?'
+
+_C_KEYWORDS = """
+    auto break case char const continue default do double else enum extern float for goto if inline int long register
+    return short signed sizeof static struct switch typedef union unsigned void volatile while bool true false nullptr
+    class namespace template typename public private protected virtual override final new delete this using operator
+    try catch throw const_cast static_cast dynamic_cast reinterpret_cast constexpr noexcept friend explicit mutable NULL
+"""
+_JAVA_KEYWORDS = """
+    abstract assert boolean break byte case catch char class const continue default do double else enum extends final
+    finally float for goto if implements import instanceof int interface long native new package private protected public
+    return short static strictfp super switch synchronized this throw throws transient try void volatile while true false
+    null var val fun object when is in as typealias companion data sealed override open internal lateinit suspend
+    namespace using string bool decimal readonly ref out params base lock get set async await yield
+"""
+_JS_KEYWORDS = """
+    break case catch class const continue debugger default delete do else export extends finally for function if import
+    in instanceof let new return super switch this throw try typeof var void while with yield async await of static get
+    set true false null undefined interface type enum implements private protected public readonly declare abstract as
+    from namespace keyof
+"""
+_GO_KEYWORDS = """
+    break case chan const continue default defer else fallthrough for func go goto if import interface map package range
+    return select struct switch type var true false nil iota
+"""
+_RUST_KEYWORDS = """
+    as async await break const continue crate dyn else enum extern false fn for if impl in let loop match mod move mut pub
+    ref return self Self static struct super trait true type unsafe use where while Some None Ok Err
+"""
+_PYTHON_KEYWORDS = """
+    False None True and as assert async await break class continue def del elif else except finally for from global if
+    import in is lambda nonlocal not or pass raise return try while with yield self cls match case
+"""
+_SHELL_KEYWORDS = """
+    if then else elif fi case esac for while until do done in function return local export readonly declare unset shift
+    exit break continue
+"""
+_SQL_KEYWORDS = """
+    select from where insert into values update set delete create table drop alter index view join inner left right
+    outer on group by order having limit offset union all distinct as and or not null is in like between exists case
+    when then else end primary key foreign references default begin commit rollback
+"""
+
+
+class Language:
+    """一种语言的逐行分析规则: 名称和一个按顺序匹配注释、字符串、数字、关键字等的正则"""
+    __slots__ = ("name", "pattern")
+
+    def __init__(self, name: str, keywords: str, comment: str, strings: str = _C_STRINGS, extra: str = "",
+                 ignore_case: bool = False):
+        self.name = name
+        parts = [f"(?P<{TOKEN_COMMENT}>{comment})", f"(?P<{TOKEN_STRING}>{strings})"]
+        if extra:
+            parts.append(f"(?P<{TOKEN_DECORATOR}>{extra})")
+        parts.append(f"(?P<{TOKEN_NUMBER}>{_NUMBER_PATTERN})")
+        words = sorted(set(keywords.split()), key=len, reverse=True)
+        parts.append(f"(?P<{TOKEN_KEYWORD}>\\b(?:{'|'.join(map(re.escape, words))})\\b)")
+        self.pattern = re.compile('|'.join(parts), re.IGNORECASE if ignore_case else 0)
+
+    def __repr__(self):
+        return f"Language({self.name})"
+
+
+_C_COMMENT = r'//.*|/\*.*?(?:\*/|$)'
+_LANGUAGES: Dict[str, Language] = {
+    "c": Language("c", _C_KEYWORDS, _C_COMMENT, extra=r'^\s*#\s*\w+'),
+    "java": Language("java", _JAVA_KEYWORDS, _C_COMMENT, extra=r'@\w+'),
+    "js": Language("js", _JS_KEYWORDS, _C_COMMENT, strings=_C_STRINGS + r'|`(?:[^`\\]|\\.)*`?', extra=r'@\w+'),
+    "go": Language("go", _GO_KEYWORDS, _C_COMMENT, strings=_C_STRINGS + r'|`[^`]*`?'),
+    "rust": Language("rust", _RUST_KEYWORDS, _C_COMMENT, strings=r'"(?:[^"\\]|\\.)*"?', extra=r'#!?\[[^\]]*\]?'),
+    "python": Language("python", _PYTHON_KEYWORDS, r'#.*',
+                       strings=r'[rRbBuUfF]{0,2}(?:"""(?:[^\\]|\\.)*?(?:"""|$)|\'\'\'(?:[^\\]|\\.)*?(?:\'\'\'|$)|"(?:[^"\\]|\\.)*"?|\'(?:[^\'\\]|\\.)*\'?)',
+                       extra=r'^\s*@[\w.]+'),
+    "shell": Language("shell", _SHELL_KEYWORDS, r'(?<![\w$])#.*', strings=r'"(?:[^"\\]|\\.)*"?|\'[^\']*\'?', extra=r'\$\{?\w+\}?'),
+    "sql": Language("sql", _SQL_KEYWORDS, r'--.*|/\*.*?(?:\*/|$)', strings=r"'(?:[^']|'')*'?", ignore_case=True),
+}
+_EXTENSIONS = {
+    ".c": "c", ".h": "c", ".cc": "c", ".cpp": "c", ".cxx": "c", ".hh": "c", ".hpp": "c", ".hxx": "c", ".m": "c", ".mm": "c",
+    ".java": "java", ".kt": "java", ".kts": "java", ".cs": "java", ".scala": "java", ".groovy": "java", ".gradle": "java",
+    ".dart": "java", ".swift": "java",
+    ".js": "js", ".jsx": "js", ".mjs": "js", ".cjs": "js", ".ts": "js", ".tsx": "js", ".vue": "js",
+    ".go": "go", ".rs": "rust",
+    ".py": "python", ".pyw": "python", ".pyi": "python",
+    ".sh": "shell", ".bash": "shell", ".zsh": "shell",
+    ".sql": "sql",
+}
+
+
+def language_for_path(path: str) -> Optional[Language]:
+    """按文件扩展名选择语言，不认识的类型返回 None (只按差异着色)"""
+    name = os.path.basename(path)
+    language = _EXTENSIONS.get(os.path.splitext(name)[1].lower())
+    if language is None and name in ("Makefile", "Dockerfile", ".bashrc", ".profile"):
+        language = "shell"
+    return _LANGUAGES.get(language) if language else None
+
+
+def tokenize_line(language: Language, line: str) -> List[Token]:
+    """
+    分析一行代码，返回有颜色的词元。逐行独立分析 (差异段本来就从文件中间开始)，
+    跨行的块注释和多行字符串只在开始的那一行识别。
+    """
+    if len(line) > SYNTAX_MAX_LINE_CHARS:
+        return []
+    return [(match.start(), match.end() - match.start(), match.lastgroup)
+            for match in language.pattern.finditer(line) if match.end() > match.start()]
+
+
+class SyntaxTokenCache:
+    """
+    按 blob 缓存逐行分析的结果: {blob 键: {行文本: 词元}}，一个 blob 为一个 LRU 条目。
+    blob 键为对象 id；工作区中尚无 id 的文件用路径代替 (分析只依赖行文本，键只影响淘汰的粒度)。
+    """
+
+    def __init__(self, cache_bytes: int = SYNTAX_CACHE_BYTES):
+        self._cache = LRUCache(cache_bytes, sizer=self._blob_size)
+
+    @staticmethod
+    def _blob_size(lines: Dict[str, List[Token]]) -> int:
+        return sys.getsizeof(lines) + sum(len(line) + 50 + 40 * len(tokens) for line, tokens in lines.items())
+
+    def get(self, blob_key: str, language: Language, line: str) -> Optional[List[Token]]:
+        lines = self._cache.get((blob_key, language.name))
+        return lines.get(line) if lines is not None else None
+
+    def tokens(self, blob_key: str, language: Language, line: str) -> List[Token]:
+        """取缓存的词元，未缓存时分析并存入"""
+        key = (blob_key, language.name)
+        lines = self._cache.get(key)
+        if lines is None:
+            lines = {}
+            self._cache.put(key, lines)
+        tokens = lines.get(line)
+        if tokens is None:
+            tokens = tokenize_line(language, line)
+            lines[line] = tokens
+            # LRUCache 在放入时记录大小，blob 的行数每翻一倍重新放入一次以更新大小
+            count = len(lines)
+            if count >= 64 and count & (count - 1) == 0:
+                self._cache.put(key, lines)
+        return tokens
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,290 @@
+# core/word_diff.py
+# -*- coding: utf-8 -*-
+import re
+import sys
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from PyQt6.QtCore import QObject, QThread, QCoreApplication, pyqtSignal, pyqtSlot
+
+from .lru_cache import LRUCache
+
+# 单词、连续空白、单个标点各为一个词元
+_TOKEN_RE = re.compile(r'\w+|\s+|[^\w\s]')
+# Myers 算法的编辑距离上限 (以词元计)，一次匹配的时间为 O((N+M)·MAX_EDITS)，对很长的行也是线性的。
+# 超过上限时以唯一词元为锚点切分后再匹配 (patience)，仍找不到锚点的部分整体视为修改
+MAX_EDITS = 64
+# 词元总数超过该值时先按锚点切分，避免在整行上跑一遍注定超出上限的 Myers
+ANCHOR_FIRST_TOKENS = 2000
+# 相同部分少于较短一行的该比例时视为整行替换，不做行内标记
+MIN_COMMON_FRACTION = 0.3
+# 段内单词差异缓存的容量
+WORD_DIFF_CACHE_BYTES = 16 * 1024 * 1024
+# 超出缓存单条上限的结果另外保留最近的几个，否则显示中的大段每次重绘都会重新计算
+OVERSIZED_RESULTS_KEPT = 2
+
+# (起始列, 长度)
+CharRange = Tuple[int, int]
+
+
+def _tokenize(text: str) -> List[Tuple[str, int]]:
+    return [(match.group(), match.start()) for match in _TOKEN_RE.finditer(text)]
+
+
+def _myers_matches(a: List[str], b: List[str], max_edits: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Myers 差异算法 (贪心，带编辑距离上限)，返回相同词元的下标对 (倒序)。
+    编辑距离超过 max_edits 时返回 None。
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(max_edits + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace: List[Dict[int, int]], n: int, m: int) -> List[Tuple[int, int]]:
+    matches = []
+    x, y = n, m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v.get(k - 1, -1) < v.get(k + 1, -1)):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v.get(previous_k, 0)
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        if d > 0:
+            x, y = previous_x, previous_y
+    return matches
+
+
+def _unique_anchors(a: List[str], b: List[str]) -> List[Tuple[int, int]]:
+    """两边都只出现一次的词元作为锚点，取其中位置单调递增的最长序列 (patience 算法)"""
+    counts: Dict[str, List[int]] = {}
+    for index, token in enumerate(a):
+        entry = counts.setdefault(token, [0, 0, index])
+        entry[0] += 1
+    for index, token in enumerate(b):
+        entry = counts.get(token)
+        if entry is not None:
+            entry[1] += 1
+    candidates = [(counts[token][2], index) for index, token in enumerate(b)
+                  if token in counts and counts[token][0] == 1 and counts[token][1] == 1 and not token.isspace()]
+    # 按 b 中的顺序，求 a 中下标的最长递增子序列
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous: List[int] = [-1] * len(candidates)
+    for position, (x, _) in enumerate(candidates):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if tails[middle] < x:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[position] = tail_index[low - 1]
+        if low == len(tails):
+            tails.append(x)
+            tail_index.append(position)
+        else:
+            tails[low] = x
+            tail_index[low] = position
+    anchors = []
+    position = tail_index[-1] if tail_index else -1
+    while position >= 0:
+        anchors.append(candidates[position])
+        position = previous[position]
+    anchors.reverse()
+    return anchors
+
+
+def _match_tokens(a: List[str], b: List[str], depth: int = 0) -> List[Tuple[int, int]]:
+    """
+    匹配两个词元序列中相同的部分。先用有上限的 Myers 算法；编辑太多时以唯一词元为锚点切分，
+    再分别匹配锚点之间的部分。找不到锚点的部分视为整体修改。
+    """
+    if not a or not b:
+        return []
+    anchors: List[Tuple[int, int]] = []
+    if len(a) + len(b) > ANCHOR_FIRST_TOKENS and depth < 8:
+        anchors = _unique_anchors(a, b)
+    if not anchors:
+        matches = _myers_matches(a, b, MAX_EDITS)
+        if matches is not None:
+            return matches
+        anchors = _unique_anchors(a, b) if depth < 8 and len(a) + len(b) <= ANCHOR_FIRST_TOKENS else []
+    if not anchors:
+        return []
+    result: List[Tuple[int, int]] = []
+    previous_x, previous_y = 0, 0
+    for x, y in anchors + [(len(a), len(b))]:
+        for sub_x, sub_y in _match_tokens(a[previous_x:x], b[previous_y:y], depth + 1):
+            result.append((previous_x + sub_x, previous_y + sub_y))
+        if x < len(a):
+            result.append((x, y))
+        previous_x, previous_y = x + 1, y + 1
+    return result
+
+
+def _changed_ranges(tokens: List[Tuple[str, int]], unchanged: set) -> List[CharRange]:
+    """未匹配的词元合并为连续的字符范围"""
+    ranges: List[CharRange] = []
+    for index, (token, start) in enumerate(tokens):
+        if index in unchanged:
+            continue
+        if ranges and ranges[-1][0] + ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + len(token))
+        else:
+            ranges.append((start, len(token)))
+    return ranges
+
+
+def line_word_diff(old: str, new: str) -> Tuple[List[CharRange], List[CharRange]]:
+    """
+    两行之间的单词级差异，返回 (旧行中修改的范围, 新行中修改的范围)。
+    先去掉相同的开头和结尾词元，中间部分用有上限的 Myers 算法匹配 (必要时按唯一词元切分)。
+    两行差别太大时返回两个空列表。
+    """
+    a, b = _tokenize(old), _tokenize(new)
+    prefix = 0
+    while prefix < len(a) and prefix < len(b) and a[prefix][0] == b[prefix][0]:
+        prefix += 1
+    suffix = 0
+    while (suffix < len(a) - prefix and suffix < len(b) - prefix
+           and a[len(a) - 1 - suffix][0] == b[len(b) - 1 - suffix][0]):
+        suffix += 1
+
+    a_unchanged = set(range(prefix)) | set(range(len(a) - suffix, len(a)))
+    b_unchanged = set(range(prefix)) | set(range(len(b) - suffix, len(b)))
+    middle_a = [token for token, _ in a[prefix:len(a) - suffix]]
+    middle_b = [token for token, _ in b[prefix:len(b) - suffix]]
+    if middle_a and middle_b:
+        for x, y in _match_tokens(middle_a, middle_b):
+            a_unchanged.add(prefix + x)
+            b_unchanged.add(prefix + y)
+
+    common = sum(len(a[index][0]) for index in a_unchanged if not a[index][0].isspace())
+    shorter = min(len(old.strip()), len(new.strip()))
+    if shorter == 0 or common < shorter * MIN_COMMON_FRACTION:
+        return [], []
+    return _changed_ranges(a, a_unchanged), _changed_ranges(b, b_unchanged)
+
+
+class HunkWordDiff:
+    """一段补丁的行内差异: {段内行号 (0 为 "@@" 行): 修改的范围 (列号含行首的 +/-)}"""
+
+    def __init__(self, hunk_text: str, ranges: Dict[int, List[CharRange]]):
+        self.hunk_length = len(hunk_text)
+        self.ranges = ranges
+
+    def estimated_size(self) -> int:
+        # 缓存键是段文本本身，也计入大小
+        return sys.getsizeof(self.ranges) + self.hunk_length + sum(40 + 32 * len(r) for r in self.ranges.values())
+
+
+def hunk_word_diff(hunk_text: str) -> HunkWordDiff:
+    """
+    计算一段补丁的行内差异: 连续的删除行之后紧跟的新增行按顺序一一配对，配对的两行做单词级比较。
+    """
+    lines = hunk_text.split('\n')
+    ranges: Dict[int, List[CharRange]] = {}
+    index = 0
+    while index < len(lines):
+        if not lines[index].startswith('-'):
+            index += 1
+            continue
+        removed_start = index
+        while index < len(lines) and lines[index].startswith('-'):
+            index += 1
+        added_start = index
+        while index < len(lines) and lines[index].startswith('+'):
+            index += 1
+        for offset in range(min(added_start - removed_start, index - added_start)):
+            old_number, new_number = removed_start + offset, added_start + offset
+            old_ranges, new_ranges = line_word_diff(lines[old_number][1:], lines[new_number][1:])
+            if old_ranges or new_ranges:
+                ranges[old_number] = [(start + 1, length) for start, length in old_ranges]
+                ranges[new_number] = [(start + 1, length) for start, length in new_ranges]
+    return HunkWordDiff(hunk_text, ranges)
+
+
+class _WordDiffWorker(QObject):
+    computed = pyqtSignal(str, object)
+
+    @pyqtSlot(str)
+    def compute(self, hunk_text: str):
+        try:
+            result = hunk_word_diff(hunk_text)
+        except Exception:
+            logging.exception("计算段内单词差异时出错。")
+            result = HunkWordDiff(hunk_text, {})
+        self.computed.emit(hunk_text, result)
+
+
+class WordDiffEngine(QObject):
+    """
+    在后台线程计算段内单词差异，结果按段文本缓存。
+    get() 只查缓存；未命中时调用 request()，计算完成后发出 hunkComputed。
+    """
+    hunkComputed = pyqtSignal(str)
+    _computeRequested = pyqtSignal(str)
+
+    def __init__(self, parent: Optional[QObject] = None, cache_bytes: int = WORD_DIFF_CACHE_BYTES):
+        super().__init__(parent)
+        self._cache = LRUCache(cache_bytes, sizer=lambda result: result.estimated_size())
+        self._pending: set = set()
+        self._oversized: "OrderedDict[str, HunkWordDiff]" = OrderedDict()
+        self._thread = QThread()
+        self._worker = _WordDiffWorker()
+        self._worker.moveToThread(self._thread)
+        self._computeRequested.connect(self._worker.compute)
+        self._worker.computed.connect(self._on_computed)
+        self._thread.start(QThread.Priority.LowPriority)
+        application = QCoreApplication.instance()
+        if application is not None:
+            application.aboutToQuit.connect(self.shutdown)
+
+    def get(self, hunk_text: str) -> Optional[HunkWordDiff]:
+        result = self._cache.get(hunk_text)
+        return result if result is not None else self._oversized.get(hunk_text)
+
+    def request(self, hunk_text: str):
+        if hunk_text in self._pending or hunk_text in self._cache or hunk_text in self._oversized:
+            return
+        self._pending.add(hunk_text)
+        self._computeRequested.emit(hunk_text)
+
+    @pyqtSlot(str, object)
+    def _on_computed(self, hunk_text: str, result: HunkWordDiff):
+        self._pending.discard(hunk_text)
+        if not self._cache.put(hunk_text, result):
+            self._oversized[hunk_text] = result
+            while len(self._oversized) > OVERSIZED_RESULTS_KEPT:
+                self._oversized.popitem(last=False)
+        self.hunkComputed.emit(hunk_text)
+
+    def shutdown(self):
+        """停止后台线程 (窗口关闭时调用)，排队中的计算被丢弃"""
+        if self._thread.isRunning():
+            self._thread.quit()
+            self._thread.wait(2000)
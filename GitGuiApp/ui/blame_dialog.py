@@ -0,0 +1,291 @@
+# ui/blame_dialog.py
+# -*- coding: utf-8 -*-
+import time
+import logging
+from typing import Optional, List, Tuple
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTableView, QHeaderView, QAbstractItemView
+)
+from PyQt6.QtGui import QFont, QColor
+from PyQt6.QtCore import Qt, QObject, QModelIndex, QAbstractTableModel, pyqtSlot
+
+from core.blame import BlameParser, BlameResult
+from core.lru_cache import LRUCache
+
+BLAME_COL_COMMIT = 0
+BLAME_COL_AUTHOR = 1
+BLAME_COL_DATE = 2
+BLAME_COL_LINE = 3
+BLAME_COL_TEXT = 4
+
+
+class BlameTableModel(QAbstractTableModel):
+    """按行显示 BlameResult；每段记录只在第一行显示提交信息，来源尚未确定的行显示为空"""
+    HEADERS = ["Commit", "Author", "Date", "Line", "Content"]
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._result: Optional[BlameResult] = None
+        self._monospace_font = QFont("Courier New")
+        self._pending_color = QColor("gray")
+
+    @property
+    def result(self) -> Optional[BlameResult]:
+        return self._result
+
+    def set_result(self, result: Optional[BlameResult]):
+        self.beginResetModel()
+        self._result = result
+        self.endResetModel()
+
+    def lines_changed(self, first: int, last: int):
+        if self._result is not None and first <= last:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.HEADERS) - 1))
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid() or self._result is None:
+            return 0
+        return len(self._result.lines)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole and 0 <= section < len(self.HEADERS):
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        result = self._result
+        if not index.isValid() or result is None:
+            return None
+        row, col = index.row(), index.column()
+        if row >= len(result.lines):
+            return None
+        entry = result.entry_at(row)
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == BLAME_COL_LINE:
+                return str(row + 1)
+            if col == BLAME_COL_TEXT:
+                return result.lines[row].expandtabs(4)
+            if entry is None:
+                return "..." if col == BLAME_COL_COMMIT else ""
+            if row != entry.final_line - 1:
+                return ""
+            if col == BLAME_COL_COMMIT:
+                return entry.commit.oid[:7]
+            if col == BLAME_COL_AUTHOR:
+                return entry.commit.author
+            if col == BLAME_COL_DATE:
+                return time.strftime("%Y-%m-%d", time.localtime(entry.commit.author_time))
+        elif role == Qt.ItemDataRole.ToolTipRole and entry is not None and col != BLAME_COL_TEXT:
+            return f"{entry.commit.oid}\n{entry.commit.author}\n{entry.commit.summary}"
+        elif role == Qt.ItemDataRole.FontRole and col in (BLAME_COL_COMMIT, BLAME_COL_TEXT):
+            return self._monospace_font
+        elif role == Qt.ItemDataRole.ForegroundRole and entry is None and col != BLAME_COL_TEXT:
+            return self._pending_color
+        elif role == Qt.ItemDataRole.TextAlignmentRole and col == BLAME_COL_LINE:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+
+class BlameDialog(QDialog):
+    """
+    文件追溯 (blame) 窗口。先显示文件内容，'git blame --incremental' 每输出一段就标注对应的行。
+    结果以 (blob id, 提交, 路径) 为键放入共享的 LRU 缓存，"追溯上一版本" 和 "后退" 命中缓存时立即显示。
+    """
+
+    def __init__(self, git_handler, blame_cache: LRUCache, revision: str, path: str, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(1000, 700)
+
+        self._git_handler = git_handler
+        self._cache = blame_cache
+        self._worker = None
+        self._generation = 0
+        self._parser: Optional[BlameParser] = None
+        self._start_time = 0.0
+        self._pending_row = 0
+        # 后退栈: (提交, 路径, 选中行)
+        self._history: List[Tuple[str, str, int]] = []
+
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        self.location_label = QLabel("")
+        self.location_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        top_layout.addWidget(self.location_label, 1)
+        self.back_button = QPushButton("后退")
+        self.back_button.setToolTip("回到上一次追溯的版本")
+        self.back_button.clicked.connect(self._go_back)
+        top_layout.addWidget(self.back_button)
+        self.prior_button = QPushButton("追溯上一版本")
+        self.prior_button.setToolTip("在引入选中行的提交的父提交中继续追溯该文件 (blame prior revision)")
+        self.prior_button.clicked.connect(self._blame_prior_revision)
+        top_layout.addWidget(self.prior_button)
+        layout.addLayout(top_layout)
+
+        self.model = BlameTableModel(self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table_view.setShowGrid(False)
+        self.table_view.setWordWrap(False)
+        self.table_view.verticalHeader().setVisible(False)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(self.table_view.fontMetrics().height() + 4)
+        header = self.table_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(BLAME_COL_TEXT, QHeaderView.ResizeMode.Stretch)
+        header.resizeSection(BLAME_COL_COMMIT, 80)
+        header.resizeSection(BLAME_COL_AUTHOR, 140)
+        header.resizeSection(BLAME_COL_DATE, 90)
+        header.resizeSection(BLAME_COL_LINE, 55)
+        self.table_view.selectionModel().selectionChanged.connect(self._update_buttons)
+        self.table_view.doubleClicked.connect(lambda _index: self._blame_prior_revision())
+        layout.addWidget(self.table_view, 1)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self._load(revision, path, 0)
+
+    # --- 加载 ---
+
+    def _load(self, revision: str, path: str, select_row: int):
+        self._stop()
+        self._generation += 1
+        generation = self._generation
+        self._pending_row = select_row
+        self.setWindowTitle(f"追溯 (Blame) - {path}")
+        self.location_label.setText(f"{path} @ {revision[:10]}")
+        self.status_label.setText("正在解析版本...")
+        self.model.set_result(None)
+        self._update_buttons()
+        self._git_handler.resolve_blob_async(
+            revision, path,
+            lambda rc, so, se, g=generation, p=path, r=revision: self._on_blob_resolved(g, rc, so, se, r, p)
+        )
+
+    def _on_blob_resolved(self, generation: int, return_code: int, stdout: str, stderr: str, revision: str, path: str):
+        if generation != self._generation:
+            return
+        oids = stdout.split()
+        if return_code != 0 or len(oids) != 2:
+            self.status_label.setText(f"❌ 文件 '{path}' 在 {revision[:10]} 中不存在或无法解析。 {stderr.strip()}")
+            return
+        commit_oid, blob_oid = oids
+        self.location_label.setText(f"{path} @ {commit_oid[:10]}")
+        cached = self._cache.get((blob_oid, commit_oid, path))
+        if cached is not None:
+            logging.debug(f"blame 缓存命中: {path} @ {commit_oid[:7]}")
+            self._show_result(cached)
+            self.status_label.setText(f"{len(cached.lines)} 行，{len(cached.commits)} 个提交 (缓存)")
+            return
+        self.status_label.setText("正在读取文件内容...")
+        self._start_time = time.perf_counter()
+        self._git_handler.get_blob_content_async(
+            blob_oid,
+            lambda rc, so, se, g=generation: self._on_content_received(g, rc, so, se, commit_oid, blob_oid, path)
+        )
+
+    def _on_content_received(self, generation: int, return_code: int, stdout: str, stderr: str,
+                             commit_oid: str, blob_oid: str, path: str):
+        if generation != self._generation:
+            return
+        if return_code != 0:
+            self.status_label.setText(f"❌ 读取文件内容失败: {stderr.strip()}")
+            return
+        lines = stdout.split('\n')
+        if lines and lines[-1] == "":
+            lines.pop()
+        result = BlameResult(commit_oid, blob_oid, path, lines)
+        self._parser = BlameParser(result.commits)
+        self._show_result(result)
+        self.status_label.setText(f"正在追溯 {len(lines)} 行...")
+        self._worker = self._git_handler.get_blame_stream_async(
+            commit_oid, path,
+            lambda chunk, g=generation: self._on_blame_chunk(g, chunk),
+            lambda rc, so, se, g=generation: self._on_blame_finished(g, rc, se)
+        )
+
+    def _show_result(self, result: BlameResult):
+        self.model.set_result(result)
+        if result.lines:
+            row = result.row_for_line(self._pending_row + 1)
+            self.table_view.selectRow(row)
+            self.table_view.scrollTo(self.model.index(row, BLAME_COL_TEXT), QAbstractItemView.ScrollHint.PositionAtCenter)
+        self._update_buttons()
+
+    def _on_blame_chunk(self, generation: int, lines: list):
+        result = self.model.result
+        if generation != self._generation or result is None or self._parser is None:
+            return
+        first_changed, last_changed = len(result.lines), -1
+        for entry in self._parser.feed(lines):
+            first, last = result.add_entry(entry)
+            first_changed, last_changed = min(first_changed, first), max(last_changed, last)
+        self.model.lines_changed(first_changed, last_changed)
+        self.status_label.setText(f"正在追溯... 已标注 {result.assigned_lines}/{len(result.lines)} 行")
+        self._update_buttons()
+
+    def _on_blame_finished(self, generation: int, return_code: int, stderr: str):
+        if generation != self._generation:
+            return
+        self._worker = None
+        result = self.model.result
+        if return_code != 0 or result is None:
+            self.status_label.setText(f"❌ 追溯失败: {stderr.strip()}")
+            return
+        result.complete = True
+        self._cache.put(result.cache_key, result)
+        elapsed_ms = (time.perf_counter() - self._start_time) * 1000
+        self.status_label.setText(f"{len(result.lines)} 行，{len(result.commits)} 个提交，用时 {elapsed_ms:.0f} ms")
+        logging.info(f"blame 完成: {result.path} @ {result.commit_oid[:7]}，{elapsed_ms:.0f} ms")
+
+    def _stop(self):
+        if self._worker is not None:
+            self._worker.terminate()
+            self._worker = None
+        self._parser = None
+
+    # --- 导航 ---
+
+    def _selected_row(self) -> int:
+        rows = self.table_view.selectionModel().selectedRows()
+        return rows[0].row() if rows else -1
+
+    @pyqtSlot()
+    def _update_buttons(self):
+        result = self.model.result
+        entry = result.entry_at(self._selected_row()) if result is not None else None
+        self.prior_button.setEnabled(entry is not None and entry.previous_oid is not None)
+        self.back_button.setEnabled(bool(self._history))
+
+    @pyqtSlot()
+    def _blame_prior_revision(self):
+        result = self.model.result
+        row = self._selected_row()
+        entry = result.entry_at(row) if result is not None else None
+        if entry is None or not entry.previous_oid:
+            return
+        self._history.append((result.commit_oid, result.path, row))
+        # 在父提交中，选中行大致位于该段在引入提交中的原始行号附近
+        target_line = entry.orig_line + (row - (entry.final_line - 1))
+        self._load(entry.previous_oid, entry.previous_path or result.path, target_line - 1)
+
+    @pyqtSlot()
+    def _go_back(self):
+        if not self._history:
+            return
+        revision, path, row = self._history.pop()
+        self._load(revision, path, row)
+
+    def closeEvent(self, event):
+        self._generation += 1
+        self._stop()
+        super().closeEvent(event)
@@ -0,0 +1,262 @@
+# ui/branch_cleanup_dialog.py
+# -*- coding: utf-8 -*-
+import time
+import logging
+from typing import Optional, List, Set
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QCheckBox, QSpinBox,
+    QTreeWidget, QTreeWidgetItem, QMessageBox
+)
+from PyQt6.QtGui import QColor
+from PyQt6.QtCore import Qt, pyqtSlot, pyqtSignal
+
+from core.branch_cleanup import (
+    CleanupBranch, STALE_BRANCH_DAYS, CATEGORY_MERGED, CATEGORY_GONE, CATEGORY_STALE, CATEGORY_ACTIVE, CATEGORY_TITLES,
+    parse_cleanup_branches, parse_merged_branches, classify_branches
+)
+
+_CATEGORY_COLORS = {
+    CATEGORY_MERGED: QColor("darkGreen"), CATEGORY_GONE: QColor("darkRed"), CATEGORY_STALE: QColor("darkOrange"),
+}
+# 列表中各类别的先后顺序
+_CATEGORY_ORDER = [CATEGORY_MERGED, CATEGORY_GONE, CATEGORY_STALE, CATEGORY_ACTIVE]
+
+
+class BranchCleanupDialog(QDialog):
+    """
+    本地分支清理: 用两次批量的 for-each-ref (全部本地分支的上游状态和提交时间、已合并到基准的分支) 把分支分为
+    已合并、上游已删除、过期和活跃，勾选的分支用一条 'git branch -d' 一起删除。
+    """
+    branchesDeleted = pyqtSignal()
+
+    def __init__(self, git_handler, branch_names: List[str], base_branch: str = "", parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle("清理本地分支")
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(800, 600)
+
+        self._git_handler = git_handler
+        self._generation = 0
+        self._branches: Optional[List[CleanupBranch]] = None
+        self._merged: Optional[Set[str]] = None
+        self._base_branch = ""
+        # 上一次删除请求的分支和 git 的报错，重新分析后据此给出结果
+        self._requested_deletes: List[str] = []
+        self._delete_errors: List[str] = []
+
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(QLabel("基准分支:"))
+        self.base_combo = QComboBox()
+        self.base_combo.setEditable(True)
+        self.base_combo.addItems(branch_names)
+        self.base_combo.setCurrentText(base_branch)
+        self.base_combo.setToolTip("已合并到该分支的分支归为 \"已合并\"")
+        self.base_combo.lineEdit().returnPressed.connect(self._start_analysis)
+        top_layout.addWidget(self.base_combo, 1)
+        top_layout.addWidget(QLabel("过期天数:"))
+        self.stale_days_spin = QSpinBox()
+        self.stale_days_spin.setRange(1, 3650)
+        self.stale_days_spin.setValue(STALE_BRANCH_DAYS)
+        self.stale_days_spin.setToolTip("最后提交早于这么多天的未合并分支归为 \"过期\"")
+        top_layout.addWidget(self.stale_days_spin)
+        self.analyze_button = QPushButton("分析")
+        self.analyze_button.setDefault(True)
+        self.analyze_button.clicked.connect(self._start_analysis)
+        top_layout.addWidget(self.analyze_button)
+        layout.addLayout(top_layout)
+
+        self.summary_label = QLabel("")
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(self.summary_label)
+
+        self.branch_tree = QTreeWidget()
+        self.branch_tree.setHeaderLabels(["分支", "类别", "最后提交", "上游"])
+        self.branch_tree.setRootIsDecorated(False)
+        self.branch_tree.setUniformRowHeights(True)
+        self.branch_tree.setColumnWidth(0, 300)
+        self.branch_tree.itemChanged.connect(self._update_delete_button)
+        layout.addWidget(self.branch_tree, 1)
+
+        select_layout = QHBoxLayout()
+        for category in (CATEGORY_MERGED, CATEGORY_GONE, CATEGORY_STALE):
+            button = QPushButton(f"选中{CATEGORY_TITLES[category]}")
+            button.clicked.connect(lambda checked=False, c=category: self._check_category(c))
+            select_layout.addWidget(button)
+        clear_button = QPushButton("全部不选")
+        clear_button.clicked.connect(lambda: self._check_category(None))
+        select_layout.addWidget(clear_button)
+        select_layout.addStretch()
+        self.force_checkbox = QCheckBox("强制删除 (-D)")
+        self.force_checkbox.setToolTip("'git branch -d' 只删除已合并到其上游 (没有上游时为 HEAD) 的分支，\n"
+                                       "上游已删除或过期的未合并分支需要强制删除，其中的提交将只能通过 reflog 找回。")
+        select_layout.addWidget(self.force_checkbox)
+        self.delete_button = QPushButton("删除所选分支")
+        self.delete_button.setEnabled(False)
+        self.delete_button.clicked.connect(self._delete_checked)
+        select_layout.addWidget(self.delete_button)
+        layout.addLayout(select_layout)
+
+        self._start_analysis()
+
+    # --- 分析 ---
+
+    @pyqtSlot()
+    def _start_analysis(self):
+        base_branch = self.base_combo.currentText().strip() or "HEAD"
+        if base_branch.startswith('-'):
+            self.summary_label.setText("❌ 分支名不能以 '-' 开头。")
+            return
+        self._generation += 1
+        generation = self._generation
+        self._branches = None
+        self._merged = None
+        self._base_branch = base_branch
+        self.branch_tree.clear()
+        self.delete_button.setEnabled(False)
+        self.summary_label.setText(f"正在分析本地分支 (基准 {base_branch})...")
+        self._git_handler.get_cleanup_branches_async(
+            lambda rc, so, se, g=generation: self._on_branches_received(g, rc, so, se))
+        self._git_handler.get_merged_branches_async(
+            base_branch, lambda rc, so, se, g=generation: self._on_merged_received(g, rc, so, se))
+
+    def _on_branches_received(self, generation: int, return_code: int, stdout: str, stderr: str):
+        if generation != self._generation:
+            return
+        if return_code != 0:
+            self._analysis_failed(f"❌ 获取本地分支失败: {stderr.strip()}")
+            return
+        self._branches = parse_cleanup_branches(stdout)
+        self._show_analysis()
+
+    def _on_merged_received(self, generation: int, return_code: int, stdout: str, stderr: str):
+        if generation != self._generation:
+            return
+        if return_code != 0:
+            self._analysis_failed(f"❌ 无法确定已合并到 '{self._base_branch}' 的分支: {stderr.strip()}")
+            return
+        self._merged = parse_merged_branches(stdout)
+        self._show_analysis()
+
+    def _analysis_failed(self, message: str):
+        self._generation += 1
+        self.summary_label.setText(message)
+        self._requested_deletes = []
+
+    def _show_analysis(self):
+        """两次查询都返回后分类并填充列表"""
+        if self._branches is None or self._merged is None:
+            return
+        now = time.time()
+        classify_branches(self._branches, self._merged, self._base_branch, now, self.stale_days_spin.value())
+        candidates = [branch for branch in self._branches if branch.category is not None]
+        candidates.sort(key=lambda branch: (_CATEGORY_ORDER.index(branch.category), branch.committer_time))
+
+        self.branch_tree.blockSignals(True)
+        self.branch_tree.setUpdatesEnabled(False)
+        for branch in candidates:
+            item = QTreeWidgetItem([
+                branch.name,
+                CATEGORY_TITLES[branch.category],
+                f"{time.strftime('%Y-%m-%d', time.localtime(branch.committer_time))} ({branch.age_days(now)} 天前)" if branch.committer_time else "",
+                branch.upstream.removeprefix("refs/remotes/"),
+            ])
+            item.setData(0, Qt.ItemDataRole.UserRole, branch.name)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(0, Qt.CheckState.Unchecked)
+            color = _CATEGORY_COLORS.get(branch.category)
+            if color is not None:
+                item.setForeground(1, color)
+            self.branch_tree.addTopLevelItem(item)
+        self.branch_tree.setUpdatesEnabled(True)
+        self.branch_tree.blockSignals(False)
+
+        counts = {category: 0 for category in _CATEGORY_ORDER}
+        for branch in candidates:
+            counts[branch.category] += 1
+        summary = f"基准 {self._base_branch}: " + "，".join(f"{CATEGORY_TITLES[c]} {counts[c]}" for c in _CATEGORY_ORDER)
+        summary += " (当前分支和基准分支不列出)"
+        result = self._delete_result_text()
+        self.summary_label.setText(f"{result}\n{summary}" if result else summary)
+        self._update_delete_button()
+
+    def _delete_result_text(self) -> str:
+        """上一次删除的结果: 重新分析后仍然存在的分支即为删除失败"""
+        if not self._requested_deletes or self._branches is None:
+            return ""
+        remaining = {branch.name for branch in self._branches}
+        failed = [name for name in self._requested_deletes if name in remaining]
+        deleted_count = len(self._requested_deletes) - len(failed)
+        text = f"✅ 已删除 {deleted_count} 个分支。"
+        if failed:
+            text += f"\n❌ {len(failed)} 个分支未删除: {', '.join(failed[:10])}{' ...' if len(failed) > 10 else ''}"
+            if self._delete_errors:
+                text += "\n" + "\n".join(self._delete_errors[:5])
+        self._requested_deletes = []
+        self._delete_errors = []
+        return text
+
+    # --- 选择和删除 ---
+
+    def _check_category(self, category: Optional[str]):
+        self.branch_tree.blockSignals(True)
+        for row in range(self.branch_tree.topLevelItemCount()):
+            item = self.branch_tree.topLevelItem(row)
+            checked = category is not None and item.text(1) == CATEGORY_TITLES[category]
+            item.setCheckState(0, Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked)
+        self.branch_tree.blockSignals(False)
+        self._update_delete_button()
+
+    def _checked_branches(self) -> List[str]:
+        names = []
+        for row in range(self.branch_tree.topLevelItemCount()):
+            item = self.branch_tree.topLevelItem(row)
+            if item.checkState(0) == Qt.CheckState.Checked:
+                names.append(item.data(0, Qt.ItemDataRole.UserRole))
+        return names
+
+    @pyqtSlot()
+    def _update_delete_button(self):
+        count = len(self._checked_branches())
+        self.delete_button.setText(f"删除所选分支 ({count})" if count else "删除所选分支")
+        self.delete_button.setEnabled(count > 0)
+
+    @pyqtSlot()
+    def _delete_checked(self):
+        names = self._checked_branches()
+        if not names:
+            return
+        force = self.force_checkbox.isChecked()
+        preview = "\n".join(names[:15]) + ("\n..." if len(names) > 15 else "")
+        message = f"确定要{'强制' if force else ''}删除以下 {len(names)} 个本地分支吗？\n\n{preview}"
+        if not force:
+            message += "\n\n未合并到其上游 (或 HEAD) 的分支不会被删除。"
+        reply = QMessageBox.warning(self, "确认删除本地分支", message,
+                                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.Cancel,
+                                    QMessageBox.StandardButton.Cancel)
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        logging.info(f"批量删除 {len(names)} 个本地分支 ({'-D' if force else '-d'})")
+        self._generation += 1
+        generation = self._generation
+        self.delete_button.setEnabled(False)
+        self.analyze_button.setEnabled(False)
+        self.summary_label.setText(f"正在删除 {len(names)} 个分支...")
+        self._git_handler.delete_branches_async(
+            names, force, lambda rc, so, se, g=generation: self._on_branches_deleted(g, rc, so, se, names))
+
+    def _on_branches_deleted(self, generation: int, return_code: int, stdout: str, stderr: str, names: List[str]):
+        self.analyze_button.setEnabled(True)
+        if generation != self._generation:
+            return
+        if return_code != 0:
+            logging.warning(f"部分分支删除失败: {stderr.strip()}")
+        self._requested_deletes = names
+        self._delete_errors = [line for line in stderr.strip().split('\n') if line.strip()]
+        self.branchesDeleted.emit()
+        self._start_analysis()
+
+    def closeEvent(self, event):
+        self._generation += 1
+        super().closeEvent(event)
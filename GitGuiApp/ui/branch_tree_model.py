@@ -0,0 +1,340 @@
+# ui/branch_tree_model.py
+# -*- coding: utf-8 -*-
+import re
+import time
+import logging
+from bisect import bisect_left
+from typing import Optional, List, Tuple
+from PyQt6.QtGui import QColor, QFont
+from PyQt6.QtCore import Qt, QObject, QModelIndex, QAbstractItemModel
+
+from core.branch_snapshot import BranchInfo, parse_tag_snapshot
+
+BRANCH_NAME_ROLE = Qt.ItemDataRole.UserRole
+# 展开分组或滚动到底部时一次交给视图的行数
+BRANCH_FETCH_ROWS = 500
+
+# 筛选时名称按这些分隔符切开，每一段的开头都可以匹配前缀 ("login" 可以找到 "feature/user-login")
+_NAME_PART_RE = re.compile(r'[/_.-]')
+
+GROUP_LOCAL = "local"
+GROUP_REMOTES = "remotes"
+GROUP_TAGS = "tags"
+
+
+class _BranchGroup:
+    """
+    树中的一个分组: 根、本地分支、远程分支 (子分组为各个远程)、某个远程或标签。
+    有子分组的 groups 不为 None；否则 branches 为全部分支，shown 为筛选后的分支，fetched 为已经交给视图的行数。
+    prefix_keys 为筛选用的前缀索引 [(名称片段, 下标)]，第一次筛选时才建立。
+    """
+    __slots__ = ("key", "title", "parent", "row", "groups", "branches", "shown", "fetched", "prefix_keys")
+
+    def __init__(self, key: str, title: str, parent: Optional["_BranchGroup"], row: int, has_groups: bool = False):
+        self.key = key
+        self.title = title
+        self.parent = parent
+        self.row = row
+        self.groups: Optional[List[_BranchGroup]] = [] if has_groups else None
+        self.branches: List[BranchInfo] = []
+        self.shown: List[BranchInfo] = []
+        self.fetched = 0
+        self.prefix_keys: Optional[List[Tuple[str, int]]] = None
+
+    def set_branches(self, branches: List[BranchInfo]):
+        self.branches = branches
+        self.shown = branches
+        self.fetched = 0
+        self.prefix_keys = None
+
+    def apply_filter(self, prefix: str):
+        """按前缀筛选 (不区分大小写)，保持原来的顺序"""
+        self.fetched = 0
+        if not prefix:
+            self.shown = self.branches
+            return
+        if self.prefix_keys is None:
+            keys = []
+            for position, branch in enumerate(self.branches):
+                name = branch.short_name.lower()
+                keys.append((name, position))
+                for match in _NAME_PART_RE.finditer(name):
+                    if match.end() < len(name):
+                        keys.append((name[match.end():], position))
+            keys.sort()
+            self.prefix_keys = keys
+        keys = self.prefix_keys
+        positions = set()
+        start = bisect_left(keys, (prefix,))
+        while start < len(keys) and keys[start][0].startswith(prefix):
+            positions.add(keys[start][1])
+            start += 1
+        self.shown = [self.branches[position] for position in sorted(positions)]
+
+
+class BranchTreeModel(QAbstractItemModel):
+    """
+    分支面板的树形模型: 本地分支、远程分支 (按远程分组) 和标签。
+    分支只保存在列表中，不为每个分支创建条目；分组展开时通过 canFetchMore/fetchMore 每次交给视图 BRANCH_FETCH_ROWS 行，
+    折叠的分组不产生任何开销。标签在标签分组第一次展开时才读取。筛选使用每个分组的前缀索引。
+    """
+
+    def __init__(self, git_handler, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._git_handler = git_handler
+        self._root = _BranchGroup("", "", None, 0, has_groups=True)
+        self._local = _BranchGroup(GROUP_LOCAL, "本地分支", self._root, 0)
+        self._remotes = _BranchGroup(GROUP_REMOTES, "远程分支", self._root, 1, has_groups=True)
+        self._tags = _BranchGroup(GROUP_TAGS, "标签", self._root, 2)
+        self._root.groups = [self._local, self._remotes, self._tags]
+        self._tags_loaded = False
+        self._tags_loading = False
+        self._filter = ""
+        self._generation = 0
+        self._bold_font = QFont()
+        self._bold_font.setBold(True)
+
+    # --- 数据 ---
+
+    def set_branches(self, branches: List[BranchInfo]):
+        """载入新的分支快照；标签在下次展开标签分组时重新读取"""
+        self.beginResetModel()
+        self._generation += 1
+        self._local.set_branches([branch for branch in branches if not branch.is_remote])
+        remotes = {}
+        for branch in branches:
+            if branch.is_remote:
+                remotes.setdefault(branch.remote_name, []).append(branch)
+        self._remotes.groups = []
+        for row, remote_name in enumerate(sorted(remotes)):
+            group = _BranchGroup(f"{GROUP_REMOTES}/{remote_name}", remote_name, self._remotes, row)
+            group.set_branches(remotes[remote_name])
+            self._remotes.groups.append(group)
+        self._tags.set_branches([])
+        self._tags_loaded = self._tags_loading = False
+        for group in self._leaf_groups():
+            group.apply_filter(self._filter)
+        self.endResetModel()
+
+    def clear(self):
+        self.set_branches([])
+
+    def set_filter(self, text: str):
+        """按前缀筛选各分组中的分支"""
+        prefix = text.strip().lower()
+        if prefix == self._filter:
+            return
+        self.beginResetModel()
+        self._filter = prefix
+        for group in self._leaf_groups():
+            group.apply_filter(prefix)
+        self.endResetModel()
+
+    def filter_text(self) -> str:
+        return self._filter
+
+    def refresh_branches(self, branches: List[BranchInfo]):
+        """分支的领先/落后数等显示内容变化后更新已显示的行"""
+        changed = {id(branch) for branch in branches}
+        for group in self._leaf_groups():
+            rows = [row for row in range(group.fetched) if id(group.shown[row]) in changed]
+            if rows:
+                parent = self._group_index(group)
+                self.dataChanged.emit(self.index(rows[0], 0, parent), self.index(rows[-1], 0, parent))
+
+    def _leaf_groups(self) -> List[_BranchGroup]:
+        return [self._local, self._tags] + list(self._remotes.groups)
+
+    # --- 查找 ---
+
+    def branch_at(self, index: QModelIndex) -> Optional[BranchInfo]:
+        """索引对应的分支；分组行返回 None"""
+        if not index.isValid():
+            return None
+        parent_group = index.internalPointer()
+        if parent_group.groups is not None:
+            return None
+        return parent_group.shown[index.row()] if index.row() < len(parent_group.shown) else None
+
+    def group_key(self, index: QModelIndex) -> Optional[str]:
+        group = self._group_at(index)
+        return group.key if group is not None and group is not self._root else None
+
+    def group_indexes(self) -> List[QModelIndex]:
+        """全部分组的索引 (本地、远程、各个远程、标签)，用于保存和恢复展开状态"""
+        return [self._group_index(group) for group in [self._local, self._remotes, self._tags] + list(self._remotes.groups)]
+
+    def matching_group_indexes(self) -> List[QModelIndex]:
+        """筛选后仍有分支的分组 (尚未读取的标签不算)，筛选时展开它们"""
+        groups = [group for group in self._leaf_groups() if group.shown]
+        if any(group.parent is self._remotes for group in groups):
+            groups.append(self._remotes)
+        return [self._group_index(group) for group in groups]
+
+    def current_branch_index(self) -> QModelIndex:
+        """当前分支 (或分离头指针) 所在的行，必要时先把它之前的行交给视图"""
+        for position, branch in enumerate(self._local.shown):
+            if branch.is_current:
+                self._fetch_to(self._local, position + 1)
+                return self.index(position, 0, self._group_index(self._local))
+        return QModelIndex()
+
+    def _group_at(self, index: QModelIndex) -> Optional[_BranchGroup]:
+        """索引本身代表的分组；根为无效索引，分支行返回 None"""
+        if not index.isValid():
+            return self._root
+        parent_group = index.internalPointer()
+        if parent_group.groups is None:
+            return None
+        return parent_group.groups[index.row()]
+
+    def _group_index(self, group: _BranchGroup) -> QModelIndex:
+        if group is self._root:
+            return QModelIndex()
+        return self.createIndex(group.row, 0, group.parent)
+
+    # --- QAbstractItemModel ---
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        group = self._group_at(parent)
+        if group is None or column != 0 or row < 0:
+            return QModelIndex()
+        if group.groups is not None:
+            if row >= len(group.groups):
+                return QModelIndex()
+        elif row >= group.fetched:
+            return QModelIndex()
+        return self.createIndex(row, column, group)
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self._group_index(index.internalPointer())
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        group = self._group_at(parent)
+        if group is None:
+            return 0
+        return len(group.groups) if group.groups is not None else group.fetched
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        group = self._group_at(parent)
+        if group is None:
+            return False
+        if group.groups is not None:
+            return bool(group.groups)
+        if group is self._tags and not self._tags_loaded:
+            return True
+        return bool(group.shown)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        group = self._group_at(parent)
+        if group is None or group.groups is not None:
+            return False
+        if group is self._tags and not self._tags_loaded:
+            return not self._tags_loading
+        return group.fetched < len(group.shown)
+
+    def fetchMore(self, parent: QModelIndex):
+        group = self._group_at(parent)
+        if group is None or group.groups is not None:
+            return
+        if group is self._tags and not self._tags_loaded:
+            self._load_tags()
+            return
+        self._fetch_to(group, group.fetched + BRANCH_FETCH_ROWS)
+
+    def _fetch_to(self, group: _BranchGroup, count: int):
+        count = min(count, len(group.shown))
+        if count <= group.fetched:
+            return
+        self.beginInsertRows(self._group_index(group), group.fetched, count - 1)
+        group.fetched = count
+        self.endInsertRows()
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        branch = self.branch_at(index)
+        if branch is None:
+            group = self._group_at(index)
+            if group is None:
+                return None
+            if role == Qt.ItemDataRole.DisplayRole:
+                return self._group_title(group)
+            if role == Qt.ItemDataRole.FontRole and group.parent is self._root:
+                return self._bold_font
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            track = branch.track_text()
+            return f"{branch.short_name}  {track}" if track else branch.short_name
+        if role == BRANCH_NAME_ROLE:
+            return branch.name
+        if role == Qt.ItemDataRole.FontRole and branch.is_current:
+            return self._bold_font
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if branch.is_current:
+                return QColor("blue")
+            if branch.is_remote:
+                return QColor("gray")
+            return None
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._tooltip(branch)
+        return None
+
+    def _group_title(self, group: _BranchGroup) -> str:
+        if group is self._tags and not self._tags_loaded:
+            return f"{group.title} (正在读取...)" if self._tags_loading else group.title
+        if group.groups is not None:
+            total = sum(len(child.branches) for child in group.groups)
+            shown = sum(len(child.shown) for child in group.groups)
+        else:
+            total, shown = len(group.branches), len(group.shown)
+        return f"{group.title} ({shown}/{total})" if self._filter else f"{group.title} ({total})"
+
+    @staticmethod
+    def _tooltip(branch: BranchInfo) -> str:
+        lines = [branch.name]
+        if branch.upstream:
+            lines.append(f"上游: {branch.upstream.removeprefix('refs/remotes/')}")
+            if branch.gone:
+                lines.append("上游分支已删除")
+            elif branch.ahead is not None:
+                lines.append(f"领先 {branch.ahead} 个提交，落后 {branch.behind} 个提交")
+        if branch.committer_time:
+            label = "创建时间" if branch.is_tag else "最后提交"
+            lines.append(f"{label}: {time.strftime('%Y-%m-%d %H:%M', time.localtime(branch.committer_time))}")
+        return '\n'.join(lines)
+
+    # --- 标签 ---
+
+    def _load_tags(self):
+        self._tags_loading = True
+        tags_index = self._group_index(self._tags)
+        self.dataChanged.emit(tags_index, tags_index)
+        generation = self._generation
+        self._git_handler.get_tag_snapshot_async(lambda rc, so, se, g=generation: self._on_tags_loaded(g, rc, so, se))
+
+    def _on_tags_loaded(self, generation: int, return_code: int, stdout: str, stderr: str):
+        if generation != self._generation:
+            return
+        self._tags_loading = False
+        self._tags_loaded = True
+        if return_code != 0:
+            logging.error(f"读取标签列表失败: {stderr.strip()}")
+        self._tags.set_branches(parse_tag_snapshot(stdout) if return_code == 0 else [])
+        self._tags.apply_filter(self._filter)
+        tags_index = self._group_index(self._tags)
+        self.dataChanged.emit(tags_index, tags_index)
+        self._fetch_to(self._tags, BRANCH_FETCH_ROWS)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from typing import Optional
+from PyQt6.QtGui import QPainter, QPen, QColor, QBrush
+from PyQt6.QtCore import QObject, QModelIndex, QPointF, QSize
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication
+
+from core.commit_graph import GraphRowLayout
+
+GRAPH_LANE_WIDTH = 14
+GRAPH_NODE_RADIUS = 4.0
+GRAPH_COLORS = [
+    QColor("#1f77b4"), QColor("#d62728"), QColor("#2ca02c"), QColor("#ff7f0e"),
+    QColor("#9467bd"), QColor("#8c564b"), QColor("#e377c2"), QColor("#17becf"),
+]
+
+
+class CommitGraphDelegate(QStyledItemDelegate):
+    """根据 CommitGraph 计算的布局绘制提交图，只绘制视图请求的可见行"""
+
+    def __init__(self, graph_role: int, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._graph_role = graph_role
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_PanelItemViewItem, opt, painter, opt.widget)
+
+        layout: Optional[GraphRowLayout] = index.data(self._graph_role)
+        if layout is None:
+            return
+
+        rect = option.rect
+        top = float(rect.top())
+        bottom = float(rect.bottom() + 1)
+        middle = (top + bottom) / 2
+        left = rect.left() + GRAPH_LANE_WIDTH / 2
+
+        def lane_x(lane: int) -> float:
+            return left + lane * GRAPH_LANE_WIDTH
+
+        painter.save()
+        painter.setClipRect(rect)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pen = QPen()
+        pen.setWidthF(2.0)
+        for start, end, color in layout.up:
+            pen.setColor(GRAPH_COLORS[color % len(GRAPH_COLORS)])
+            painter.setPen(pen)
+            painter.drawLine(QPointF(lane_x(start), top), QPointF(lane_x(end), middle))
+        for start, end, color in layout.down:
+            pen.setColor(GRAPH_COLORS[color % len(GRAPH_COLORS)])
+            painter.setPen(pen)
+            painter.drawLine(QPointF(lane_x(start), middle), QPointF(lane_x(end), bottom))
+
+        node_color = GRAPH_COLORS[layout.color % len(GRAPH_COLORS)]
+        pen.setColor(node_color)
+        painter.setPen(pen)
+        # 合并提交画成空心圆
+        painter.setBrush(QBrush(opt.palette.base().color() if layout.is_merge else node_color))
+        painter.drawEllipse(QPointF(lane_x(layout.node), middle), GRAPH_NODE_RADIUS, GRAPH_NODE_RADIUS)
+        painter.restore()
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        layout: Optional[GraphRowLayout] = index.data(self._graph_role)
+        width = layout.width if layout is not None else 1
+        return QSize(width * GRAPH_LANE_WIDTH + 4, option.fontMetrics.height())
@@ -0,0 +1,267 @@
+# ui/compare_dialog.py
+# -*- coding: utf-8 -*-
+import logging
+from typing import Optional, List
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QCheckBox,
+    QListWidget, QListWidgetItem, QSplitter
+)
+from PyQt6.QtGui import QColor
+from PyQt6.QtCore import Qt, pyqtSlot
+
+from .lazy_diff_view import LazyDiffView
+from core.diff_cache import DiffCache, load_patches
+from core.diff_parser import DiffFile, parse_raw_numstat_z, parse_numstat_z, format_diffstat
+from core.lru_cache import LRUCache
+
+_STATUS_COLORS = {'A': QColor("darkGreen"), 'D': QColor("red"), 'R': QColor("darkBlue"), 'C': QColor("darkBlue")}
+
+
+class CompareDialog(QDialog):
+    """
+    比较两个引用 (基准...比较): 先显示合并基础到比较端的文件列表 (检测重命名，只有 raw 记录，立即返回)，
+    再另外获取行数统计补到列表中；选中文件时才加载它的补丁。
+    文件列表和行数统计按 (合并基础, 比较端) 放入共享的 LRU 缓存；补丁通过差异缓存按 blob id 复用。
+    """
+
+    def __init__(self, git_handler, diff_cache: DiffCache, file_list_cache: LRUCache, word_diff_engine, syntax_cache,
+                 refs: List[str], base_ref: str = "", tip_ref: str = "", parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle("比较分支/提交")
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(1100, 700)
+
+        self._git_handler = git_handler
+        self._diff_cache = diff_cache
+        self._file_list_cache = file_list_cache
+        self._generation = 0
+        # 当前比较的两端 (提交哈希): 合并基础和比较端
+        self._base_oid = ""
+        self._tip_oid = ""
+        self._files: List[DiffFile] = []
+        self._stats_pending = False
+        self._note = ""
+
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(QLabel("基准:"))
+        self.base_combo = self._ref_combo(refs, base_ref)
+        top_layout.addWidget(self.base_combo, 1)
+        top_layout.addWidget(QLabel("..."))
+        self.tip_combo = self._ref_combo(refs, tip_ref)
+        top_layout.addWidget(self.tip_combo, 1)
+        swap_button = QPushButton("交换")
+        swap_button.clicked.connect(self._swap_refs)
+        top_layout.addWidget(swap_button)
+        self.compare_button = QPushButton("比较")
+        self.compare_button.setDefault(True)
+        self.compare_button.clicked.connect(self._start_compare)
+        top_layout.addWidget(self.compare_button)
+        layout.addLayout(top_layout)
+
+        self.summary_label = QLabel("")
+        self.summary_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(self.summary_label)
+
+        self.file_list = QListWidget()
+        self.file_list.currentRowChanged.connect(self._on_file_selected)
+
+        diff_widget = QWidget()
+        diff_layout = QVBoxLayout(diff_widget)
+        diff_layout.setContentsMargins(0, 0, 0, 0)
+        diff_header_layout = QHBoxLayout()
+        diff_header_layout.addStretch()
+        side_by_side_checkbox = QCheckBox("并排显示")
+        diff_header_layout.addWidget(side_by_side_checkbox)
+        diff_layout.addLayout(diff_header_layout)
+        self.diff_view = LazyDiffView()
+        if word_diff_engine is not None:
+            self.diff_view.set_word_diff_engine(word_diff_engine)
+        if syntax_cache is not None:
+            self.diff_view.set_syntax_cache(syntax_cache)
+        side_by_side_checkbox.toggled.connect(self.diff_view.set_side_by_side)
+        self.diff_view.setPlaceholderText("选中左侧文件以查看差异...")
+        diff_layout.addWidget(self.diff_view, 1)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        splitter.addWidget(self.file_list)
+        splitter.addWidget(diff_widget)
+        splitter.setSizes([350, 750])
+        layout.addWidget(splitter, 1)
+
+        if base_ref and tip_ref:
+            self._start_compare()
+
+    def _ref_combo(self, refs: List[str], current: str) -> QComboBox:
+        combo = QComboBox()
+        combo.setEditable(True)
+        combo.addItems(refs)
+        combo.setCurrentText(current)
+        combo.lineEdit().returnPressed.connect(self._start_compare)
+        return combo
+
+    @pyqtSlot()
+    def _swap_refs(self):
+        base_ref, tip_ref = self.base_combo.currentText(), self.tip_combo.currentText()
+        self.base_combo.setCurrentText(tip_ref)
+        self.tip_combo.setCurrentText(base_ref)
+        self._start_compare()
+
+    # --- 文件列表 ---
+
+    @pyqtSlot()
+    def _start_compare(self):
+        base_ref = self.base_combo.currentText().strip()
+        tip_ref = self.tip_combo.currentText().strip() or "HEAD"
+        if not base_ref:
+            self.summary_label.setText("请输入基准分支或提交。")
+            return
+        if base_ref.startswith('-') or tip_ref.startswith('-'):
+            self.summary_label.setText("❌ 引用名不能以 '-' 开头。")
+            return
+        self._generation += 1
+        generation = self._generation
+        self._files = []
+        self._stats_pending = False
+        self.file_list.clear()
+        self.diff_view.clear()
+        self.setWindowTitle(f"比较 {base_ref}...{tip_ref}")
+        self.summary_label.setText(f"正在解析 {base_ref} 和 {tip_ref}...")
+        self._git_handler.resolve_commits_async(
+            [base_ref, tip_ref],
+            lambda rc, so, se, g=generation: self._on_refs_resolved(g, rc, so, se, base_ref, tip_ref)
+        )
+
+    def _on_refs_resolved(self, generation: int, return_code: int, stdout: str, stderr: str, base_ref: str, tip_ref: str):
+        if generation != self._generation:
+            return
+        oids = stdout.split()
+        if return_code != 0 or len(oids) != 2:
+            error = stderr.strip().split('\n')[0]
+            self.summary_label.setText(f"❌ 无法解析 '{base_ref}' 或 '{tip_ref}': {error}")
+            return
+        base_commit, tip_commit = oids
+        self._git_handler.get_merge_base_async(
+            base_commit, tip_commit,
+            lambda rc, so, se, g=generation: self._on_merge_base_received(g, rc, so, se, base_commit, tip_commit)
+        )
+
+    def _on_merge_base_received(self, generation: int, return_code: int, stdout: str, stderr: str, base_commit: str, tip_commit: str):
+        if generation != self._generation:
+            return
+        merge_base = stdout.strip()
+        note = ""
+        if return_code != 0 or not merge_base:
+            if stderr.strip():
+                self.summary_label.setText(f"❌ 查找合并基础失败: {stderr.strip()}")
+                return
+            # 没有共同祖先时直接比较两端
+            merge_base = base_commit
+            note = " (没有共同祖先，直接比较两端)"
+        self._base_oid, self._tip_oid = merge_base, tip_commit
+        key = (merge_base, tip_commit, tuple(self._git_handler.get_scope()))
+        self._note = note
+        # 缓存条目为 (raw 输出, numstat 输出)，行数统计尚未取得时后者为 None
+        cached = self._file_list_cache.get(key)
+        if cached is not None:
+            logging.debug(f"比较文件列表缓存命中: {merge_base[:7]}...{tip_commit[:7]}")
+            raw_output, numstat_output = cached
+            self._show_files(raw_output, numstat_output)
+            if numstat_output is None:
+                self._request_numstat(generation, key, raw_output)
+            return
+        self.summary_label.setText(f"正在列出 {merge_base[:7]}...{tip_commit[:7]} 的文件...")
+        self._git_handler.get_compare_files_async(
+            merge_base, tip_commit,
+            lambda rc, so, se, g=generation, k=key: self._on_files_received(g, rc, so, se, k)
+        )
+
+    def _on_files_received(self, generation: int, return_code: int, stdout: str, stderr: str, key: tuple):
+        if generation != self._generation:
+            return
+        if return_code != 0:
+            self.summary_label.setText(f"❌ 获取文件列表失败: {stderr.strip()}")
+            return
+        self._file_list_cache.put(key, (stdout, None))
+        self._show_files(stdout, None)
+        self._request_numstat(generation, key, stdout)
+
+    def _request_numstat(self, generation: int, key: tuple, raw_output: str):
+        if not self._files:
+            return
+        self._git_handler.get_compare_numstat_async(
+            self._base_oid, self._tip_oid,
+            lambda rc, so, se, g=generation, k=key, raw=raw_output: self._on_numstat_received(g, rc, so, se, k, raw)
+        )
+
+    def _on_numstat_received(self, generation: int, return_code: int, stdout: str, stderr: str, key: tuple, raw_output: str):
+        if generation != self._generation:
+            return
+        self._stats_pending = False
+        if return_code != 0:
+            logging.error(f"获取比较的行数统计失败: {stderr.strip()}")
+            self._update_summary(f"  ⚠️ 获取行数统计失败: {stderr.strip()}")
+            self.diff_view.set_file_stats_failed(f"⚠️ 获取行数统计失败，请手动展开文件: {stderr.strip()}")
+            return
+        self._file_list_cache.put(key, (raw_output, stdout))
+        stats = parse_numstat_z(stdout)
+        for row, diff_file in enumerate(self._files):
+            diff_file.added, diff_file.removed = stats.get(diff_file.path, (None, None))
+            item = self.file_list.item(row)
+            if item is not None:
+                item.setText(self._item_text(diff_file))
+        self._update_summary()
+        # 统计到达前选中的文件保持折叠，补上统计后按大小决定是否自动展开
+        row = self.file_list.currentRow()
+        if 0 <= row < len(self._files):
+            selected = self._files[row]
+            self.diff_view.set_file_stats({selected.path: (selected.added, selected.removed)})
+
+    def _show_files(self, raw_output: str, numstat_output: Optional[str]):
+        self._stats_pending = numstat_output is None
+        self._files = parse_raw_numstat_z(raw_output + (numstat_output or ""))
+        self._update_summary()
+        self.file_list.setUpdatesEnabled(False)
+        for diff_file in self._files:
+            item = QListWidgetItem(self._item_text(diff_file))
+            color = _STATUS_COLORS.get(diff_file.status)
+            if color is not None:
+                item.setForeground(color)
+            self.file_list.addItem(item)
+        self.file_list.setUpdatesEnabled(True)
+        if not self._files:
+            self.diff_view.setPlaceholderText("两端之间没有差异。")
+
+    def _item_text(self, diff_file: DiffFile) -> str:
+        stats = "..." if self._stats_pending else format_diffstat(diff_file.added, diff_file.removed)
+        return f"{diff_file.status}  {diff_file.display_path}  ({stats})"
+
+    def _update_summary(self, suffix: str = ""):
+        text = f"合并基础 {self._base_oid[:7]} → {self._tip_oid[:7]}: {len(self._files)} 个文件"
+        if self._stats_pending:
+            text += " (正在统计行数...)"
+        elif not suffix:
+            added = sum(diff_file.added or 0 for diff_file in self._files)
+            removed = sum(diff_file.removed or 0 for diff_file in self._files)
+            text += f"，+{added} -{removed}"
+        self.summary_label.setText(text + self._note + suffix)
+
+    # --- 单个文件的差异 ---
+
+    @pyqtSlot(int)
+    def _on_file_selected(self, row: int):
+        if not 0 <= row < len(self._files):
+            return
+        base_oid, tip_oid = self._base_oid, self._tip_oid
+        self.diff_view.set_diff_files(
+            "", [self._files[row]],
+            lambda files, done: load_patches(
+                self._diff_cache, files, done,
+                lambda missing, slot: self._git_handler.get_compare_patch_async(
+                    base_oid, tip_oid, [path for diff_file in missing for path in diff_file.pathspecs], slot)),
+            stats_pending=self._stats_pending
+        )
+
+    def closeEvent(self, event):
+        self._generation += 1
+        super().closeEvent(event)
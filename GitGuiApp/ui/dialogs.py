@@ -3,10 +3,10 @@
 import logging
 from PyQt6.QtWidgets import (
     QDialog, QLineEdit, QTextEdit, QFormLayout,
-    QPushButton, QDialogButtonBox, QLabel
+    QPushButton, QDialogButtonBox, QLabel, QComboBox, QCheckBox
 )
 from PyQt6.QtCore import Qt
-from typing import Optional
+from typing import Optional, List
 
 
 class ShortcutDialog(QDialog):
@@ -78,4 +78,48 @@ class SettingsDialog(QDialog):
         return {
             "user.name": self.name_edit.text().strip(),
             "user.email": self.email_edit.text().strip()
-        }
\ No newline at end of file
+        }
+
+
+class PushBranchesDialog(QDialog):
+    def __init__(self, parent: Optional[QDialog] = None, branch_names: List[str] = (), remotes: List[str] = (), default_remote: str = ""):
+        super().__init__(parent)
+        self.setWindowTitle(f"推送 {len(branch_names)} 个分支")
+        self.setMinimumWidth(420)
+
+        layout = QFormLayout(self)
+
+        self.remote_combo = QComboBox()
+        self.remote_combo.addItems(remotes)
+        if default_remote in remotes:
+            self.remote_combo.setCurrentText(default_remote)
+        self.branches_edit = QTextEdit('\n'.join(branch_names))
+        self.branches_edit.setReadOnly(True)
+        self.branches_edit.setMaximumHeight(120)
+        self.upstream_checkbox = QCheckBox("设置为各分支的上游跟踪分支 (-u)")
+        self.lease_checkbox = QCheckBox("允许强制推送 (--force-with-lease)")
+        self.lease_checkbox.setToolTip("以上次刷新分支列表时看到的远程分支为期望值，\n远程分支在此之后被他人更新时拒绝推送。")
+
+        layout.addRow("远程仓库:", self.remote_combo)
+        layout.addRow("分支:", self.branches_edit)
+        layout.addRow(self.upstream_checkbox)
+        layout.addRow(self.lease_checkbox)
+        layout.addWidget(QLabel("所有分支在一次原子推送中更新 (推送到远程的同名分支)：\n任何一个被拒绝时，远程上的分支都不会改变。"))
+
+        self._setup_button_box(layout)
+
+    def _setup_button_box(self, layout: QFormLayout):
+        self._button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        ok_button = self._button_box.button(QDialogButtonBox.StandardButton.Ok)
+        if ok_button:
+            ok_button.setText("推送")
+        self._button_box.accepted.connect(self.accept)
+        self._button_box.rejected.connect(self.reject)
+        layout.addRow(self._button_box)
+
+    def get_data(self) -> dict:
+        return {
+            "remote": self.remote_combo.currentText().strip(),
+            "set_upstream": self.upstream_checkbox.isChecked(),
+            "force_with_lease": self.lease_checkbox.isChecked()
+        }
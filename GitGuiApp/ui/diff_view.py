@@ -0,0 +1,254 @@
+# ui/diff_view.py
+# -*- coding: utf-8 -*-
+import re
+import time
+from bisect import bisect_right
+from typing import Optional, List, Tuple
+from PyQt6.QtWidgets import QPlainTextEdit, QWidget
+from PyQt6.QtGui import QColor, QFont, QTextCharFormat, QTextLayout, QTextBlock
+from PyQt6.QtCore import QRect, QTimer
+
+from core.syntax_highlight import (
+    SyntaxTokenCache, Language, language_for_path,
+    TOKEN_KEYWORD, TOKEN_STRING, TOKEN_COMMENT, TOKEN_NUMBER, TOKEN_DECORATOR
+)
+
+# 已经设置过颜色的块用 userState 标记，新建块的 userState 为 -1
+_BLOCK_FORMATTED = 1
+# 每次着色中语法分析可用的时间，用完后未缓存的行先只按差异着色，下一轮事件循环再继续
+SYNTAX_FRAME_BUDGET_MS = 8
+
+# 整体载入的差异文本中的文件头和 index 行，用于确定每个块属于哪个文件 (语言) 和 blob
+_FILE_HEADER_RE = re.compile(r'^(?:diff --git a/.* b/(?P<path>.*)|index (?P<old>[0-9a-f]+)\.\.(?P<new>[0-9a-f]+).*)$', re.MULTILINE)
+
+
+def _make_format(color: str, bold: bool = False, italic: bool = False, background: Optional[str] = None) -> QTextCharFormat:
+    fmt = QTextCharFormat()
+    fmt.setForeground(QColor(color))
+    if bold:
+        fmt.setFontWeight(QFont.Weight.Bold)
+    if italic:
+        fmt.setFontItalic(True)
+    if background:
+        fmt.setBackground(QColor(background))
+    return fmt
+
+
+class DiffView(QPlainTextEdit):
+    """
+    差异显示控件。文本通过 setPlainText 一次性载入 (不逐行插入)，
+    颜色不在载入时计算，而是在块滚动进入可见区域时才设置，显示时间与差异总行数基本无关。
+    设置 SyntaxTokenCache 后，认识的语言的代码行再按语法着色: 同样只分析可见的行，结果按 blob 缓存，
+    每轮着色的分析时间有上限，超出的行在之后的事件循环中补上。
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        font = QFont("Courier New")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        self.setFont(font)
+        self._add_format = _make_format("darkGreen", bold=True)
+        self._del_format = _make_format("red")
+        self._header_format = _make_format("darkCyan", bold=True)
+        self._hunk_header_format = _make_format("darkCyan", bold=True, italic=True)
+        self._conflict_format = _make_format("orange", bold=True, background="#404000")
+        # 语法着色时新增/删除行改用底色区分，前景色留给词元
+        self._add_line_format = _make_format("darkGreen", background="#e6f6e6")
+        self._del_line_format = _make_format("darkRed", background="#fbe9e9")
+        self._token_formats = {
+            TOKEN_KEYWORD: _make_format("#0000a0", bold=True),
+            TOKEN_STRING: _make_format("#a31515"),
+            TOKEN_COMMENT: _make_format("#707070", italic=True),
+            TOKEN_NUMBER: _make_format("#098658"),
+            TOKEN_DECORATOR: _make_format("#7a3e9d"),
+        }
+        self._syntax_cache: Optional[SyntaxTokenCache] = None
+        # set_diff_text 载入的文本中各文件的起始块号和 (语言, 旧 blob 键, 新 blob 键)
+        self._syntax_file_starts: List[int] = []
+        self._syntax_files: List[Tuple[Optional[Language], str, str]] = []
+        # set_file_text 载入的文件内容从该块开始 (-1 表示没有)
+        self._file_text_first_block = -1
+        self._file_text_language: Optional[Language] = None
+        self._file_text_blob_key = ""
+        self._syntax_deadline = 0.0
+        self._syntax_deferred = 0
+        self._formatting = False
+        self._syntax_timer = QTimer(self)
+        self._syntax_timer.setSingleShot(True)
+        self._syntax_timer.setInterval(0)
+        self._syntax_timer.timeout.connect(self._format_visible_blocks)
+        self.updateRequest.connect(self._on_update_request)
+
+    def set_syntax_cache(self, cache: Optional[SyntaxTokenCache]):
+        """设置共用的语法词元缓存以启用语法着色 (None 关闭)"""
+        self._syntax_cache = cache
+        self.refresh_formats()
+
+    def setPlainText(self, text: str):
+        self._reset_syntax_files()
+        super().setPlainText(text)
+
+    def clear(self):
+        self._reset_syntax_files()
+        super().clear()
+
+    def _reset_syntax_files(self):
+        self._syntax_file_starts, self._syntax_files = [], []
+        self._file_text_first_block = -1
+
+    def set_diff_text(self, diff_text: str):
+        """载入差异文本并滚动到开头"""
+        self.setPlainText(diff_text)
+        self._index_diff_files(diff_text)
+        self.verticalScrollBar().setValue(0)
+        # setPlainText 时可见的块可能已经按差异着色，文件索引建好后重新着色
+        self.refresh_formats()
+
+    def set_file_text(self, title: str, path: str, content: str):
+        """显示一个文件的内容 (如未跟踪文件)，标题之后的行不按差异着色，按文件类型做语法着色"""
+        self.setPlainText(f"{title}\n\n{content}")
+        self._file_text_first_block = title.count('\n') + 2
+        self._file_text_language = language_for_path(path)
+        self._file_text_blob_key = f"path:{path}"
+        self.verticalScrollBar().setValue(0)
+        self.refresh_formats()
+
+    def _index_diff_files(self, diff_text: str):
+        """记录差异文本中每个文件的起始块号、语言和两侧 blob (index 行中的缩写 id)"""
+        block_number = 0
+        position = 0
+        for match in _FILE_HEADER_RE.finditer(diff_text):
+            block_number += diff_text.count('\n', position, match.start())
+            position = match.start()
+            path = match.group('path')
+            if path is not None:
+                self._syntax_file_starts.append(block_number)
+                self._syntax_files.append((language_for_path(path), f"path:{path}", f"path:{path}"))
+            elif self._syntax_files:
+                language = self._syntax_files[-1][0]
+                self._syntax_files[-1] = (language, match.group('old'), match.group('new'))
+
+    def line_format(self, line: str) -> Optional[QTextCharFormat]:
+        if line.startswith(('diff ', 'index ', '--- ', '+++ ')):
+            return self._header_format
+        if line.startswith('@@ '):
+            return self._hunk_header_format
+        if line.startswith('+'):
+            return self._add_format
+        if line.startswith('-'):
+            return self._del_format
+        if line.startswith(('<<<<<<< ', '=======', '>>>>>>> ')):
+            return self._conflict_format
+        return None
+
+    def block_formats(self, block: QTextBlock) -> List[QTextLayout.FormatRange]:
+        """块的颜色范围，子类可以覆盖以提供更细的着色"""
+        text = block.text()
+        number = block.blockNumber()
+        if 0 <= self._file_text_first_block <= number:
+            if self._file_text_language is None:
+                return []
+            return self.code_formats(self._file_text_language, self._file_text_blob_key, text, 0) or []
+        fmt = self.line_format(text)
+        if (self._syntax_cache is not None and self._syntax_files and text[:1] in (' ', '+', '-')
+                and (fmt is None or fmt is self._add_format or fmt is self._del_format)):
+            index = bisect_right(self._syntax_file_starts, number) - 1
+            if index >= 0 and self._syntax_files[index][0] is not None:
+                formats = self.patch_line_formats(text, 0, *self._syntax_files[index])
+                if formats is not None:
+                    return formats
+        if fmt is None or not text:
+            return []
+        format_range = QTextLayout.FormatRange()
+        format_range.start = 0
+        format_range.length = len(text)
+        format_range.format = fmt
+        return [format_range]
+
+    def code_formats(self, language: Language, blob_key: str, code: str, column: int) -> Optional[List[QTextLayout.FormatRange]]:
+        """
+        一行代码的语法颜色 (从块中的 column 列开始)。未启用语法着色时返回空列表；
+        本轮的分析时间已用完且这一行没有缓存时返回 None，之后会再次着色。
+        """
+        cache = self._syntax_cache
+        if cache is None or not code:
+            return []
+        tokens = cache.get(blob_key, language, code)
+        if tokens is None:
+            now = time.perf_counter()
+            if not self._syntax_deadline:
+                self._syntax_deadline = now + SYNTAX_FRAME_BUDGET_MS / 1000
+            elif now > self._syntax_deadline:
+                self._syntax_deferred += 1
+                return None
+            tokens = cache.tokens(blob_key, language, code)
+        formats = []
+        for start, length, kind in tokens:
+            format_range = QTextLayout.FormatRange()
+            format_range.start = column + start
+            format_range.length = length
+            format_range.format = self._token_formats[kind]
+            formats.append(format_range)
+        return formats
+
+    def patch_line_formats(self, line: str, column: int, language: Language, old_blob_key: str, new_blob_key: str) -> Optional[List[QTextLayout.FormatRange]]:
+        """补丁中一行代码 (带 +/-/空格 前缀，从 column 列开始) 的颜色: 新增/删除行的底色加上语法颜色；返回 None 的含义同 code_formats"""
+        tokens = self.code_formats(language, old_blob_key if line.startswith('-') else new_blob_key, line[1:], column + 1)
+        if tokens is None:
+            return None
+        if line[:1] not in ('+', '-'):
+            return tokens
+        format_range = QTextLayout.FormatRange()
+        format_range.start = column
+        format_range.length = len(line)
+        format_range.format = self._add_line_format if line.startswith('+') else self._del_line_format
+        return [format_range] + tokens
+
+    def refresh_formats(self):
+        """重新计算可见块的颜色 (着色所依赖的数据变化后调用)"""
+        block = self.firstVisibleBlock()
+        bottom = self.viewport().rect().bottom()
+        offset = self.contentOffset()
+        while block.isValid() and self.blockBoundingGeometry(block).translated(offset).top() <= bottom:
+            block.setUserState(-1)
+            block = block.next()
+        self._format_visible_blocks()
+
+    def _on_update_request(self, rect: QRect, dy: int):
+        self._format_visible_blocks()
+
+    def _format_visible_blocks(self):
+        block = self.firstVisibleBlock()
+        # markContentsDirty 会同步触发 updateRequest，外层的循环已经在处理可见块
+        if not block.isValid() or self._formatting:
+            return
+        self._formatting = True
+        # 本轮第一次语法分析时才开始计时，每轮至少分析一行
+        self._syntax_deadline = 0.0
+        deferred_before = self._syntax_deferred
+        try:
+            document = self.document()
+            offset = self.contentOffset()
+            bottom = self.viewport().rect().bottom()
+            while block.isValid():
+                top = self.blockBoundingGeometry(block).translated(offset).top()
+                if top > bottom:
+                    break
+                if block.userState() != _BLOCK_FORMATTED:
+                    # 先标记再设置格式: markContentsDirty 会再次触发 updateRequest
+                    block.setUserState(_BLOCK_FORMATTED)
+                    deferred = self._syntax_deferred
+                    formats = self.block_formats(block)
+                    if self._syntax_deferred != deferred:
+                        # 语法分析被推迟，先按差异着色，之后再来
+                        block.setUserState(-1)
+                    if formats:
+                        block.layout().setFormats(formats)
+                        document.markContentsDirty(block.position(), block.length())
+                block = block.next()
+        finally:
+            self._formatting = False
+        if self._syntax_deferred != deferred_before:
+            self._syntax_timer.start()
@@ -0,0 +1,227 @@
+# ui/file_history_dialog.py
+# -*- coding: utf-8 -*-
+import time
+import logging
+from typing import Optional
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QCheckBox, QPushButton,
+    QTableView, QSplitter, QHeaderView, QAbstractItemView, QMessageBox
+)
+from PyQt6.QtCore import Qt, pyqtSlot
+
+from .diff_view import DiffView
+from .log_table_model import LogTableModel, LOG_COL_GRAPH, LOG_COL_COMMIT, LOG_COL_AUTHOR, LOG_COL_DATE, LOG_COL_MESSAGE
+
+
+class FileHistoryDialog(QDialog):
+    """
+    单个文件的提交历史: 流式分页的 'git log [--follow] -- <path>'，滚动到底部时加载下一页。
+    显示首页和全部加载完成的耗时；commit-graph 缺少路径变更 Bloom 过滤器时可以在此写入，写入后重新查询以对比耗时。
+    """
+
+    def __init__(self, git_handler, file_path: str, syntax_cache=None, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle(f"文件历史 - {file_path}")
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(900, 600)
+
+        self._git_handler = git_handler
+        self._file_path = file_path
+        self._start_time = 0.0
+        self._first_page_ms: Optional[float] = None
+        self._last_timing = ""
+        self._previous_timing: Optional[str] = None
+        self._details_commit: Optional[str] = None
+
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        path_label = QLabel(f"文件: {file_path}")
+        path_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        top_layout.addWidget(path_label, 1)
+        self.follow_checkbox = QCheckBox("跟踪重命名 (--follow)")
+        self.follow_checkbox.setChecked(True)
+        self.follow_checkbox.setToolTip("包含文件重命名之前的历史。\n注意: 使用 --follow 时 git 不会使用路径变更 Bloom 过滤器。")
+        self.follow_checkbox.toggled.connect(self._start_query)
+        top_layout.addWidget(self.follow_checkbox)
+        self.refresh_button = QPushButton("重新查询")
+        self.refresh_button.clicked.connect(self._start_query)
+        top_layout.addWidget(self.refresh_button)
+        layout.addLayout(top_layout)
+
+        self.model = LogTableModel(git_handler, self)
+        self.model.firstPageLoaded.connect(self._on_first_page_loaded)
+        self.model.loadFinished.connect(self._on_load_finished)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table_view.verticalHeader().setVisible(False)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(self.table_view.fontMetrics().height() + 6)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table_view.horizontalHeader().setSectionResizeMode(LOG_COL_MESSAGE, QHeaderView.ResizeMode.Stretch)
+        # --follow 不改写父提交，提交图的连线没有意义
+        self.table_view.setColumnHidden(LOG_COL_GRAPH, True)
+        self.table_view.setWordWrap(False)
+        self.table_view.selectionModel().selectionChanged.connect(self._on_selection_changed)
+
+        self.details_edit = DiffView()
+        if syntax_cache is not None:
+            self.details_edit.set_syntax_cache(syntax_cache)
+        self.details_edit.setPlaceholderText("选中提交以查看该文件的改动...")
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.table_view)
+        splitter.addWidget(self.details_edit)
+        splitter.setSizes([350, 250])
+        layout.addWidget(splitter, 1)
+
+        self.timing_label = QLabel("")
+        layout.addWidget(self.timing_label)
+
+        bloom_layout = QHBoxLayout()
+        self.bloom_label = QLabel("")
+        self.bloom_label.setWordWrap(True)
+        bloom_layout.addWidget(self.bloom_label, 1)
+        self.write_graph_button = QPushButton("写入 commit-graph (--changed-paths)")
+        self.write_graph_button.setToolTip("运行 'git commit-graph write --reachable --changed-paths'，\n为每个提交记录变更路径的 Bloom 过滤器，按路径查询历史时可跳过绝大部分提交。")
+        self.write_graph_button.clicked.connect(self._write_commit_graph)
+        bloom_layout.addWidget(self.write_graph_button)
+        layout.addLayout(bloom_layout)
+
+        self._update_bloom_status()
+        self._start_query()
+
+    def _log_args(self) -> list:
+        # 跟踪重命名时同时输出每个提交中该文件的路径，重命名之前的提交按当时的路径查看改动
+        args = ['--follow', '--name-status'] if self.follow_checkbox.isChecked() else []
+        return args + ['--', self._file_path]
+
+    def _paths_for_row(self, row: int) -> list:
+        """
+        该提交中文件的路径: 提交本身改动了文件时取其记录 (重命名为旧、新两个路径)，
+        否则 (如合并提交) 取更早的最近一次改动之后的路径；没有记录时为当前路径。
+        """
+        for candidate in range(row, self.model.rowCount()):
+            paths = self.model.changed_paths(candidate)
+            if paths:
+                return paths if candidate == row else paths[-1:]
+        return [self._file_path]
+
+    @pyqtSlot()
+    def _start_query(self):
+        self._details_commit = None
+        self.details_edit.clear()
+        self._first_page_ms = None
+        self._last_timing = ""
+        self.timing_label.setText("正在查询...")
+        self._update_bloom_status()
+        logging.info(f"查询文件历史: {self._file_path} ({' '.join(self._log_args())})")
+        self._start_time = time.perf_counter()
+        self.model.start(self._log_args())
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start_time) * 1000
+
+    def _update_bloom_status(self):
+        has_filters = self._git_handler.has_changed_path_filters()
+        if has_filters:
+            text = "路径变更 Bloom 过滤器: 已启用。"
+            if self.follow_checkbox.isChecked():
+                text += " 使用 --follow 时 git 不使用这些过滤器，取消勾选可加快查询。"
+        else:
+            text = "路径变更 Bloom 过滤器: 未启用。写入 commit-graph 后按路径查询历史通常快得多。"
+        self.bloom_label.setText(text)
+        self.write_graph_button.setEnabled(not has_filters)
+
+    def _show_timing(self, total_ms: Optional[float] = None):
+        parts = []
+        if self._first_page_ms is not None:
+            parts.append(f"首页 {self._first_page_ms:.0f} ms")
+        if total_ms is not None:
+            parts.append(f"全部 {self.model.rowCount()} 个提交 {total_ms:.0f} ms")
+        self._last_timing = "，".join(parts)
+        text = f"耗时: {self._last_timing}"
+        if total_ms is None:
+            text += "  (滚动到底部加载更多)"
+        if self._previous_timing:
+            text += f"  (写入 commit-graph 之前: {self._previous_timing})"
+        self.timing_label.setText(text)
+
+    @pyqtSlot()
+    def _on_first_page_loaded(self):
+        self._first_page_ms = self._elapsed_ms()
+        self._show_timing()
+        self.table_view.resizeColumnToContents(LOG_COL_COMMIT)
+        self.table_view.resizeColumnToContents(LOG_COL_AUTHOR)
+        self.table_view.resizeColumnToContents(LOG_COL_DATE)
+
+    @pyqtSlot(int, str)
+    def _on_load_finished(self, return_code: int, stderr: str):
+        total_ms = self._elapsed_ms()
+        if return_code != 0:
+            self.timing_label.setText(f"❌ 查询失败: {stderr.strip()}")
+            return
+        if self._first_page_ms is None:
+            self._first_page_ms = total_ms
+        self._show_timing(total_ms)
+        logging.info(f"文件历史 {self._file_path}: {self.model.rowCount()} 个提交，{total_ms:.0f} ms")
+
+    @pyqtSlot()
+    def _write_commit_graph(self):
+        reply = QMessageBox.question(
+            self, "写入 commit-graph",
+            "将运行:\n  git commit-graph write --reachable --changed-paths\n\n大型仓库可能需要几分钟，完成后重新查询以对比耗时。是否继续？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        self._previous_timing = self._last_timing or None
+        self.write_graph_button.setEnabled(False)
+        self.bloom_label.setText("正在写入 commit-graph...")
+        start = time.perf_counter()
+        self._git_handler.write_commit_graph_async(
+            lambda rc, so, se, t=start: self._on_commit_graph_written(rc, se, t)
+        )
+
+    def _on_commit_graph_written(self, return_code: int, stderr: str, start: float):
+        elapsed = time.perf_counter() - start
+        if return_code != 0:
+            logging.error(f"写入 commit-graph 失败: {stderr.strip()}")
+            QMessageBox.warning(self, "写入 commit-graph 失败", stderr.strip() or f"返回码 {return_code}")
+            self._previous_timing = None
+            self._update_bloom_status()
+            return
+        logging.info(f"commit-graph (含路径变更 Bloom 过滤器) 写入完成，用时 {elapsed:.1f} 秒。")
+        self._start_query()
+
+    @pyqtSlot()
+    def _on_selection_changed(self):
+        rows = self.table_view.selectionModel().selectedRows()
+        commit_hash = self.model.commit_oid(rows[0].row()) if rows else None
+        paths = self._paths_for_row(rows[0].row()) if rows else []
+        self._details_commit = commit_hash
+        self.details_edit.clear()
+        if not commit_hash:
+            return
+        self.details_edit.setPlaceholderText(f"正在加载 {commit_hash[:7]}...")
+        self._git_handler.get_commit_details_async(
+            commit_hash,
+            lambda rc, so, se, ch=commit_hash: self._on_details_received(rc, so, se, ch),
+            paths=paths
+        )
+
+    def _on_details_received(self, return_code: int, stdout: str, stderr: str, commit_hash: str):
+        if commit_hash != self._details_commit:
+            return
+        self.details_edit.setPlaceholderText("")
+        if return_code == 0:
+            self.details_edit.set_diff_text(stdout)
+        else:
+            self.details_edit.setPlainText(f"❌ 获取提交 '{commit_hash[:7]}' 详情失败:\n{stderr.strip()}")
+
+    def closeEvent(self, event):
+        self.model.shutdown()
+        super().closeEvent(event)
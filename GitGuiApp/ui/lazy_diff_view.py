@@ -0,0 +1,584 @@
+# ui/lazy_diff_view.py
+# -*- coding: utf-8 -*-
+import logging
+from bisect import bisect_right
+from typing import Optional, List, Dict, Callable
+from PyQt6.QtWidgets import QWidget, QMenu
+from PyQt6.QtGui import QTextCursor, QTextBlock, QTextLayout, QAction, QContextMenuEvent, QKeyEvent, QMouseEvent
+from PyQt6.QtCore import Qt, QPoint, QTimer
+
+from core.diff_parser import DiffFile, NULL_OID, format_diffstat
+from core.syntax_highlight import language_for_path
+from core.side_by_side import side_by_side_rows, expand_patch_tabs, RowSource, CELL_TEXT_OFFSET, LINE_NUMBER_WIDTH
+from core.word_diff import WordDiffEngine, CharRange
+from .diff_view import DiffView, _make_format
+
+# 自动展开的限制: 单个文件的变更行数、所有自动展开文件的总行数和文件数
+AUTO_EXPAND_FILE_LINES = 400
+AUTO_EXPAND_TOTAL_LINES = 3000
+AUTO_EXPAND_MAX_FILES = 50
+# 一次 loader 调用最多加载的文件数: 全部展开大量文件时分批依次加载，每批到达即显示，命令行也不会过长
+PATCH_BATCH_FILES = 100
+# 滚动停止后多久展开新进入可见区域的小文件
+SCROLL_EXPAND_DELAY_MS = 150
+# 超过该长度的行 (压缩过的 js/css、生成的数据等) 所在的文件不自动展开，所在的段折叠显示
+LONG_LINE_CHARS = 1000
+
+# loader(files, done): 获取这些文件的补丁，完成后调用 done({路径: 补丁}, "") 或 done(None, 错误信息)
+PatchLoader = Callable[[List[DiffFile], Callable[[Optional[Dict[str, str]], str], None]], None]
+
+
+def auto_expand_files(files: List[DiffFile]) -> List[DiffFile]:
+    """默认展开的文件: 非二进制的小文件，总量有上限"""
+    chosen: List[DiffFile] = []
+    total = 0
+    for diff_file in files:
+        if diff_file.is_binary or diff_file.changed_lines > AUTO_EXPAND_FILE_LINES:
+            continue
+        if total + diff_file.changed_lines > AUTO_EXPAND_TOTAL_LINES or len(chosen) >= AUTO_EXPAND_MAX_FILES:
+            break
+        total += diff_file.changed_lines
+        chosen.append(diff_file)
+    return chosen
+
+
+def _long_line_hunks(patch_lines: List[str]) -> List[tuple]:
+    """含超长行的段，返回 (段体第一行, 段体最后一行) 的行号列表 (从 0 开始，不含 "@@" 行)"""
+    hunks = []
+    hunk_start = None
+    has_long_line = False
+    for number, line in enumerate(patch_lines):
+        if line.startswith('@@'):
+            if hunk_start is not None and has_long_line:
+                hunks.append((hunk_start + 1, number - 1))
+            hunk_start, has_long_line = number, False
+        elif hunk_start is not None and len(line) > LONG_LINE_CHARS:
+            has_long_line = True
+    if hunk_start is not None and has_long_line:
+        hunks.append((hunk_start + 1, len(patch_lines) - 1))
+    return hunks
+
+
+def _format_range(start: int, length: int, fmt) -> QTextLayout.FormatRange:
+    format_range = QTextLayout.FormatRange()
+    format_range.start = start
+    format_range.length = length
+    format_range.format = fmt
+    return format_range
+
+
+class _FileSection:
+    """
+    一个文件在视图中的状态。shown_lines 为标题之后显示的行数，hidden_lines 为其中折叠隐藏的行数；
+    touched 表示用户手动展开/折叠过，此后不再自动展开。
+    补丁显示后记录: patch_lines (并排时已展开制表符)、每个显示行的来源 (统一格式时为 None，行号即补丁行号)
+    以及每段的起止补丁行号和文本 (行内差异按段计算)。
+    """
+    __slots__ = ("file", "patch", "error", "expanded", "loading", "touched", "long_lines", "shown_lines", "hidden_lines",
+                 "patch_lines", "sources", "right_start", "hunk_starts", "hunk_ends", "hunk_texts")
+
+    def __init__(self, diff_file: DiffFile):
+        self.file = diff_file
+        self.patch: Optional[str] = None
+        self.error = ""
+        self.expanded = False
+        self.loading = False
+        self.touched = False
+        self.long_lines = False
+        self.shown_lines = 0
+        self.hidden_lines = 0
+        self.patch_lines: List[str] = []
+        self.sources: Optional[List[RowSource]] = None
+        self.right_start = 0
+        self.hunk_starts: List[int] = []
+        self.hunk_ends: List[int] = []
+        self.hunk_texts: List[str] = []
+
+    def set_patch_lines(self, patch_lines: List[str]):
+        self.patch_lines = patch_lines
+        self.hunk_starts, self.hunk_ends, self.hunk_texts = [], [], []
+        for number, line in enumerate(patch_lines):
+            if line.startswith(('@@', 'diff ')) and len(self.hunk_ends) < len(self.hunk_starts):
+                self.hunk_ends.append(number - 1)
+            if line.startswith('@@'):
+                self.hunk_starts.append(number)
+        if len(self.hunk_ends) < len(self.hunk_starts):
+            self.hunk_ends.append(len(patch_lines) - 1)
+        self.hunk_texts = ['\n'.join(patch_lines[start:end + 1]) for start, end in zip(self.hunk_starts, self.hunk_ends)]
+
+
+class LazyDiffView(DiffView):
+    """
+    按文件延迟加载的差异视图。先为每个文件显示一行折叠的标题 (状态、路径、行数统计)，
+    文件展开时才通过 loader 获取它的补丁；小文件自动展开 (超出总量上限的在滚动到可见区域时展开)，
+    大文件、二进制文件和含超长行的文件保持折叠。行数统计可以晚于文件列表到达 (set_file_stats)。
+    点击 (或回车) 文件标题展开/折叠文件，点击 "@@" 行展开/折叠该段。
+    可以切换为左右并排显示；设置 WordDiffEngine 后，配对的删除/新增行在后台计算并标出行内修改的单词。
+    """
+
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setUndoRedoEnabled(False)
+        self._file_header_format = _make_format("darkBlue", bold=True, background="#e8e8f0")
+        self._collapsed_hunk_format = _make_format("darkCyan", bold=True, italic=True, background="#e8f0f0")
+        self._add_word_format = _make_format("darkGreen", bold=True, background="#b8ecb8")
+        self._del_word_format = _make_format("red", background="#f6c4c4")
+        self._line_number_format = _make_format("gray")
+        self._side_by_side = False
+        self._word_diff_engine: Optional[WordDiffEngine] = None
+        self._sections: List[_FileSection] = []
+        self._preamble_blocks = 0
+        self._loader: Optional[PatchLoader] = None
+        self._stats_pending = False
+        self._stats_failed = False
+        self._generation = 0
+        self._scroll_expand_timer = QTimer(self)
+        self._scroll_expand_timer.setSingleShot(True)
+        self._scroll_expand_timer.setInterval(SCROLL_EXPAND_DELAY_MS)
+        self._scroll_expand_timer.timeout.connect(self._expand_visible_files)
+        self.verticalScrollBar().valueChanged.connect(lambda _value: self._scroll_expand_timer.start() if self._sections else None)
+
+    # --- 载入 ---
+
+    def set_diff_files(self, preamble: str, files: List[DiffFile], loader: PatchLoader, stats_pending: bool = False):
+        """
+        显示文件列表 (preamble 为列表前的文本，如提交头部)，并开始加载默认展开的文件。
+        stats_pending 为 True 时文件还没有行数统计，先全部折叠，等 set_file_stats 之后再自动展开。
+        """
+        self._reset()
+        self._loader = loader
+        self._stats_pending = stats_pending
+        self._sections = [_FileSection(diff_file) for diff_file in files]
+        auto_sections = [] if stats_pending else self._auto_expand_sections(self._sections)
+        for section in auto_sections:
+            section.expanded = section.loading = True
+
+        lines = preamble.split('\n') if preamble else []
+        if lines and files:
+            lines.append('')
+        self._preamble_blocks = len(lines)
+        for section in self._sections:
+            section_lines = self._section_lines(section)
+            section.shown_lines = len(section_lines) - 1
+            lines.extend(section_lines)
+        # 直接调用基类，避免 setPlainText 覆盖中的重置
+        super().setPlainText('\n'.join(lines))
+        self.verticalScrollBar().setValue(0)
+        self._format_visible_blocks()
+        if auto_sections:
+            self._request_patches(auto_sections, auto=True)
+
+    def setPlainText(self, text: str):
+        self._reset()
+        super().setPlainText(text)
+
+    def clear(self):
+        self._reset()
+        super().clear()
+
+    def set_file_stats(self, stats: Dict[str, tuple]):
+        """补上各文件的行数统计 {路径: (新增, 删除)}，更新文件标题并自动展开小文件"""
+        if not self._stats_pending:
+            return
+        self._stats_pending = False
+        for section in self._sections:
+            section.file.added, section.file.removed = stats.get(section.file.path, (None, None))
+        self._rewrite_headers()
+        self._expand_visible_files(self._sections)
+
+    def set_file_stats_failed(self, message: str):
+        """行数统计获取失败: 结束等待，标题显示 '?'，文件大小未知因此不自动展开；错误信息显示在文件列表前"""
+        if not self._stats_pending:
+            return
+        self._stats_pending = False
+        self._stats_failed = True
+        self._rewrite_headers()
+        cursor = QTextCursor(self.document())
+        cursor.insertText(' '.join(message.split('\n')) + '\n')
+        self._preamble_blocks += 1
+
+    def _rewrite_headers(self):
+        document = self.document()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for section, number in zip(self._sections, self._header_block_numbers()):
+            block = document.findBlockByNumber(number)
+            cursor.setPosition(block.position())
+            cursor.setPosition(block.position() + block.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(self._header_line(section))
+            block.setUserState(-1)
+        cursor.endEditBlock()
+
+    def _reset(self):
+        # 增加代次，之前发出的加载请求返回时被忽略
+        self._generation += 1
+        self._sections = []
+        self._preamble_blocks = 0
+        self._loader = None
+        self._stats_pending = False
+        self._stats_failed = False
+        self._scroll_expand_timer.stop()
+
+    def set_word_diff_engine(self, engine: Optional[WordDiffEngine]):
+        if self._word_diff_engine is not None:
+            self._word_diff_engine.hunkComputed.disconnect(self._on_hunk_computed)
+        self._word_diff_engine = engine
+        if engine is not None:
+            engine.hunkComputed.connect(self._on_hunk_computed)
+
+    def is_side_by_side(self) -> bool:
+        return self._side_by_side
+
+    def set_side_by_side(self, enabled: bool):
+        """切换左右并排显示，已展开的文件按新方式重新排版"""
+        if enabled == self._side_by_side:
+            return
+        self._side_by_side = enabled
+        self._replace_sections([index for index, section in enumerate(self._sections) if section.expanded and section.patch])
+
+    def file_count(self) -> int:
+        return len(self._sections)
+
+    def file_at_block(self, block_number: int) -> Optional[DiffFile]:
+        """块所在的文件 (标题或补丁内容)，不在任何文件段中时返回 None"""
+        index = self._section_index_at(block_number)[0]
+        return self._sections[index].file if index >= 0 else None
+
+    # --- 展开/折叠 ---
+
+    def toggle_at_block(self, block_number: int) -> bool:
+        """块为文件标题时展开/折叠文件，为 "@@" 行时展开/折叠该段；返回是否有变化"""
+        index, header_number = self._section_index_at(block_number)
+        if index < 0:
+            return False
+        section = self._sections[index]
+        if block_number == header_number:
+            section.touched = True
+            if section.expanded:
+                section.expanded = False
+                self._replace_sections([index])
+            else:
+                self._expand_sections([index])
+            return True
+        block = self.document().findBlockByNumber(block_number)
+        if section.patch and block.text().startswith('@@'):
+            self._toggle_hunk(section, block, header_number + section.shown_lines)
+            return True
+        return False
+
+    def expand_all(self):
+        for section in self._sections:
+            section.touched = True
+        self._expand_sections([index for index, section in enumerate(self._sections) if not section.expanded])
+
+    def collapse_all(self):
+        for section in self._sections:
+            section.touched = True
+        indexes = [index for index, section in enumerate(self._sections) if section.expanded]
+        for index in indexes:
+            self._sections[index].expanded = False
+        self._replace_sections(indexes)
+
+    def _auto_expand_sections(self, sections: List[_FileSection]) -> List[_FileSection]:
+        """sections 中可以自动展开的文件段: 未加载过、用户未手动折叠的小文件，总量有上限"""
+        candidates = [section for section in sections
+                      if not section.expanded and not section.touched and section.patch is None and not section.loading]
+        chosen = {id(diff_file) for diff_file in auto_expand_files([section.file for section in candidates])}
+        return [section for section in candidates if id(section.file) in chosen]
+
+    def _expand_visible_files(self, sections: Optional[List[_FileSection]] = None):
+        """自动展开 sections (默认为标题在可见区域内的文件段) 中的小文件，一次加载它们的补丁"""
+        if not self._sections or self._stats_pending or self._loader is None:
+            return
+        if sections is None:
+            first = self.firstVisibleBlock().blockNumber()
+            last = self.cursorForPosition(QPoint(0, self.viewport().height() - 1)).blockNumber()
+            headers = self._header_block_numbers()
+            start = max(bisect_right(headers, first) - 1, 0)
+            sections = [self._sections[index] for index in range(start, len(headers)) if headers[index] <= last]
+        auto_sections = self._auto_expand_sections(sections)
+        if not auto_sections:
+            return
+        for section in auto_sections:
+            section.expanded = section.loading = True
+        self._replace_sections([self._sections.index(section) for section in auto_sections])
+        self._request_patches(auto_sections, auto=True)
+
+    def _expand_sections(self, indexes: List[int]):
+        to_load = []
+        for index in indexes:
+            section = self._sections[index]
+            section.expanded = True
+            if section.patch is None and not section.loading:
+                section.loading = True
+                section.error = ""
+                to_load.append(section)
+        self._replace_sections(indexes)
+        if to_load:
+            self._request_patches(to_load, auto=False)
+
+    def _request_patches(self, sections: List[_FileSection], auto: bool):
+        if self._loader is None or not sections:
+            return
+        generation = self._generation
+        batch, rest = sections[:PATCH_BATCH_FILES], sections[PATCH_BATCH_FILES:]
+        self._loader([section.file for section in batch],
+                     lambda patches, error, g=generation, s=batch, r=rest, a=auto: self._on_patches_loaded(g, s, r, a, patches, error))
+
+    def _on_patches_loaded(self, generation: int, sections: List[_FileSection], rest: List[_FileSection], auto: bool,
+                           patches: Optional[Dict[str, str]], error: str):
+        if generation != self._generation:
+            return
+        self._request_patches(rest, auto)
+        for section in sections:
+            section.loading = False
+            if patches is None:
+                section.error = error or "未知错误"
+                continue
+            section.patch = patches.get(section.file.path, "")
+            section.long_lines = any(len(line) > LONG_LINE_CHARS for line in section.patch.split('\n'))
+            if auto and section.long_lines:
+                section.expanded = False
+        if patches is None:
+            logging.error(f"加载 {len(sections)} 个文件的补丁失败: {error}")
+        self._replace_sections([self._sections.index(section) for section in sections])
+
+    # --- 文档编辑 ---
+
+    def _header_line(self, section: _FileSection) -> str:
+        diff_file = section.file
+        if self._stats_pending:
+            stats = "..."
+        elif self._stats_failed:
+            stats = "?"
+        else:
+            stats = format_diffstat(diff_file.added, diff_file.removed)
+        header = f"{'▼' if section.expanded else '▶'} {diff_file.status} {diff_file.display_path}  ({stats})"
+        if section.long_lines:
+            header += "  [含超长行]"
+        return header
+
+    def _section_lines(self, section: _FileSection) -> List[str]:
+        header = self._header_line(section)
+        if not section.expanded:
+            return [header]
+        if section.loading:
+            return [header, "    正在加载补丁..."]
+        if section.error:
+            return [header, f"    ❌ 加载失败: {section.error}"]
+        if not section.patch:
+            return [header, "    (没有文本差异)"]
+        patch_lines = section.patch.split('\n')
+        if not self._side_by_side:
+            section.set_patch_lines(patch_lines)
+            section.sources = None
+            return [header] + patch_lines
+        section.set_patch_lines([expand_patch_tabs(line) for line in patch_lines])
+        rows, section.sources, section.right_start = side_by_side_rows(section.patch_lines)
+        return [header] + rows
+
+    def _header_block_numbers(self) -> List[int]:
+        numbers = []
+        number = self._preamble_blocks
+        for section in self._sections:
+            numbers.append(number)
+            number += 1 + section.shown_lines
+        return numbers
+
+    def _section_index_at(self, block_number: int) -> tuple:
+        """返回 (文件段序号, 标题块号)，不在文件段中时为 (-1, -1)"""
+        number = self._preamble_blocks
+        for index, section in enumerate(self._sections):
+            if number <= block_number <= number + section.shown_lines:
+                return index, number
+            number += 1 + section.shown_lines
+        return -1, -1
+
+    def _replace_sections(self, indexes: List[int]):
+        """按各文件段的当前状态重写它们的文本，保持可见区域的内容不跳动"""
+        if not indexes:
+            return
+        document = self.document()
+        scrollbar = self.verticalScrollBar()
+        first_visible = self.firstVisibleBlock().blockNumber()
+        scroll_delta = 0
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        # 从后往前替换，前面文件段的块号不受影响
+        header_numbers = self._header_block_numbers()
+        for index in sorted(set(indexes), reverse=True):
+            section = self._sections[index]
+            first = header_numbers[index]
+            start_block = document.findBlockByNumber(first)
+            end_block = document.findBlockByNumber(first + section.shown_lines)
+            old_visible = 1 + section.shown_lines - section.hidden_lines
+            lines = self._section_lines(section)
+            cursor.setPosition(start_block.position())
+            cursor.setPosition(end_block.position() + end_block.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText('\n'.join(lines))
+            section.shown_lines = len(lines) - 1
+            section.hidden_lines = 0
+
+            block = document.findBlockByNumber(first)
+            for _ in range(len(lines)):
+                block.setUserState(-1)
+                block = block.next()
+            if section.expanded and section.patch and section.long_lines:
+                for body_first, body_last in _long_line_hunks(lines[1:]):
+                    self._set_blocks_visible(first + 1 + body_first, first + 1 + body_last, False)
+                    section.hidden_lines += body_last - body_first + 1
+            if first < first_visible:
+                scroll_delta += (1 + section.shown_lines - section.hidden_lines) - old_visible
+        cursor.endEditBlock()
+        if scroll_delta:
+            scrollbar.setValue(scrollbar.value() + scroll_delta)
+        self.viewport().update()
+
+    def _set_blocks_visible(self, first: int, last: int, visible: bool):
+        document = self.document()
+        block = document.findBlockByNumber(first)
+        start = block.position()
+        end = start
+        while block.isValid() and block.blockNumber() <= last:
+            block.setVisible(visible)
+            end = block.position() + block.length()
+            block = block.next()
+        document.markContentsDirty(start, end - start)
+
+    def _toggle_hunk(self, section: _FileSection, hunk_block: QTextBlock, section_last: int):
+        first = hunk_block.blockNumber() + 1
+        last = first - 1
+        block = hunk_block.next()
+        while block.isValid() and block.blockNumber() <= section_last and not block.text().startswith(('@@', 'diff ')):
+            last = block.blockNumber()
+            block = block.next()
+        if last < first:
+            return
+        visible = not hunk_block.next().isVisible()
+        self._set_blocks_visible(first, last, visible)
+        section.hidden_lines += -(last - first + 1) if visible else (last - first + 1)
+        hunk_block.setUserState(-1)
+        self.document().markContentsDirty(hunk_block.position(), hunk_block.length())
+        self.viewport().update()
+
+    # --- 显示 ---
+
+    def line_format(self, line: str):
+        if line.startswith(('▶ ', '▼ ')) and self._sections:
+            return self._file_header_format
+        return super().line_format(line)
+
+    def block_formats(self, block: QTextBlock) -> List[QTextLayout.FormatRange]:
+        text = block.text()
+        if text.startswith('@@') and block.next().isValid() and not block.next().isVisible():
+            return [_format_range(0, len(text), self._collapsed_hunk_format)]
+        number = block.blockNumber()
+        index, header_number = self._section_index_at(number) if self._sections else (-1, -1)
+        if index < 0 or number == header_number or not self._sections[index].hunk_starts:
+            return super().block_formats(block)
+        section = self._sections[index]
+        row = number - header_number - 1
+        syntax = self._section_syntax(section)
+        if section.sources is None:
+            formats = None
+            if syntax is not None and row > section.hunk_starts[0] and text[:1] in (' ', '+', '-'):
+                formats = self.patch_line_formats(text, 0, *syntax)
+            if formats is None:
+                formats = super().block_formats(block)
+            word_format = self._del_word_format if text.startswith('-') else self._add_word_format
+            for start, length in self._word_ranges(section, row):
+                formats.append(_format_range(start, length, word_format))
+            return formats
+        if row >= len(section.sources) or section.sources[row] is None:
+            return super().block_formats(block)
+
+        # 并排: 左栏为旧文件，右栏为新文件
+        old_index, new_index = section.sources[row]
+        right_start = section.right_start
+        formats = [_format_range(0, LINE_NUMBER_WIDTH, self._line_number_format),
+                   _format_range(right_start, LINE_NUMBER_WIDTH, self._line_number_format)]
+        old_cell = self.patch_line_formats(section.patch_lines[old_index], CELL_TEXT_OFFSET, *syntax) \
+            if syntax is not None and old_index >= 0 else None
+        new_cell = self.patch_line_formats(section.patch_lines[new_index], right_start + CELL_TEXT_OFFSET, *syntax) \
+            if syntax is not None and new_index >= 0 else None
+        if old_cell is not None:
+            formats.extend(old_cell)
+        elif old_index >= 0 and section.patch_lines[old_index].startswith('-'):
+            formats.append(_format_range(CELL_TEXT_OFFSET, right_start - 3 - CELL_TEXT_OFFSET, self._del_format))
+        if new_cell is not None:
+            formats.extend(new_cell)
+        elif new_index >= 0 and section.patch_lines[new_index].startswith('+'):
+            formats.append(_format_range(right_start + CELL_TEXT_OFFSET, len(text) - right_start - CELL_TEXT_OFFSET, self._add_format))
+        if old_index >= 0 and section.patch_lines[old_index].startswith('-'):
+            for start, length in self._word_ranges(section, old_index):
+                formats.append(_format_range(CELL_TEXT_OFFSET + start, length, self._del_word_format))
+        if new_index >= 0 and section.patch_lines[new_index].startswith('+'):
+            for start, length in self._word_ranges(section, new_index):
+                formats.append(_format_range(right_start + CELL_TEXT_OFFSET + start, length, self._add_word_format))
+        return formats
+
+    def _section_syntax(self, section: _FileSection) -> Optional[tuple]:
+        """文件段的 (语言, 旧 blob 键, 新 blob 键)；未启用语法着色或不认识文件类型时为 None"""
+        if self._syntax_cache is None:
+            return None
+        language = language_for_path(section.file.path)
+        if language is None:
+            return None
+        diff_file = section.file
+        new_blob_key = diff_file.new_oid if diff_file.new_oid != NULL_OID else f"path:{diff_file.path}"
+        return language, diff_file.old_oid, new_blob_key
+
+    def _word_ranges(self, section: _FileSection, patch_index: int) -> List[CharRange]:
+        """补丁行中修改的单词范围；所在段尚未计算时请求后台计算，完成后重新着色"""
+        if self._word_diff_engine is None or patch_index >= len(section.patch_lines):
+            return []
+        if not section.patch_lines[patch_index].startswith(('-', '+')):
+            return []
+        hunk = bisect_right(section.hunk_starts, patch_index) - 1
+        if hunk < 0 or patch_index > section.hunk_ends[hunk]:
+            return []
+        hunk_text = section.hunk_texts[hunk]
+        result = self._word_diff_engine.get(hunk_text)
+        if result is None:
+            self._word_diff_engine.request(hunk_text)
+            return []
+        return result.ranges.get(patch_index - section.hunk_starts[hunk], [])
+
+    def _on_hunk_computed(self, hunk_text: str):
+        if any(hunk_text in section.hunk_texts for section in self._sections if section.expanded):
+            self.refresh_formats()
+
+    # --- 交互 ---
+
+    def mouseReleaseEvent(self, event: QMouseEvent):
+        super().mouseReleaseEvent(event)
+        if event.button() != Qt.MouseButton.LeftButton or self.textCursor().hasSelection() or not self._sections:
+            return
+        self.toggle_at_block(self.cursorForPosition(event.position().toPoint()).blockNumber())
+
+    def keyPressEvent(self, event: QKeyEvent):
+        if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter) and self._sections:
+            if self.toggle_at_block(self.textCursor().blockNumber()):
+                return
+        super().keyPressEvent(event)
+
+    def createStandardContextMenu(self, position: Optional[QPoint] = None) -> QMenu:
+        menu = super().createStandardContextMenu() if position is None else super().createStandardContextMenu(position)
+        menu.addSeparator()
+        side_by_side_action = QAction("并排显示", menu)
+        side_by_side_action.setCheckable(True)
+        side_by_side_action.setChecked(self._side_by_side)
+        side_by_side_action.toggled.connect(self.set_side_by_side)
+        menu.addAction(side_by_side_action)
+        if self._sections:
+            expand_action = QAction(f"全部展开 ({len(self._sections)} 个文件)", menu)
+            expand_action.triggered.connect(self.expand_all)
+            menu.addAction(expand_action)
+            collapse_action = QAction("全部折叠", menu)
+            collapse_action.triggered.connect(self.collapse_all)
+            menu.addAction(collapse_action)
+        return menu
+
+    def contextMenuEvent(self, event: QContextMenuEvent):
+        menu = self.createStandardContextMenu(event.pos())
+        menu.exec(event.globalPos())
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from typing import Optional, List, Dict
+from PyQt6.QtGui import QFont
+from PyQt6.QtCore import Qt, QObject, QModelIndex, QAbstractTableModel, QTimer, pyqtSignal
+
+from core.commit_store import CommitStore, LOG_PRETTY_FORMAT, format_relative_date
+from core.diff_parser import parse_name_status_line
+from core.commit_graph import CommitGraph
+from core.commit_cache import CommitCache, CommitCacheUpdater, CachedLogWalker, SearchHit
+
+LOG_COL_GRAPH = 0
+LOG_COL_COMMIT = 1
+LOG_COL_AUTHOR = 2
+LOG_COL_DATE = 3
+LOG_COL_MESSAGE = 4
+
+GRAPH_ROLE = Qt.ItemDataRole.UserRole + 1
+
+LOG_PAGE_LINES = 500
+
+
+class LogTableModel(QAbstractTableModel):
+    """
+    提交历史的虚拟化表格模型。数据保存在 CommitStore 中，只有可见行会被格式化；
+    'git log' 进程保持打开，视图滚动到底部时通过 canFetchMore/fetchMore 读取下一页。
+    提交图由 CommitGraph 随每页到达增量布局，通过 GRAPH_ROLE 提供给绘制代理。
+
+    未设置查询范围时优先从持久化的提交缓存 (CommitCache) 按页遍历历史，无需运行 'git log'；
+    缓存缺少当前引用指向的提交时先增量更新，缓存为空时本次仍使用流式 'git log' 并在后台建立缓存。
+    提交搜索同样基于该缓存，locate() 按页加载直到目标提交出现后发出 commitLocated。
+    """
+    firstPageLoaded = pyqtSignal()
+    loadFinished = pyqtSignal(int, str)
+    commitLocated = pyqtSignal(str, int)
+
+    HEADERS = ["Graph", "Commit", "Author", "Date", "Message"]
+
+    def __init__(self, git_handler, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._git_handler = git_handler
+        self._store = CommitStore()
+        self._graph = CommitGraph(self._store.oid, self._store.parents, self._store.row_of)
+        self._row_count = 0
+        self._now = int(time.time())
+        self._worker = None
+        self._walker: Optional[CachedLogWalker] = None
+        self._decorations: Dict[str, str] = {}
+        # 流式加载时附加了 --name-status 时，各提交改动的文件路径 {行号: 路径列表}
+        self._row_paths: Dict[int, List[str]] = {}
+        self._waiting_for_cache = False
+        self._generation = 0
+        self._fetch_pending = False
+        self._monospace_font = QFont("Courier New")
+        self._cache: Optional[CommitCache] = None
+        self._cache_updater: Optional[CommitCacheUpdater] = None
+        self._pending_walk: Optional[tuple] = None
+        self._locate_target: Optional[str] = None
+
+    @property
+    def store(self) -> CommitStore:
+        return self._store
+
+    @property
+    def graph(self) -> CommitGraph:
+        return self._graph
+
+    def is_loading(self) -> bool:
+        return self._worker is not None or self._walker is not None or self._waiting_for_cache
+
+    # --- 加载 ---
+
+    def start(self, extra_args: Optional[List[str]] = None):
+        """重新开始加载提交历史"""
+        self.clear()
+        if extra_args or self._git_handler.get_scope() or not self._ensure_cache():
+            self._start_stream(extra_args)
+            return
+        generation = self._generation
+        self._waiting_for_cache = True
+        self._git_handler.get_ref_tips_async(lambda rc, so, se, g=generation: self._on_ref_tips(g, rc, so, se))
+
+    def _start_stream(self, extra_args: Optional[List[str]] = None):
+        generation = self._generation
+        self._waiting_for_cache = False
+        self._fetch_pending = True
+        # --parents: 按路径过滤时改写父提交，使提交图的连线落在实际显示的提交上
+        log_args = ["--parents"]
+        if self._git_handler.has_commit_graph():
+            # 有 commit-graph 时拓扑排序可以边遍历边输出，否则保持默认顺序以免先遍历全部历史
+            log_args.append("--topo-order")
+        self._worker = self._git_handler.get_log_stream_async(
+            LOG_PRETTY_FORMAT,
+            log_args + (extra_args or []),
+            lambda lines, g=generation: self._on_chunk(g, lines),
+            lambda rc, so, se, g=generation: self._on_finished(g, rc, se),
+            page_lines=LOG_PAGE_LINES
+        )
+        if self._worker is None:
+            self._fetch_pending = False
+
+    def _ensure_cache(self) -> bool:
+        """打开当前仓库的提交缓存，切换仓库时关闭旧缓存"""
+        repo_path = self._git_handler.get_repo_path()
+        if not repo_path:
+            return False
+        if self._cache is not None and self._cache.repo_path != repo_path:
+            self.close_cache()
+        if self._cache is None:
+            self._cache = CommitCache(repo_path)
+            self._cache_updater = CommitCacheUpdater(self._git_handler, self._cache, self)
+            self._cache_updater.finished.connect(self._on_cache_updated)
+        return self._cache.is_open()
+
+    def close_cache(self):
+        if self._cache_updater is not None:
+            self._cache_updater.cancel()
+            self._cache_updater.deleteLater()
+            self._cache_updater = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def _on_ref_tips(self, generation: int, return_code: int, stdout: str, stderr: str):
+        if generation != self._generation:
+            return
+        tips: List[str] = []
+        decorations: Dict[str, str] = {}
+        for line in stdout.split('\n'):
+            oid, _, refs = line.partition('\x1f')
+            oid = oid.strip()
+            if not oid:
+                continue
+            tips.append(oid)
+            if refs:
+                decorations[oid] = refs
+        if return_code != 0 or not tips or not self._ensure_cache():
+            # 例如尚无提交的新仓库: 交给 'git log' 报告结果
+            self._start_stream()
+            return
+
+        self._decorations = decorations
+        if not self._cache.missing_oids(tips):
+            self._start_walk(tips[0])
+        elif self._cache.is_empty():
+            logging.info("提交缓存为空，本次使用流式日志，同时在后台建立缓存。")
+            self._start_stream()
+            self._cache_updater.start(tips)
+        elif self._cache_updater.is_running():
+            self._start_stream()
+        else:
+            self._pending_walk = (generation, tips[0])
+            if not self._cache_updater.start(tips):
+                self._start_stream()
+
+    def _on_cache_updated(self, success: bool, inserted: int):
+        pending, self._pending_walk = self._pending_walk, None
+        if pending is None or pending[0] != self._generation or not self._waiting_for_cache:
+            return
+        if success:
+            self._start_walk(pending[1])
+        else:
+            self._start_stream()
+
+    def _start_walk(self, head: str):
+        self._waiting_for_cache = False
+        self._walker = CachedLogWalker(self._cache, [head])
+        self._append_cached_page()
+
+    def _append_cached_page(self):
+        walker = self._walker
+        if walker is None:
+            return
+        page = walker.next_page(LOG_PAGE_LINES)
+        first_new = len(self._store)
+        for oid, parents, author, author_time, commit_time, subject in page:
+            self._store.append_binary(oid, parents, author, author_time, self._decorations.get(oid.hex(), ""), subject)
+        self._insert_new_rows(first_new)
+        if walker.exhausted():
+            self._walker = None
+            if walker.missing:
+                logging.warning(f"提交缓存缺少 {walker.missing} 个父提交，历史可能不完整。")
+            logging.info(f"提交历史 (缓存) 加载结束，共 {self._row_count} 个提交。")
+            self.loadFinished.emit(0, "")
+            self._schedule_locate()
+
+    def _insert_new_rows(self, first_new: int):
+        new_count = len(self._store)
+        self._graph.extend(new_count)
+        if new_count > first_new:
+            self.beginInsertRows(QModelIndex(), first_new, new_count - 1)
+            self._row_count = new_count
+            self.endInsertRows()
+        if first_new == 0 and new_count > 0:
+            self.firstPageLoaded.emit()
+        self._schedule_locate()
+
+    def stop(self):
+        """终止正在进行的加载，已加载的行保留 (后台的缓存更新继续进行)"""
+        self._generation += 1
+        if self._worker is not None:
+            self._worker.terminate()
+            self._worker = None
+        self._walker = None
+        self._waiting_for_cache = False
+        self._fetch_pending = False
+
+    def shutdown(self):
+        """窗口关闭时调用: 终止加载和缓存更新并关闭缓存"""
+        self.stop()
+        self.close_cache()
+
+    def clear(self):
+        self.stop()
+        self._locate_target = None
+        self.beginResetModel()
+        self._store.clear()
+        self._graph.clear()
+        self._decorations = {}
+        self._row_paths = {}
+        self._row_count = 0
+        self._now = int(time.time())
+        self.endResetModel()
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        if self._walker is not None:
+            return True
+        return self._worker is not None and not self._fetch_pending
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        if self._walker is not None:
+            self._append_cached_page()
+            return
+        self._fetch_pending = True
+        self._worker.request_more()
+
+    def _on_chunk(self, generation: int, lines: list):
+        if generation != self._generation:
+            return
+        first_new = len(self._store)
+        for line in lines:
+            # 提交记录之后的 --name-status 行属于最近一个提交 (可能在下一页才到达)
+            if self._store.append_log_line(line) is None and line and len(self._store):
+                entry = parse_name_status_line(line)
+                if entry is not None:
+                    self._row_paths.setdefault(len(self._store) - 1, []).extend(entry[1])
+        self._fetch_pending = False
+        self._insert_new_rows(first_new)
+        if len(self._store) == first_new and self._worker is not None:
+            # 整页都无法解析，视图不会因此再次请求，直接继续读取
+            self.fetchMore()
+
+    def _on_finished(self, generation: int, return_code: int, stderr: str):
+        if generation != self._generation:
+            return
+        self._worker = None
+        self._fetch_pending = False
+        logging.info(f"提交历史加载结束，共 {self._row_count} 个提交 (RC={return_code})。")
+        self.loadFinished.emit(return_code, stderr)
+        self._schedule_locate()
+
+    # --- 搜索与定位 ---
+
+    def search_commits(self, text: str) -> Optional[List[SearchHit]]:
+        """在提交缓存中搜索标题、正文、作者和哈希前缀，缓存不可用时返回 None"""
+        if not self._ensure_cache():
+            return None
+        return self._cache.search(text)
+
+    def is_search_index_updating(self) -> bool:
+        return self._cache_updater is not None and self._cache_updater.is_running()
+
+    def locate(self, oid: str):
+        """查找提交所在的行，尚未加载时继续按页加载；结果通过 commitLocated(oid, 行号) 发出，不在历史中时行号为 -1"""
+        self._locate_target = oid
+        self._continue_locate()
+
+    def _schedule_locate(self):
+        if self._locate_target is not None:
+            QTimer.singleShot(0, self._continue_locate)
+
+    def _continue_locate(self):
+        target = self._locate_target
+        if target is None:
+            return
+        row = self._store.row_of(target)
+        if row is not None and row < self._row_count:
+            self._locate_target = None
+            self.commitLocated.emit(target, row)
+        elif not self.is_loading():
+            self._locate_target = None
+            self.commitLocated.emit(target, -1)
+        elif self.canFetchMore():
+            # 缓存遍历的下一页同步加入，之后由 _insert_new_rows 再次调度；流式加载等待下一页到达
+            self.fetchMore()
+
+    # --- 访问 ---
+
+    def commit_oid(self, row: int) -> Optional[str]:
+        if 0 <= row < self._row_count:
+            return self._store.oid(row)
+        return None
+
+    def changed_paths(self, row: int) -> List[str]:
+        """该提交改动的文件路径 (加载时使用了 --name-status 才有；重命名为 [旧路径, 新路径])"""
+        return list(self._row_paths.get(row, []))
+
+    def short_oid(self, row: int) -> Optional[str]:
+        if 0 <= row < self._row_count:
+            return self._store.short_oid(row)
+        return None
+
+    def subject(self, row: int) -> str:
+        if 0 <= row < self._row_count:
+            return self._store.subject(row)
+        return ""
+
+    # --- QAbstractTableModel ---
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole and 0 <= section < len(self.HEADERS):
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if row >= self._row_count:
+            return None
+        store = self._store
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == LOG_COL_COMMIT:
+                refs = store.refs(row)
+                text = store.short_oid(row)
+                return f"{text} ({refs})" if refs else text
+            if col == LOG_COL_AUTHOR:
+                return store.author(row)
+            if col == LOG_COL_DATE:
+                return format_relative_date(store.timestamp(row), self._now)
+            if col == LOG_COL_MESSAGE:
+                return store.subject(row)
+        elif role == Qt.ItemDataRole.UserRole:
+            return store.oid(row)
+        elif role == GRAPH_ROLE and col == LOG_COL_GRAPH:
+            return self._graph.row_layout(row)
+        elif role == Qt.ItemDataRole.FontRole and col == LOG_COL_COMMIT:
+            return self._monospace_font
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            if col == LOG_COL_DATE:
+                return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(store.timestamp(row)))
+            if col == LOG_COL_MESSAGE:
+                return store.subject(row)
+        return None
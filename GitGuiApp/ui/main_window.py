@@ -5,12 +5,14 @@ import sys
 import logging
 import shlex
 import re
+import hashlib
+import time
 from PyQt6.QtWidgets import (
     QMainWindow, QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QTextEdit, QLineEdit, QLabel, QListWidget, QListWidgetItem,
     QInputDialog, QMessageBox, QFileDialog, QSplitter, QSizePolicy, QAbstractItemView,
-    QStatusBar, QToolBar, QMenu, QTreeView, QTabWidget, QHeaderView, QTableWidget, QTableWidgetItem,
-    QSpacerItem, QFrame, QStyle
+    QStatusBar, QToolBar, QMenu, QTreeView, QTabWidget, QHeaderView, QTableView,
+    QSpacerItem, QFrame, QStyle, QCheckBox
 )
 from PyQt6.QtGui import (
     QAction, QKeySequence, QColor, QTextCursor, QIcon, QFont, QStandardItemModel,
@@ -20,26 +22,63 @@ from PyQt6.QtCore import Qt, pyqtSlot, QSize, QTimer, QModelIndex, QUrl, QPoint,
 from typing import Union, Optional
 
 try:
-    from .dialogs import ShortcutDialog, SettingsDialog
+    from .dialogs import ShortcutDialog, SettingsDialog, PushBranchesDialog
 except ImportError:
-    from dialogs import ShortcutDialog, SettingsDialog
+    from dialogs import ShortcutDialog, SettingsDialog, PushBranchesDialog
 from .shortcut_manager import ShortcutManager
 from .status_tree_model import StatusTreeModel, STATUS_STAGED, STATUS_UNSTAGED, STATUS_UNTRACKED, STATUS_UNMERGED
+from .branch_tree_model import BranchTreeModel
+from .log_table_model import LogTableModel, GRAPH_ROLE, LOG_COL_GRAPH, LOG_COL_COMMIT, LOG_COL_AUTHOR, LOG_COL_DATE, LOG_COL_MESSAGE
+from .commit_graph_delegate import CommitGraphDelegate
+from .file_history_dialog import FileHistoryDialog
+from .blame_dialog import BlameDialog
+from .compare_dialog import CompareDialog
+from .branch_cleanup_dialog import BranchCleanupDialog
+from .merge_preview_dialog import MergePreviewDialog
+from .diff_view import DiffView
+from .lazy_diff_view import LazyDiffView, auto_expand_files
 from core.git_handler import GitHandler
 from core.db_handler import DatabaseHandler
-
-LOG_COL_COMMIT = 0
-LOG_COL_AUTHOR = 1
-LOG_COL_DATE = 2
-LOG_COL_MESSAGE = 3
+from core.diff_parser import parse_raw_z, parse_numstat_z, parse_raw_numstat_z, split_commit_summary, split_patch_by_file, DiffFile, NULL_OID
+from core.diffstat_cache import DiffStatCache
+from core.lru_cache import LRUCache
+from core.word_diff import WordDiffEngine
+from core.diff_cache import DiffCache, diff_cache_key, load_patches
+from core.syntax_highlight import SyntaxTokenCache
+from core.merge_preview import MERGE_PREVIEW_CACHE_BYTES
+from core.push_utils import (
+    build_push_command, delete_refspecs, branch_refspecs, force_with_lease_options, parse_push_porcelain
+)
+from core.branch_snapshot import (
+    BranchInfo, BRANCH_TRACK_CACHE_BYTES, parse_branch_snapshot, parse_track_output, apply_cached_track_counts, store_track_counts
+)
 
 STATUS_COL_STATUS = 0
 STATUS_COL_PATH = 1
+STATUS_COL_DIFFSTAT = 2
+
+DIFFSTAT_PATHSPEC_LIMIT = 200
+# 需要重新计算领先/落后数的分支多于此数时，对全部本地分支计算一次，不在命令行中逐个列出
+BRANCH_TRACK_PATTERN_LIMIT = 200
+LOG_SEARCH_DELAY_MS = 250
+# 分支筛选框停止输入多久后开始筛选 (毫秒)
+BRANCH_FILTER_DELAY_MS = 150
+COMMIT_DETAILS_CACHE_BYTES = 32 * 1024 * 1024
+BLAME_CACHE_BYTES = 64 * 1024 * 1024
+COMPARE_FILES_CACHE_BYTES = 16 * 1024 * 1024
+COMMIT_PREFETCH_DELAY_MS = 300
+COMMIT_PREFETCH_NEIGHBOURS = 3
+COMMIT_PREFETCH_MAX = 40
+STATUS_PREFETCH_DELAY_MS = 300
+STATUS_PREFETCH_NEIGHBOURS = 3
+# 暂存区文件不多于此数时，整个暂存区的差异一起预取
+STATUS_PREFETCH_STAGED_MAX = 20
 
 LOADING_ANIMATION_PATH = os.path.join(os.path.dirname(__file__), "loading_spinner.gif")
 SETTINGS_ORG_NAME = "MyGitApp"
 SETTINGS_APP_NAME = "GitHelperGUI"
 SETTINGS_LAST_REPO_KEY = "lastRepoPath"
+SETTINGS_REPO_SCOPE_PREFIX = "repoScope"
 
 
 class MainWindow(QMainWindow):
@@ -57,6 +96,44 @@ class MainWindow(QMainWindow):
         self._repo_dependent_widgets = []
         self._is_busy = False
         self._pending_refreshes = 0
+        self.diffstat_cache = DiffStatCache()
+        self._diffstat_generation = 0
+        self._status_diff_generation = 0
+        # 预取的状态差异文件列表 {(是否暂存区, 路径): (文件时间戳, [DiffFile])}；状态变化时整体替换为新字典
+        self._status_diff_files_cache: dict[tuple[bool, str], tuple[tuple, list[DiffFile]]] = {}
+        self._status_prefetch_timer = QTimer(self)
+        self._status_prefetch_timer.setSingleShot(True)
+        self._status_prefetch_timer.setInterval(STATUS_PREFETCH_DELAY_MS)
+        self._status_prefetch_timer.timeout.connect(self._start_status_prefetch)
+        self.commit_details_cache = LRUCache(COMMIT_DETAILS_CACHE_BYTES)
+        self.blame_cache = LRUCache(BLAME_CACHE_BYTES, sizer=lambda result: result.estimated_size())
+        self.compare_files_cache = LRUCache(COMPARE_FILES_CACHE_BYTES, sizer=lambda entry: sum(len(part or "") for part in entry))
+        # 合并预览按 (我方提交, 对方提交) 缓存，提交不变时结果不变
+        self.merge_preview_cache = LRUCache(MERGE_PREVIEW_CACHE_BYTES, sizer=lambda preview: preview.estimated_size())
+        # 分支相对上游的领先/落后数，按 (分支提交, 上游提交) 缓存，刷新时只计算变化过的分支
+        self.branch_track_cache = LRUCache(BRANCH_TRACK_CACHE_BYTES)
+        self._branch_snapshot: list[BranchInfo] = []
+        self.word_diff_engine = WordDiffEngine(self)
+        self.syntax_cache = SyntaxTokenCache()
+        self.diff_cache = DiffCache()
+        self._details_commit_hash: Optional[str] = None
+        self._commit_prefetch_queue: list[str] = []
+        self._commit_prefetch_running = False
+        self._commit_prefetch_timer = QTimer(self)
+        self._commit_prefetch_timer.setSingleShot(True)
+        self._commit_prefetch_timer.setInterval(COMMIT_PREFETCH_DELAY_MS)
+        self._commit_prefetch_timer.timeout.connect(self._start_commit_prefetch)
+        self._file_op_queue: list[list[str]] = []
+        self._file_op_running = False
+        self._log_refresh_pending = False
+        self._log_search_timer = QTimer(self)
+        self._log_search_timer.setSingleShot(True)
+        self._log_search_timer.setInterval(LOG_SEARCH_DELAY_MS)
+        self._log_search_timer.timeout.connect(self._run_log_search)
+        self._branch_filter_timer = QTimer(self)
+        self._branch_filter_timer.setSingleShot(True)
+        self._branch_filter_timer.setInterval(BRANCH_FILTER_DELAY_MS)
+        self._branch_filter_timer.timeout.connect(self._apply_branch_filter)
 
         self.output_display: Optional[QTextEdit] = None
         self.command_input: Optional[QLineEdit] = None
@@ -64,14 +141,19 @@ class MainWindow(QMainWindow):
         self.shortcut_list_widget: Optional[QListWidget] = None
         self.repo_label: Optional[QLabel] = None
         self.status_bar: Optional[QStatusBar] = None
-        self.branch_list_widget: Optional[QListWidget] = None
+        self.branch_filter_input: Optional[QLineEdit] = None
+        self.branch_tree_view: Optional[QTreeView] = None
+        self.branch_tree_model: Optional[BranchTreeModel] = None
         self.status_tree_view: Optional[QTreeView] = None
         self.status_tree_model: Optional[StatusTreeModel] = None
-        self.log_table_widget: Optional[QTableWidget] = None
-        self.diff_text_edit: Optional[QTextEdit] = None
+        self.log_table_view: Optional[QTableView] = None
+        self.log_table_model: Optional[LogTableModel] = None
+        self.log_search_input: Optional[QLineEdit] = None
+        self.log_search_results: Optional[QListWidget] = None
+        self.diff_text_edit: Optional[LazyDiffView] = None
         self.main_tab_widget: Optional[QTabWidget] = None
         self._output_tab_index = -1
-        self.commit_details_textedit: Optional[QTextEdit] = None
+        self.commit_details_textedit: Optional[LazyDiffView] = None
         self.current_branch_name_display: Optional[str] = None
         self.loading_label: Optional[QLabel] = None
         self.loading_movie: Optional[QMovie] = None
@@ -80,6 +162,7 @@ class MainWindow(QMainWindow):
         self.unstage_all_button: Optional[QPushButton] = None
         self.init_button: Optional[QPushButton] = None
         self.select_repo_button: Optional[QPushButton] = None
+        self.scope_input: Optional[QLineEdit] = None
 
         self._init_ui()
         self.shortcut_manager.load_and_register_shortcuts()
@@ -111,6 +194,50 @@ class MainWindow(QMainWindow):
                   logging.info("当前仓库无效，清除上次仓库路径记录。")
 
 
+    # 每个仓库的范围设置保存在独立的键下
+    def _scope_settings_key(self, repo_path: str) -> str:
+        return f"{SETTINGS_REPO_SCOPE_PREFIX}/{hashlib.sha1(os.path.normcase(repo_path).encode('utf-8')).hexdigest()}"
+
+    # 加载当前仓库保存的查询范围
+    def _load_repo_scope(self):
+        repo_path = self.git_handler.get_repo_path()
+        scope = []
+        if repo_path:
+            settings = QSettings(SETTINGS_ORG_NAME, SETTINGS_APP_NAME)
+            saved = settings.value(self._scope_settings_key(repo_path), "")
+            if saved and isinstance(saved, str):
+                try:
+                    scope = shlex.split(saved)
+                except ValueError:
+                    logging.warning(f"无法解析保存的范围设置: {saved}")
+        self.git_handler.set_scope(scope)
+        if self.scope_input:
+            self.scope_input.setText(' '.join(shlex.quote(p) for p in scope))
+
+    # 从范围输入框应用新的查询范围并刷新视图
+    @pyqtSlot()
+    def _apply_scope_from_input(self):
+        if not self.scope_input or not self._check_repo_and_warn(): return
+        text = self.scope_input.text().strip()
+        try:
+            scope = shlex.split(text)
+        except ValueError as e:
+            self._show_warning("输入错误", f"无法解析范围: {e}\n请确保引号正确配对。")
+            return
+
+        if scope == self.git_handler.get_scope():
+            return
+        self.git_handler.set_scope(scope)
+        settings = QSettings(SETTINGS_ORG_NAME, SETTINGS_APP_NAME)
+        key = self._scope_settings_key(self.git_handler.get_repo_path())
+        if scope:
+            settings.setValue(key, ' '.join(shlex.quote(p) for p in scope))
+        else:
+            settings.remove(key)
+        if self.status_bar and not self._is_busy:
+            self.status_bar.showMessage(f"查询范围: {' '.join(scope) if scope else '整个仓库'}", 3000)
+        self._refresh_all_views()
+
     # 检查是否在有效仓库中，否则显示警告
     def _check_repo_and_warn(self, message="请先选择一个有效的 Git 仓库。"):
         if not self.git_handler or not self.git_handler.is_valid_repo():
@@ -156,7 +283,7 @@ class MainWindow(QMainWindow):
         if not is_init_or_clone and not self._check_repo_and_warn("仓库无效，无法执行命令序列。"):
              return
 
-        if self._is_busy:
+        if self._is_busy or self._has_pending_file_operations():
              logging.warning("UI 正在忙碌，跳过新的命令序列请求。")
              self._show_information("操作繁忙", "当前正在执行其他操作，请稍后再试。")
              return
@@ -278,6 +405,15 @@ class MainWindow(QMainWindow):
         self.repo_label.setToolTip("当前操作的 Git 仓库路径")
         repo_layout.addWidget(self.repo_label, 1)
 
+        repo_layout.addWidget(QLabel("范围:"))
+        self.scope_input = QLineEdit()
+        self.scope_input.setPlaceholderText("整个仓库 (可输入 pathspec，如: services/payments docs)")
+        self.scope_input.setToolTip("限制状态、差异和日志查询的路径范围 (多个 pathspec 用空格分隔，可用引号)，按 Enter 应用")
+        self.scope_input.setMinimumWidth(260)
+        self.scope_input.returnPressed.connect(self._apply_scope_from_input)
+        repo_layout.addWidget(self.scope_input)
+        self._add_repo_dependent_widget(self.scope_input)
+
         self.select_repo_button = QPushButton("选择仓库")
         self.select_repo_button.setToolTip("选择或克隆仓库目录")
         self.select_repo_button.clicked.connect(self._select_or_clone_repo_dialog)
@@ -397,13 +533,26 @@ class MainWindow(QMainWindow):
         branch_label_layout.addWidget(create_branch_button)
         left_layout.addLayout(branch_label_layout)
 
-        self.branch_list_widget = QListWidget()
-        self.branch_list_widget.setToolTip("双击切换分支, 右键操作")
-        self.branch_list_widget.itemDoubleClicked.connect(self._branch_double_clicked)
-        self.branch_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.branch_list_widget.customContextMenuRequested.connect(self._show_branch_context_menu)
-        left_layout.addWidget(self.branch_list_widget, 1)
-        self._add_repo_dependent_widget(self.branch_list_widget)
+        self.branch_filter_input = QLineEdit()
+        self.branch_filter_input.setPlaceholderText("筛选分支 (名称或其中任一段的前缀)...")
+        self.branch_filter_input.setClearButtonEnabled(True)
+        self.branch_filter_input.textChanged.connect(lambda _text: self._branch_filter_timer.start())
+        left_layout.addWidget(self.branch_filter_input)
+        self._add_repo_dependent_widget(self.branch_filter_input)
+
+        self.branch_tree_model = BranchTreeModel(self.git_handler, self)
+        self.branch_tree_view = QTreeView()
+        self.branch_tree_view.setModel(self.branch_tree_model)
+        self.branch_tree_view.setHeaderHidden(True)
+        self.branch_tree_view.setUniformRowHeights(True)
+        self.branch_tree_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.branch_tree_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.branch_tree_view.setToolTip("双击切换分支, 右键操作 (Ctrl/Shift 可多选)")
+        self.branch_tree_view.doubleClicked.connect(self._branch_double_clicked)
+        self.branch_tree_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.branch_tree_view.customContextMenuRequested.connect(self._show_branch_context_menu)
+        left_layout.addWidget(self.branch_tree_view, 1)
+        self._add_repo_dependent_widget(self.branch_tree_view)
 
         left_layout.addWidget(QLabel("快捷键组合:"))
         self.shortcut_list_widget = QListWidget()
@@ -445,12 +594,12 @@ class MainWindow(QMainWindow):
 
         status_action_layout = QHBoxLayout()
         self.stage_all_button = QPushButton("全部暂存 (+)")
-        self.stage_all_button.setToolTip("暂存所有未暂存和未跟踪的文件 (git add .)")
+        self.stage_all_button.setToolTip("暂存所有未暂存和未跟踪的文件 (git add .)\n设置了查询范围时只暂存范围内的文件")
         self.stage_all_button.clicked.connect(self._stage_all)
         self._add_repo_dependent_widget(self.stage_all_button)
 
         self.unstage_all_button = QPushButton("全部撤销暂存 (-)")
-        self.unstage_all_button.setToolTip("撤销所有已暂存文件的暂存状态 (git reset HEAD --)")
+        self.unstage_all_button.setToolTip("撤销所有已暂存文件的暂存状态 (git reset HEAD --)\n设置了查询范围时只撤销范围内的文件")
         self.unstage_all_button.clicked.connect(self._unstage_all)
         self._add_repo_dependent_widget(self.unstage_all_button)
 
@@ -471,6 +620,7 @@ class MainWindow(QMainWindow):
         self.status_tree_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.status_tree_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.status_tree_view.header().setSectionResizeMode(STATUS_COL_PATH, QHeaderView.ResizeMode.Stretch)
+        self.status_tree_view.header().setSectionResizeMode(STATUS_COL_DIFFSTAT, QHeaderView.ResizeMode.ResizeToContents)
         self.status_tree_view.header().setStretchLastSection(False)
         self.status_tree_view.setAlternatingRowColors(True)
         self.status_tree_view.selectionModel().selectionChanged.connect(self._status_selection_changed)
@@ -488,33 +638,66 @@ class MainWindow(QMainWindow):
         log_tab_layout.setSpacing(4)
         self.main_tab_widget.addTab(log_tab_layout.parentWidget(), "提交历史 (Log)")
 
-        self.log_table_widget = QTableWidget()
-        self.log_table_widget.setColumnCount(4)
-        self.log_table_widget.setHorizontalHeaderLabels(["Commit", "Author", "Date", "Message"])
-        self.log_table_widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.log_table_widget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.log_table_widget.verticalHeader().setVisible(False)
-        self.log_table_widget.horizontalHeader().setSectionResizeMode(LOG_COL_MESSAGE, QHeaderView.ResizeMode.Stretch)
-        self.log_table_widget.horizontalHeader().setSectionResizeMode(LOG_COL_COMMIT, QHeaderView.ResizeMode.ResizeToContents)
-        self.log_table_widget.horizontalHeader().setSectionResizeMode(LOG_COL_AUTHOR, QHeaderView.ResizeMode.ResizeToContents)
-        self.log_table_widget.horizontalHeader().setSectionResizeMode(LOG_COL_DATE, QHeaderView.ResizeMode.ResizeToContents)
-        self.log_table_widget.itemSelectionChanged.connect(self._log_selection_changed)
-        self.log_table_widget.setWordWrap(False)
-        self.log_table_widget.setTextElideMode(Qt.TextElideMode.ElideRight)
-
-        log_tab_layout.addWidget(self.log_table_widget, 2)
-        self._add_repo_dependent_widget(self.log_table_widget)
+        self.log_table_model = LogTableModel(self.git_handler, self)
+        self.log_table_model.firstPageLoaded.connect(self._on_log_first_page_loaded)
+        self.log_table_model.loadFinished.connect(self._on_log_load_finished)
+        self.log_table_model.commitLocated.connect(self._on_commit_located)
+
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(QLabel("搜索:"))
+        self.log_search_input = QLineEdit()
+        self.log_search_input.setPlaceholderText("搜索提交标题、正文、作者或哈希前缀...")
+        self.log_search_input.setToolTip("基于本地提交缓存搜索标题、正文和作者 (多个词须全部出现，可以是词的一部分)，双击结果跳转到对应提交")
+        self.log_search_input.setClearButtonEnabled(True)
+        self.log_search_input.textChanged.connect(lambda _text: self._log_search_timer.start())
+        self.log_search_input.returnPressed.connect(self._run_log_search)
+        search_layout.addWidget(self.log_search_input, 1)
+        log_tab_layout.addLayout(search_layout)
+        self._add_repo_dependent_widget(self.log_search_input)
+
+        self.log_search_results = QListWidget()
+        self.log_search_results.setMaximumHeight(160)
+        self.log_search_results.setVisible(False)
+        self.log_search_results.setToolTip("双击或按回车跳转到对应提交")
+        self.log_search_results.itemActivated.connect(self._on_log_search_result_activated)
+        log_tab_layout.addWidget(self.log_search_results)
+        self.log_table_view = QTableView()
+        self.log_table_view.setModel(self.log_table_model)
+        self.log_table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.log_table_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.log_table_view.verticalHeader().setVisible(False)
+        # 固定行高，视图无需逐行测量即可计算滚动范围
+        self.log_table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.log_table_view.verticalHeader().setDefaultSectionSize(self.log_table_view.fontMetrics().height() + 6)
+        self.log_table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.log_table_view.horizontalHeader().setSectionResizeMode(LOG_COL_MESSAGE, QHeaderView.ResizeMode.Stretch)
+        self.log_table_view.setItemDelegateForColumn(LOG_COL_GRAPH, CommitGraphDelegate(GRAPH_ROLE, self.log_table_view))
+        self.log_table_view.selectionModel().selectionChanged.connect(self._log_selection_changed)
+        self.log_table_view.verticalScrollBar().valueChanged.connect(lambda _value: self._commit_prefetch_timer.start())
+        self.log_table_view.setWordWrap(False)
+        self.log_table_view.setTextElideMode(Qt.TextElideMode.ElideRight)
+
+        log_tab_layout.addWidget(self.log_table_view, 2)
+        self._add_repo_dependent_widget(self.log_table_view)
 
         separator = QFrame()
         separator.setFrameShape(QFrame.Shape.HLine)
         separator.setFrameShadow(QFrame.Shadow.Sunken)
         log_tab_layout.addWidget(separator)
 
-        log_tab_layout.addWidget(QLabel("提交详情:"))
-        self.commit_details_textedit = QTextEdit()
-        self.commit_details_textedit.setReadOnly(True)
-        self.commit_details_textedit.setFontFamily("Courier New")
+        details_header_layout = QHBoxLayout()
+        details_header_layout.addWidget(QLabel("提交详情:"))
+        details_header_layout.addStretch()
+        details_side_by_side_checkbox = QCheckBox("并排显示")
+        details_header_layout.addWidget(details_side_by_side_checkbox)
+        log_tab_layout.addLayout(details_header_layout)
+        self.commit_details_textedit = LazyDiffView()
+        self.commit_details_textedit.set_word_diff_engine(self.word_diff_engine)
+        self.commit_details_textedit.set_syntax_cache(self.syntax_cache)
+        details_side_by_side_checkbox.toggled.connect(self.commit_details_textedit.set_side_by_side)
         self.commit_details_textedit.setPlaceholderText("选中上方提交记录以查看详情...")
+        self.commit_details_textedit.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.commit_details_textedit.customContextMenuRequested.connect(self._show_commit_details_context_menu)
         log_tab_layout.addWidget(self.commit_details_textedit, 1)
         self._add_repo_dependent_widget(self.commit_details_textedit)
 
@@ -525,8 +708,15 @@ class MainWindow(QMainWindow):
         diff_tab_layout.setContentsMargins(5, 5, 5, 5)
         self.main_tab_widget.addTab(diff_tab_layout.parentWidget(), "差异 (Diff)")
 
-        self.diff_text_edit = QTextEdit()
-        self.diff_text_edit.setReadOnly(True)
+        diff_header_layout = QHBoxLayout()
+        diff_header_layout.addStretch()
+        diff_side_by_side_checkbox = QCheckBox("并排显示")
+        diff_header_layout.addWidget(diff_side_by_side_checkbox)
+        diff_tab_layout.addLayout(diff_header_layout)
+        self.diff_text_edit = LazyDiffView()
+        self.diff_text_edit.set_word_diff_engine(self.word_diff_engine)
+        self.diff_text_edit.set_syntax_cache(self.syntax_cache)
+        diff_side_by_side_checkbox.toggled.connect(self.diff_text_edit.set_side_by_side)
         self.diff_text_edit.setPlaceholderText("选中已更改的文件以查看差异...")
         diff_tab_layout.addWidget(self.diff_text_edit, 1)
         self._add_repo_dependent_widget(self.diff_text_edit)
@@ -650,6 +840,18 @@ class MainWindow(QMainWindow):
         repo_menu.addAction(switch_branch_action)
         self._add_repo_dependent_widget(switch_branch_action)
 
+        cleanup_branches_action = QAction("清理本地分支(&B)...", self)
+        cleanup_branches_action.setToolTip("找出已合并、上游已删除和过期的本地分支，一次删除多个")
+        cleanup_branches_action.triggered.connect(self._open_branch_cleanup)
+        repo_menu.addAction(cleanup_branches_action)
+        self._add_repo_dependent_widget(cleanup_branches_action)
+
+        compare_action = QAction("比较分支/提交(&C)...", self)
+        compare_action.setToolTip("比较两个引用 (基准...比较)，先列出文件，选中文件时再加载差异")
+        compare_action.triggered.connect(lambda: self._open_compare())
+        repo_menu.addAction(compare_action)
+        self._add_repo_dependent_widget(compare_action)
+
         repo_menu.addSeparator()
 
         list_remotes_action = QAction("列出远程仓库", self)
@@ -799,8 +1001,8 @@ class MainWindow(QMainWindow):
         else:
             if self.status_bar and not self._is_busy: self.status_bar.showMessage("请选择或克隆一个有效的 Git 仓库目录", 0)
             if self.status_tree_model: self.status_tree_model.clear_status()
-            if self.branch_list_widget: self.branch_list_widget.clear()
-            if self.log_table_widget: self.log_table_widget.setRowCount(0)
+            if self.branch_tree_model: self.branch_tree_model.clear()
+            if self.log_table_model: self.log_table_model.clear()
             if self.diff_text_edit: self.diff_text_edit.clear(); self.diff_text_edit.setPlaceholderText("请选择有效仓库")
             if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("请选择有效仓库")
             self._clear_sequence()
@@ -889,54 +1091,132 @@ class MainWindow(QMainWindow):
     @pyqtSlot(int, str, str)
     def _on_status_refreshed(self, return_code: int, stdout: str, stderr: str):
         try:
-            if not self.status_tree_model or not self.status_tree_view:
-                 logging.error("状态树模型或视图在状态刷新回调时未初始化。")
-                 return
+            if self._has_pending_file_operations():
+                logging.debug("文件操作尚未完成，跳过本次状态结果，等待后台校正。")
+                return
+            self._apply_status_output(return_code, stdout, stderr)
+        finally:
+             self._refresh_operation_finished()
 
-            is_valid = self.git_handler.is_valid_repo()
 
-            if self.status_tree_view:
-                 self.status_tree_view.setUpdatesEnabled(False)
+    # 用 git status 的输出重建状态树
+    def _apply_status_output(self, return_code: int, stdout: str, stderr: str):
+        if not self.status_tree_model or not self.status_tree_view:
+             logging.error("状态树模型或视图在状态刷新回调时未初始化。")
+             return
 
-            enable_stage_all = False
-            enable_unstage_all = False
+        is_valid = self.git_handler.is_valid_repo()
 
-            try:
-                if return_code == 0 and is_valid:
-                    self.status_tree_model.parse_and_populate(stdout)
-                    self.status_tree_view.expandAll()
-                    self.status_tree_view.resizeColumnToContents(STATUS_COL_STATUS)
-                    min_status_width = self.status_tree_view.fontMetrics().horizontalAdvance("Unmerged ") + 20
-                    self.status_tree_view.setColumnWidth(STATUS_COL_STATUS, max(min_status_width, self.status_tree_view.columnWidth(STATUS_COL_STATUS)))
-
-                    has_changes_to_stage = (
-                        self.status_tree_model.unstage_root.rowCount() > 0 or
-                        self.status_tree_model.untracked_root.rowCount() > 0 or
-                        (hasattr(self.status_tree_model, 'unmerged_root') and self.status_tree_model.unmerged_root.rowCount() > 0)
-                    )
-                    has_staged_changes = self.status_tree_model.staged_root.rowCount() > 0
-
-                    enable_stage_all = has_changes_to_stage
-                    enable_unstage_all = has_staged_changes
-
-                elif is_valid:
-                    logging.error(f"获取状态失败: RC={return_code}, 错误: {stderr.strip()}")
-                    self._append_output(f"❌ 获取 Git 状态失败:\n{stderr.strip()}", QColor("red"))
-                    self.status_tree_model.clear_status()
-                else:
-                     logging.warning("仓库在状态刷新期间变得无效，清空状态视图。")
-                     self.status_tree_model.clear_status()
+        if self.status_tree_view:
+             self.status_tree_view.setUpdatesEnabled(False)
+
+        enable_stage_all = False
+        enable_unstage_all = False
+
+        try:
+            if return_code == 0 and is_valid:
+                self._status_diff_files_cache = {}
+                self.status_tree_model.parse_and_populate(stdout)
+                self.status_tree_view.expandAll()
+                self.status_tree_view.resizeColumnToContents(STATUS_COL_STATUS)
+                min_status_width = self.status_tree_view.fontMetrics().horizontalAdvance("Unmerged ") + 20
+                self.status_tree_view.setColumnWidth(STATUS_COL_STATUS, max(min_status_width, self.status_tree_view.columnWidth(STATUS_COL_STATUS)))
+
+                has_changes_to_stage = (
+                    self.status_tree_model.unstage_root.rowCount() > 0 or
+                    self.status_tree_model.untracked_root.rowCount() > 0 or
+                    (hasattr(self.status_tree_model, 'unmerged_root') and self.status_tree_model.unmerged_root.rowCount() > 0)
+                )
+                has_staged_changes = self.status_tree_model.staged_root.rowCount() > 0
 
-            finally:
-                current_enabled_state = is_valid and not self._is_busy
-                if self.stage_all_button: self.stage_all_button.setEnabled(enable_stage_all and current_enabled_state)
-                if self.unstage_all_button: self.unstage_all_button.setEnabled(enable_unstage_all and current_enabled_state)
+                enable_stage_all = has_changes_to_stage
+                enable_unstage_all = has_staged_changes
 
-                if self.status_tree_view:
-                     self.status_tree_view.setUpdatesEnabled(True)
+                # 状态树显示后再以低优先级批量计算行数统计
+                QTimer.singleShot(0, self._request_diffstat)
+
+            elif is_valid:
+                logging.error(f"获取状态失败: RC={return_code}, 错误: {stderr.strip()}")
+                self._append_output(f"❌ 获取 Git 状态失败:\n{stderr.strip()}", QColor("red"))
+                self.status_tree_model.clear_status()
+            else:
+                 logging.warning("仓库在状态刷新期间变得无效，清空状态视图。")
+                 self.status_tree_model.clear_status()
 
         finally:
-             self._refresh_operation_finished()
+            current_enabled_state = is_valid and not self._is_busy
+            if self.stage_all_button: self.stage_all_button.setEnabled(enable_stage_all and current_enabled_state)
+            if self.unstage_all_button: self.unstage_all_button.setEnabled(enable_unstage_all and current_enabled_state)
+
+            if self.status_tree_view:
+                 self.status_tree_view.setUpdatesEnabled(True)
+
+
+    # 请求已暂存和未暂存更改的行数统计 (每次刷新各一次批量 diff)
+    def _request_diffstat(self):
+        if not self.git_handler or not self.git_handler.is_valid_repo() or not self.status_tree_model:
+            return
+        self._diffstat_generation += 1
+        generation = self._diffstat_generation
+        for cached in (True, False):
+            self.git_handler.get_diff_raw_async(
+                cached,
+                lambda rc, so, se, c=cached, g=generation: self._on_diff_raw_received(rc, so, se, c, g),
+                low_priority=True
+            )
+
+    # 处理 raw diff 结果：命中缓存的直接显示，其余再批量执行 numstat
+    def _on_diff_raw_received(self, return_code: int, stdout: str, stderr: str, cached: bool, generation: int):
+        if generation != self._diffstat_generation or not self.status_tree_model:
+            return
+        if return_code != 0:
+            logging.warning(f"获取 raw diff 失败 (cached={cached}): {stderr.strip()}")
+            return
+
+        section = STATUS_STAGED if cached else STATUS_UNSTAGED
+        repo_path = self.git_handler.get_repo_path()
+        hits = {}
+        missing_keys = {}
+        unmerged_paths = []
+        for entry in parse_raw_z(stdout):
+            if entry.status == 'U':
+                unmerged_paths.append(entry.path)
+                continue
+            key = self.diffstat_cache.make_key(entry, repo_path)
+            value = self.diffstat_cache.get(key)
+            if value is not None:
+                hits[entry.path] = value
+            else:
+                missing_keys[entry.path] = key
+
+        self.status_tree_model.apply_diffstat(section, hits)
+        logging.debug(f"DiffStat (cached={cached}): 命中缓存 {len(hits)}，需计算 {len(missing_keys)}，未合并 {len(unmerged_paths)}")
+
+        paths_to_compute = list(missing_keys.keys()) + unmerged_paths
+        if not paths_to_compute:
+            return
+        pathspec = paths_to_compute if len(paths_to_compute) <= DIFFSTAT_PATHSPEC_LIMIT else None
+        self.git_handler.get_diff_numstat_async(
+            cached, pathspec,
+            lambda rc, so, se, c=cached, g=generation, k=missing_keys, u=unmerged_paths: self._on_diff_numstat_received(rc, so, se, c, g, k, u),
+            low_priority=True
+        )
+
+    # 处理 numstat 结果：写入缓存并更新状态树
+    def _on_diff_numstat_received(self, return_code: int, stdout: str, stderr: str, cached: bool, generation: int, missing_keys: dict, unmerged_paths: list):
+        if return_code != 0:
+            logging.warning(f"获取 numstat 失败 (cached={cached}): {stderr.strip()}")
+            return
+        stats = parse_numstat_z(stdout)
+        for path, key in missing_keys.items():
+            if path in stats:
+                self.diffstat_cache.put(key, stats[path])
+
+        if generation != self._diffstat_generation or not self.status_tree_model:
+            return
+        self.status_tree_model.apply_diffstat(STATUS_STAGED if cached else STATUS_UNSTAGED, stats)
+        if unmerged_paths and not cached:
+            self.status_tree_model.apply_diffstat(STATUS_UNMERGED, {p: stats[p] for p in unmerged_paths if p in stats})
 
 
     # 刷新分支列表
@@ -944,197 +1224,260 @@ class MainWindow(QMainWindow):
     def _refresh_branch_list(self):
         if not self.git_handler or not self.git_handler.is_valid_repo():
              logging.warning("试图刷新分支列表，但 GitHandler 不可用或仓库无效。")
-             if self.branch_list_widget: self.branch_list_widget.clear()
+             if self.branch_tree_model: self.branch_tree_model.clear()
              self.current_branch_name_display = "(无效仓库)" if not self.git_handler.is_valid_repo() else "(错误)"
              self._refresh_operation_finished()
              return
-        logging.debug("正在请求格式化分支列表...")
-        if self.branch_list_widget: self.branch_list_widget.clear()
-        self.git_handler.get_branches_formatted_async(self._on_branches_refreshed)
+        logging.debug("正在请求分支快照...")
+        self.git_handler.get_branch_snapshot_async(self._on_branches_refreshed)
 
 
     # 处理 Git 分支列表刷新的回调
     @pyqtSlot(int, str, str)
     def _on_branches_refreshed(self, return_code: int, stdout: str, stderr: str):
         try:
-            if not self.branch_list_widget or not self.git_handler:
+            if self.branch_tree_model is None or not self.git_handler:
                  logging.warning("分支列表组件或 GitHandler 在分支刷新回调时无效 (可能在关闭窗口?)。")
                  return
 
-            self.branch_list_widget.clear()
+            expanded_groups = self._expanded_branch_groups()
+            self._branch_snapshot = []
             current_branch_name = None
             is_valid = self.git_handler.is_valid_repo()
 
             if return_code == 0 and is_valid:
-                lines = stdout.strip().splitlines()
-                bold_font = QFont(); bold_font.setBold(True)
-                remote_color = QColor("gray")
-                current_color = QColor("blue")
-
-                for line in lines:
-                    if not line: continue
-                    is_current = False
-                    branch_name = line.strip()
-
-                    if branch_name.startswith('* '):
-                        is_current = True
-                        branch_name = branch_name[2:].strip()
-                        match_detached = re.match(r'\(HEAD detached(?: at)? from (.*?)\)', branch_name)
-                        if match_detached:
-                             current_branch_name = f"(Detached HEAD at {match_detached.group(1)})"
-                        else:
-                            current_branch_name = branch_name
-
-                    if not branch_name: continue
-
-                    item = QListWidgetItem(branch_name)
-                    if is_current:
-                        item.setFont(bold_font)
-                        item.setForeground(current_color)
-                    elif branch_name.startswith("remotes/"):
-                        item.setForeground(remote_color)
-
-                    self.branch_list_widget.addItem(item)
-
-                if current_branch_name and not current_branch_name.startswith("(Detached HEAD"):
-                     items = self.branch_list_widget.findItems(current_branch_name, Qt.MatchFlag.MatchExactly)
-                     if items:
-                          self.branch_list_widget.setCurrentItem(items[0])
-                          self.branch_list_widget.scrollToItem(items[0], QAbstractItemView.ScrollHint.PositionAtCenter)
+                self._branch_snapshot = parse_branch_snapshot(stdout)
+                stale_branches = apply_cached_track_counts(self._branch_snapshot, self.branch_track_cache)
+                current_branch_name = next((branch.name for branch in self._branch_snapshot if branch.is_current), None)
+                # 只重置模型，分支行在分组展开时才交给视图
+                self.branch_tree_model.set_branches(self._branch_snapshot)
+                self._restore_branch_groups(expanded_groups)
+
+                if stale_branches:
+                    self._request_branch_track_counts(stale_branches)
+
+                current_index = self.branch_tree_model.current_branch_index()
+                if current_index.isValid():
+                     self.branch_tree_view.setCurrentIndex(current_index)
+                     self.branch_tree_view.scrollTo(current_index, QAbstractItemView.ScrollHint.PositionAtCenter)
 
                 self.current_branch_name_display = current_branch_name if current_branch_name else ("(无分支?)" if is_valid else "(未知分支)")
 
 
             elif is_valid:
                 logging.error(f"获取分支失败: RC={return_code}, 错误: {stderr.strip()}")
+                self.branch_tree_model.clear()
                 self._append_output(f"❌ 获取分支列表失败:\n{stderr.strip()}", QColor("red"))
                 self.current_branch_name_display = "(未知分支)"
             elif not is_valid:
                  logging.warning("仓库在分支刷新期间变得无效，清空分支视图。")
-                 if self.branch_list_widget: self.branch_list_widget.clear()
+                 self.branch_tree_model.clear()
                  self.current_branch_name_display = "(无效仓库)"
 
         finally:
             self._refresh_operation_finished()
 
 
-    # 刷新提交历史视图
-    @pyqtSlot()
-    def _refresh_log_view(self):
-        if not self.git_handler or not self.git_handler.is_valid_repo():
-             logging.warning("试图刷新日志，但 GitHandler 不可用或仓库无效。")
-             if self.log_table_widget: self.log_table_widget.setRowCount(0)
-             if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("仓库无效")
-             self._refresh_operation_finished()
-             return
-        logging.debug("正在请求格式化日志...")
-        if self.log_table_widget: self.log_table_widget.setRowCount(0)
-        if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("正在加载提交历史...")
-
-        log_format = "%h\t%H\t%an\t%ar\t%s"
-        self.git_handler.get_log_formatted_async(
-            count=200,
-            format=log_format,
-            extra_args=["--graph", "--decorate"],
-            finished_slot=self._on_log_refreshed
-        )
-
-
-    # 处理 Git 日志刷新的回调
-    @pyqtSlot(int, str, str)
-    def _on_log_refreshed(self, return_code: int, stdout: str, stderr: str):
-        try:
-            if not self.log_table_widget:
-                 logging.error("日志表格组件在日志刷新回调时未初始化。")
-                 return
-
-            is_valid = self.git_handler.is_valid_repo()
-
-            if self.commit_details_textedit and self.log_table_widget.rowCount() == 0:
-                self.commit_details_textedit.setPlaceholderText("选中上方提交记录以查看详情...")
-
-            if return_code == 0 and is_valid:
-                lines = stdout.strip().splitlines()
-                self.log_table_widget.setUpdatesEnabled(False)
-                self.log_table_widget.setRowCount(0)
-                monospace_font = QFont("Courier New")
-                valid_rows = 0
+    # 当前展开的分支分组 (重置模型前记录)
+    def _expanded_branch_groups(self) -> set[str]:
+        if self.branch_tree_view is None or self.branch_tree_model is None:
+            return set()
+        return {self.branch_tree_model.group_key(index) for index in self.branch_tree_model.group_indexes()
+                if self.branch_tree_view.isExpanded(index)}
 
-                log_line_regex = re.compile(r'^[\\/|*._ -]*\s*([a-fA-F0-9]+)\t([a-fA-F0-9]+)\t(.*?)\t(.*?)\t(.*)$')
 
+    # 恢复分组的展开状态；筛选时展开有匹配项的分组，第一次载入时只展开本地分支
+    def _restore_branch_groups(self, expanded_groups: set[str]):
+        model = self.branch_tree_model
+        if model.filter_text():
+            for index in model.matching_group_indexes():
+                self.branch_tree_view.expand(index)
+        if not expanded_groups:
+            expanded_groups = {"local"}
+        for index in model.group_indexes():
+            if model.group_key(index) in expanded_groups:
+                self.branch_tree_view.expand(index)
 
-                for line in lines:
-                    line = line.strip()
-                    if not line: continue
 
-                    graph_match = re.match(r'^([\\/|*._ -]+\s*)', line)
-                    graph_prefix = graph_match.group(1) if graph_match else ""
-                    data_part = line[len(graph_prefix):]
+    # 按筛选框的内容筛选分支
+    @pyqtSlot()
+    def _apply_branch_filter(self):
+        if self.branch_tree_model is None or self.branch_filter_input is None: return
+        expanded_groups = self._expanded_branch_groups()
+        self.branch_tree_model.set_filter(self.branch_filter_input.text())
+        self._restore_branch_groups(expanded_groups)
 
-                    match = log_line_regex.match(line)
-                    if not match:
-                         match = log_line_regex.match(data_part)
 
-                    if match:
-                        short_hash = match.group(1)
-                        full_hash = match.group(2)
-                        author = match.group(3).strip()
-                        date = match.group(4).strip()
-                        message_and_decorations = match.group(5).strip()
+    # 分支快照中的分支名 (不含分离头指针)，供选择分支的对话框使用
+    def _branch_names(self, local: bool = True, remote: bool = True) -> list[str]:
+        return [branch.name for branch in self._branch_snapshot
+                if not branch.is_detached and (remote if branch.is_remote else local)]
 
-                        decoration_match = re.match(r'^(.*?)\s*(\(.*\))$', message_and_decorations)
-                        if decoration_match:
-                             message = decoration_match.group(1).strip()
-                             decorations = decoration_match.group(2).strip()
-                        else:
-                             message = message_and_decorations.strip()
-                             decorations = ""
 
-                        if not short_hash or not full_hash:
-                             logging.warning(f"解析到空 commit hash: {repr(line)}")
-                             continue
+    # 一次 for-each-ref 计算分支与上游的领先/落后数 (只计算缓存中没有的分支)
+    def _request_branch_track_counts(self, branches: list[BranchInfo]):
+        refnames = [branch.refname for branch in branches] if len(branches) <= BRANCH_TRACK_PATTERN_LIMIT else None
+        logging.debug(f"计算 {len(branches)} 个分支的领先/落后数...")
+        repo_path = self.git_handler.get_repo_path()
+        snapshot = self._branch_snapshot
+        self.git_handler.get_branch_track_counts_async(
+            refnames,
+            lambda rc, so, se: self._on_branch_track_counts_received(rc, so, se, branches, snapshot, repo_path)
+        )
 
-                        self.log_table_widget.insertRow(valid_rows)
-                        hash_item = QTableWidgetItem(f"{graph_prefix}{short_hash} {decorations}".strip())
-                        author_item = QTableWidgetItem(author)
-                        date_item = QTableWidgetItem(date)
-                        message_item = QTableWidgetItem(message)
 
-                        flags = Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled
-                        hash_item.setFlags(flags); author_item.setFlags(flags); date_item.setFlags(flags); message_item.setFlags(flags)
-                        hash_item.setData(Qt.ItemDataRole.UserRole, full_hash)
+    # 填入领先/落后数并更新已显示的分支行
+    def _on_branch_track_counts_received(self, return_code: int, stdout: str, stderr: str,
+                                         branches: list[BranchInfo], snapshot: list[BranchInfo], repo_path: str):
+        if return_code != 0:
+            logging.warning(f"计算分支领先/落后数失败: {stderr.strip()}")
+            return
+        store_track_counts(branches, parse_track_output(stdout), self.branch_track_cache)
+        if snapshot is not self._branch_snapshot or repo_path != self.git_handler.get_repo_path() or self.branch_tree_model is None:
+            return
+        self.branch_tree_model.refresh_branches(branches)
 
-                        hash_item.setFont(monospace_font)
 
-                        self.log_table_widget.setItem(valid_rows, LOG_COL_COMMIT, hash_item)
-                        self.log_table_widget.setItem(valid_rows, LOG_COL_AUTHOR, author_item)
-                        self.log_table_widget.setItem(valid_rows, LOG_COL_DATE, date_item)
-                        self.log_table_widget.setItem(valid_rows, LOG_COL_MESSAGE, message_item)
+    # 刷新提交历史视图
+    @pyqtSlot()
+    def _refresh_log_view(self):
+        if not self.git_handler or not self.git_handler.is_valid_repo():
+             logging.warning("试图刷新日志，但 GitHandler 不可用或仓库无效。")
+             if self.log_table_model: self.log_table_model.clear()
+             if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("仓库无效")
+             self._refresh_operation_finished()
+             return
+        if not self.log_table_model:
+             self._refresh_operation_finished()
+             return
+        logging.debug("正在请求流式日志...")
+        if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("正在加载提交历史...")
 
-                        valid_rows += 1
-                    else:
-                        if not re.match(r'^[\s\\/|*._-]+$', line):
-                           logging.warning(f"无法解析日志行 (格式可能不完全匹配或缺少数据): {repr(line)}")
+        self._log_refresh_pending = True
+        self.log_table_model.start()
+        if not self.log_table_model.is_loading():
+             self._log_refresh_finished()
 
 
-                self.log_table_widget.setRowCount(valid_rows)
-                self.log_table_widget.setUpdatesEnabled(True)
-                logging.info(f"日志表格已填充 {valid_rows} 个有效条目。")
-                self.log_table_widget.resizeColumnsToContents()
-                self.log_table_widget.horizontalHeader().setSectionResizeMode(LOG_COL_MESSAGE, QHeaderView.ResizeMode.Stretch)
+    # 日志刷新对刷新计数只汇报一次 (首页到达或加载结束，以先到者为准)
+    def _log_refresh_finished(self):
+        if self._log_refresh_pending:
+            self._log_refresh_pending = False
+            self._refresh_operation_finished()
 
 
+    # 第一页提交到达：此时界面即可使用，其余提交随滚动按页加载
+    @pyqtSlot()
+    def _on_log_first_page_loaded(self):
+        if self.commit_details_textedit:
+            self.commit_details_textedit.setPlaceholderText("选中上方提交记录以查看详情...")
+        if self.log_table_view:
+            self.log_table_view.resizeColumnToContents(LOG_COL_GRAPH)
+            self.log_table_view.resizeColumnToContents(LOG_COL_COMMIT)
+            self.log_table_view.resizeColumnToContents(LOG_COL_AUTHOR)
+            self.log_table_view.resizeColumnToContents(LOG_COL_DATE)
+        logging.info(f"日志首页已加载 ({self.log_table_model.rowCount()} 个提交)。")
+        self._log_refresh_finished()
+
+
+    # 日志流结束 (全部读取完毕、出错或被终止)
+    @pyqtSlot(int, str)
+    def _on_log_load_finished(self, return_code: int, stderr: str):
+        try:
+            is_valid = self.git_handler.is_valid_repo()
+            if return_code == 0 and is_valid:
+                if self.commit_details_textedit and self.log_table_model.rowCount() == 0:
+                    self.commit_details_textedit.setPlaceholderText("没有提交记录。")
             elif is_valid:
                 logging.error(f"获取日志失败: RC={return_code}, 错误: {stderr.strip()}")
                 self._append_output(f"❌ 获取提交历史失败:\n{stderr.strip()}", QColor("red"))
                 if self.commit_details_textedit: self.commit_details_textedit.setPlaceholderText("获取提交历史失败")
-            elif not is_valid:
+            else:
                  logging.warning("仓库在日志刷新期间变得无效，清空日志视图。")
-                 if self.log_table_widget: self.log_table_widget.setRowCount(0)
+                 if self.log_table_model: self.log_table_model.clear()
                  if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("仓库无效")
-
         finally:
-            self._refresh_operation_finished()
+            self._log_refresh_finished()
+
+
+    # 在提交缓存中搜索并显示结果列表 (输入停顿后触发)
+    @pyqtSlot()
+    def _run_log_search(self):
+        self._log_search_timer.stop()
+        if not self.log_search_input or self.log_search_results is None or not self.log_table_model:
+            return
+        text = self.log_search_input.text().strip()
+        self.log_search_results.clear()
+        if not text or not self.git_handler.is_valid_repo():
+            self.log_search_results.setVisible(False)
+            return
+
+        start = time.perf_counter()
+        hits = self.log_table_model.search_commits(text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.log_search_results.setVisible(True)
+        if hits is None:
+            self.log_search_results.addItem("提交缓存不可用，无法搜索。")
+            return
+        logging.debug(f"提交搜索 {repr(text)}: {len(hits)} 个结果，用时 {elapsed_ms:.1f} ms")
+        if not hits:
+            building = " (提交缓存正在更新，结果可能不完整)" if self.log_table_model.is_search_index_updating() else ""
+            self.log_search_results.addItem(f"没有匹配的提交。{building}")
+            return
+        for oid, author, commit_time, subject in hits:
+            date_text = time.strftime("%Y-%m-%d", time.localtime(commit_time))
+            item = QListWidgetItem(f"{oid.hex()[:7]}  {subject}  — {author}, {date_text}")
+            item.setData(Qt.ItemDataRole.UserRole, oid.hex())
+            item.setToolTip(oid.hex())
+            self.log_search_results.addItem(item)
+        if self.status_bar:
+            self.status_bar.showMessage(f"找到 {len(hits)} 个提交 ({elapsed_ms:.0f} ms)", 3000)
+
+
+    # 选择搜索结果：先确认提交在 HEAD 的历史中，再让日志模型加载到该行
+    @pyqtSlot(QListWidgetItem)
+    def _on_log_search_result_activated(self, item: QListWidgetItem):
+        commit_hash = item.data(Qt.ItemDataRole.UserRole) if item else None
+        if not commit_hash or not self.log_table_model or not self._check_repo_and_warn():
+            return
+        row = self.log_table_model.store.row_of(commit_hash)
+        if row is not None and row < self.log_table_model.rowCount():
+            self._on_commit_located(commit_hash, row)
+            return
+        # 不在当前历史中的提交 (其他分支) 无需加载整个历史去查找
+        self.git_handler.is_ancestor_async(
+            commit_hash, "HEAD",
+            lambda rc, so, se, ch=commit_hash: self._on_search_ancestor_checked(rc, se, ch)
+        )
+
+
+    # 祖先检查完成后定位提交或只显示详情
+    def _on_search_ancestor_checked(self, return_code: int, stderr: str, commit_hash: str):
+        if not self.log_table_model:
+            return
+        if return_code == 0:
+            if self.status_bar: self.status_bar.showMessage(f"正在定位提交 {commit_hash[:7]}...", 0)
+            self.log_table_model.locate(commit_hash)
+        else:
+            if return_code != 1:
+                logging.warning(f"检查提交 {commit_hash[:7]} 是否在 HEAD 历史中失败: {stderr.strip()}")
+            self._on_commit_located(commit_hash, -1)
+
+
+    # 日志模型找到 (或未找到) 目标提交
+    @pyqtSlot(str, int)
+    def _on_commit_located(self, commit_hash: str, row: int):
+        if not self.log_table_view or not self.log_table_model:
+            return
+        if row >= 0:
+            self.log_table_view.selectRow(row)
+            self.log_table_view.scrollTo(self.log_table_model.index(row, LOG_COL_COMMIT), QAbstractItemView.ScrollHint.PositionAtCenter)
+            if self.status_bar: self.status_bar.showMessage(f"已定位到提交 {commit_hash[:7]}", 3000)
+            return
+        # 不在当前显示的历史中 (其他分支或查询范围外)，只显示详情
+        self.log_table_view.clearSelection()
+        if self.status_bar: self.status_bar.showMessage(f"提交 {commit_hash[:7]} 不在当前显示的历史中，仅显示详情。", 5000)
+        self._show_commit_details(commit_hash)
 
 
     # 显示选择或克隆仓库对话框
@@ -1297,13 +1640,22 @@ class MainWindow(QMainWindow):
              if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("...")
              self._clear_sequence()
              if self.status_tree_model: self.status_tree_model.clear_status()
-             if self.branch_list_widget: self.branch_list_widget.clear()
-             if self.log_table_widget: self.log_table_widget.setRowCount(0)
+             if self.branch_tree_model: self.branch_tree_model.clear()
+             if self.log_table_model: self.log_table_model.clear()
+             if self.log_search_input: self.log_search_input.clear()
              self.current_branch_name_display = None
              QApplication.processEvents()
 
              logging.info(f"尝试设置仓库路径为: {dir_path}")
              self.git_handler.set_repo_path(dir_path)
+             self.diffstat_cache.clear()
+             self.commit_details_cache.clear()
+             self.blame_cache.clear()
+             self.compare_files_cache.clear()
+             self.merge_preview_cache.clear()
+             self._commit_prefetch_queue = []
+             self._status_diff_files_cache = {}
+             self._load_repo_scope()
              self._update_repo_status()
 
          except ValueError as e:
@@ -1432,15 +1784,7 @@ class MainWindow(QMainWindow):
     # 通过对话框选择或输入分支/提交添加到 'git merge' 命令
     def _add_merge_to_sequence(self):
         if not self._check_repo_and_warn(): return
-        branches = []
-        if self.branch_list_widget:
-            for i in range(self.branch_list_widget.count()):
-                item = self.branch_list_widget.item(i)
-                branch_name = item.text().strip()
-                if not branch_name.startswith("remotes/") and not branch_name.startswith("("):
-                    branch_name = branch_name.lstrip('* ').strip()
-                    if branch_name:
-                         branches.append(branch_name)
+        branches = self._branch_names(remote=False)
 
         current_branch = self.current_branch_name_display if self.current_branch_name_display and not self.current_branch_name_display.startswith('(') else ""
         suggested_branches = sorted([b for b in branches if b != current_branch])
@@ -1463,23 +1807,13 @@ class MainWindow(QMainWindow):
         if not self._check_repo_and_warn(): return
         refs = set(["HEAD", "HEAD~1"])
 
-        if self.branch_list_widget:
-            for i in range(self.branch_list_widget.count()):
-                 item = self.branch_list_widget.item(i)
-                 branch_name = item.text().strip()
-                 if not branch_name.startswith("("):
-                    branch_name = branch_name.lstrip('* ').strip()
-                    if branch_name:
-                         refs.add(branch_name)
-
-        if self.log_table_widget:
-            for r in range(min(20, self.log_table_widget.rowCount())):
-                hash_item = self.log_table_widget.item(r, LOG_COL_COMMIT)
-                if hash_item:
-                    displayed_hash_text = hash_item.text().strip()
-                    short_hash_match = re.search(r'\b([a-fA-F0-9]{7,})\b', displayed_hash_text)
-                    if short_hash_match:
-                         refs.add(short_hash_match.group(1))
+        refs.update(self._branch_names())
+
+        if self.log_table_model:
+            for r in range(min(20, self.log_table_model.rowCount())):
+                short_hash = self.log_table_model.short_oid(r)
+                if short_hash:
+                    refs.add(short_hash)
 
         suggested_targets = sorted(list(refs)) + ["-- <file_path>"]
 
@@ -1549,14 +1883,12 @@ class MainWindow(QMainWindow):
     def _add_revert_to_sequence(self):
         if not self._check_repo_and_warn(): return
         recent_commits = []
-        if self.log_table_widget:
-            for r in range(min(10, self.log_table_widget.rowCount())):
-                hash_item = self.log_table_widget.item(r, LOG_COL_COMMIT)
-                msg_item = self.log_table_widget.item(r, LOG_COL_MESSAGE)
-                if hash_item and msg_item:
-                    short_hash = hash_item.text().strip().split()[0]
-                    msg = msg_item.text()
-                    full_hash = hash_item.data(Qt.ItemDataRole.UserRole) or short_hash
+        if self.log_table_model:
+            for r in range(min(10, self.log_table_model.rowCount())):
+                short_hash = self.log_table_model.short_oid(r)
+                full_hash = self.log_table_model.commit_oid(r)
+                if short_hash and full_hash:
+                    msg = self.log_table_model.subject(r)
                     recent_commits.append(f"{short_hash} - {msg[:50]} | {full_hash}")
 
         display_items = [item.split(' | ')[0] for item in recent_commits]
@@ -1585,17 +1917,14 @@ class MainWindow(QMainWindow):
         targets = set()
         common_bases = ["main", "master", "develop"]
 
-        if self.branch_list_widget:
-             for i in range(self.branch_list_widget.count()):
-                  item = self.branch_list_widget.item(i)
-                  branch_name = item.text().strip()
-                  if branch_name.startswith("remotes/") or branch_name in common_bases:
-                       targets.add(branch_name.lstrip('* ').strip())
+        for branch_name in self._branch_names():
+             if branch_name.startswith("remotes/") or branch_name in common_bases:
+                  targets.add(branch_name)
 
-        if self.log_table_widget and self.log_table_widget.rowCount() > 0:
-             targets.add(f"HEAD~{min(5, self.log_table_widget.rowCount())}")
+        if self.log_table_model and self.log_table_model.rowCount() > 0:
+             targets.add(f"HEAD~{min(5, self.log_table_model.rowCount())}")
              targets.add("HEAD")
-             if self.log_table_widget.rowCount() > 1:
+             if self.log_table_model.rowCount() > 1:
                   targets.add(f"HEAD~1")
 
         suggested_targets = sorted(list(targets)) + ["-i <ref>"]
@@ -1816,6 +2145,8 @@ class MainWindow(QMainWindow):
                 self.loading_label.hide()
                 if not force_update:
                      self._update_status_bar_info()
+                if self._file_op_queue and not self._file_op_running:
+                     QTimer.singleShot(0, self._resume_file_operations)
 
         if busy:
             QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
@@ -2016,8 +2347,16 @@ class MainWindow(QMainWindow):
         if not has_changes:
             self._show_information("无操作", "没有未暂存或未跟踪的文件可供暂存。")
             return
-        logging.info("请求暂存所有更改 (git add .)")
-        self._run_command_list_sequentially(["git add ."])
+        # 设置了范围时只暂存范围内的路径，范围外的文件不在状态树中，不能被悄悄暂存
+        scope = self.git_handler.get_scope()
+        logging.info(f"请求暂存所有更改 (git add {' '.join(scope) if scope else '.'})")
+        if self.status_tree_model:
+            self.status_tree_model.optimistic_stage(
+                self.status_tree_model.get_files_in_section(STATUS_UNSTAGED) +
+                self.status_tree_model.get_files_in_section(STATUS_UNTRACKED) +
+                self.status_tree_model.get_files_in_section(STATUS_UNMERGED)
+            )
+        self._enqueue_file_operation(["git", "add", "--"] + scope if scope else ["git", "add", "."])
 
 
     # 撤销所有已暂存文件 (git reset HEAD --)
@@ -2030,24 +2369,97 @@ class MainWindow(QMainWindow):
         if not has_staged:
              self._show_information("无操作", "没有已暂存的文件可供撤销。")
              return
-        logging.info("请求撤销全部暂存 (git reset HEAD --)");
-        self._run_command_list_sequentially(["git reset HEAD --"])
+        scope = self.git_handler.get_scope()
+        logging.info(f"请求撤销全部暂存 (git reset HEAD -- {' '.join(scope)})");
+        if self.status_tree_model:
+            self.status_tree_model.optimistic_unstage(self.status_tree_model.get_files_in_section(STATUS_STAGED))
+        self._enqueue_file_operation(["git", "reset", "HEAD", "--"] + scope)
 
 
     # 暂存指定文件
     def _stage_files(self, files: list[str]):
         if not self._check_repo_and_warn() or not files: return
         logging.info(f"请求暂存特定文件: {files}")
-        command_parts = ["git", "add", "--"] + [shlex.quote(f) for f in files]
-        self._run_command_list_sequentially([ ' '.join(command_parts) ])
+        if self.status_tree_model: self.status_tree_model.optimistic_stage(files)
+        self._enqueue_file_operation(["git", "add", "--"] + list(files))
 
 
     # 撤销暂存指定文件
     def _unstage_files(self, files: list[str]):
         if not self._check_repo_and_warn() or not files: return
         logging.info(f"请求撤销暂存特定文件: {files}")
-        command_parts = ["git", "reset", "HEAD", "--"] + [shlex.quote(f) for f in files]
-        self._run_command_list_sequentially([ ' '.join(command_parts) ])
+        if self.status_tree_model: self.status_tree_model.optimistic_unstage(files)
+        self._enqueue_file_operation(["git", "reset", "HEAD", "--"] + list(files))
+
+
+    # 文件操作队列中是否还有未完成的操作
+    def _has_pending_file_operations(self) -> bool:
+        return self._file_op_running or bool(self._file_op_queue)
+
+
+    # 将暂存/撤销暂存/丢弃等文件操作加入队列，逐个执行 (避免并发争用 index.lock)
+    def _enqueue_file_operation(self, command_parts: list[str]):
+        self._file_op_queue.append(command_parts)
+        self._status_diff_files_cache = {}
+        if self._is_busy:
+            # 正在执行的命令链 (提交、合并、拉取等) 也会写索引，等它结束后再执行，避免争用 index.lock
+            logging.warning(f"UI 正忙，文件操作将在当前命令结束后执行: {command_parts}")
+            return
+        if not self._file_op_running:
+            self._run_next_file_operation()
+
+
+    # 忙碌状态结束后执行期间排队的文件操作
+    def _resume_file_operations(self):
+        if not self._is_busy and not self._file_op_running and self._file_op_queue:
+            self._run_next_file_operation()
+
+
+    # 执行队列中的下一个文件操作，队列清空后在后台校正状态树
+    def _run_next_file_operation(self):
+        if not self._file_op_queue:
+            self._file_op_running = False
+            self._reconcile_status()
+            return
+
+        self._file_op_running = True
+        command_parts = self._file_op_queue.pop(0)
+        display_cmd = ' '.join(shlex.quote(part) for part in command_parts)
+        self._append_output(f"\n$ {display_cmd}", QColor("darkGreen"))
+        self.git_handler.execute_command_async(
+            command_parts,
+            lambda rc, so, se, dc=display_cmd: self._on_file_operation_finished(rc, so, se, dc)
+        )
+
+
+    # 处理单个文件操作的结果
+    def _on_file_operation_finished(self, return_code: int, stdout: str, stderr: str, display_cmd: str):
+        if stdout: self._append_output(f"stdout:\n{stdout.strip()}")
+        if stderr: self._append_output(f"stderr:\n{stderr.strip()}")
+        if return_code == 0:
+            self._append_output(f"✅ 成功: '{display_cmd}'", QColor("darkCyan"))
+        else:
+            logging.error(f"文件操作失败! 命令: '{display_cmd}', 返回码: {return_code}, 标准错误: {stderr.strip()}")
+            self._append_output(f"❌ 失败 (RC: {return_code}) '{display_cmd}'，状态视图将被校正。", QColor("red"))
+            if self.status_bar: self.status_bar.showMessage(f"操作失败: {display_cmd[:50]}", 5000)
+        QTimer.singleShot(0, self._run_next_file_operation)
+
+
+    # 后台重新获取 git status，纠正乐观更新与真实状态的偏差
+    def _reconcile_status(self):
+        if not self.git_handler or not self.git_handler.is_valid_repo():
+            return
+        logging.debug("文件操作队列已清空，后台校正状态视图...")
+        self.git_handler.get_status_porcelain_async(self._on_status_reconciled)
+
+
+    # 处理后台校正的 git status 结果 (期间若有新的文件操作则忽略，等待下一次校正)
+    @pyqtSlot(int, str, str)
+    def _on_status_reconciled(self, return_code: int, stdout: str, stderr: str):
+        if self._has_pending_file_operations():
+            logging.debug("校正期间有新的文件操作，丢弃本次状态结果。")
+            return
+        self._apply_status_output(return_code, stdout, stderr)
 
 
     # 显示状态视图的右键菜单
@@ -2113,6 +2525,24 @@ class MainWindow(QMainWindow):
                       open_folder_action.setEnabled(is_repo_valid)
                       menu.addAction(open_folder_action)
 
+        tracked_paths = all_selected_paths - set(selected_files_data.get(STATUS_UNTRACKED, []))
+        if len(all_selected_paths) == 1 and tracked_paths:
+             history_path = list(tracked_paths)[0]
+             if added_action: menu.addSeparator()
+             history_action = QAction(f"文件历史 '{os.path.basename(history_path)}'...", self)
+             history_action.setToolTip("查看该文件的提交历史 (git log --follow)")
+             history_action.triggered.connect(lambda checked=False, path=history_path: self._open_file_history(path))
+             history_action.setEnabled(self.git_handler.is_valid_repo())
+             menu.addAction(history_action)
+             blame_action = QAction(f"追溯 (Blame) '{os.path.basename(history_path)}'...", self)
+             blame_action.triggered.connect(lambda checked=False, path=history_path: self._open_blame("HEAD", path))
+             in_head = self.status_tree_model.is_in_head(history_path)
+             blame_action.setToolTip("逐行查看该文件在 HEAD 中的来源提交 (git blame)" if in_head
+                                     else "该文件是新增的，还不在 HEAD 中，无法追溯")
+             blame_action.setEnabled(self.git_handler.is_valid_repo() and in_head)
+             menu.addAction(blame_action)
+             added_action = True
+
 
         current_index = self.status_tree_view.indexAt(pos)
         if current_index.isValid() and not current_index.parent().isValid():
@@ -2163,8 +2593,8 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             logging.info(f"请求丢弃文件更改: {files}")
-            command_parts = ["git", "restore", "--"] + [shlex.quote(f) for f in files]
-            self._run_command_list_sequentially([ ' '.join(command_parts) ])
+            if self.status_tree_model: self.status_tree_model.optimistic_discard(files)
+            self._enqueue_file_operation(["git", "restore", "--"] + list(files))
 
 
     # 处理状态视图选择变化，触发差异显示更新
@@ -2180,6 +2610,8 @@ class MainWindow(QMainWindow):
              return
 
         self.diff_text_edit.clear()
+        self._status_diff_generation += 1
+        self._status_prefetch_timer.stop()
         selected_indexes = self.status_tree_view.selectionModel().selectedIndexes()
 
         if not selected_indexes:
@@ -2191,11 +2623,15 @@ class MainWindow(QMainWindow):
         all_unique_selected_files = set(p for paths in selected_files_data.values() for p in paths)
 
 
-        if len(all_unique_selected_files) != 1:
-            self.diff_text_edit.setPlaceholderText(f"请选择单个文件以查看差异 ({len(all_unique_selected_files)} 个文件被选中)");
+        if len(all_unique_selected_files) > 1:
+            self._show_status_multi_diff(selected_files_data)
+            return
+        if not all_unique_selected_files:
+            self.diff_text_edit.setPlaceholderText("选中已更改的文件以查看差异...");
             return
 
         file_path = list(all_unique_selected_files)[0]
+        self._status_prefetch_timer.start()
         section_type_priority = [STATUS_UNSTAGED, STATUS_STAGED, STATUS_UNTRACKED, STATUS_UNMERGED]
         section_type_for_diff = None
         for section in section_type_priority:
@@ -2218,7 +2654,7 @@ class MainWindow(QMainWindow):
                  full_path = os.path.join(repo_base, file_path)
                  try:
                       with open(full_path, 'r', encoding='utf-8', errors='ignore') as f: content = f.read()
-                      self._display_formatted_diff(self.diff_text_edit, f"--- 未跟踪文件: {file_path} ---\n\n{content}")
+                      self.diff_text_edit.set_file_text(f"--- 未跟踪文件: {file_path} ---", file_path, content)
                  except Exception as e:
                       logging.error(f"无法读取未跟踪文件 {full_path}: {e}")
                       self.diff_text_edit.setPlainText(f"无法读取未跟踪文件:\n{e}")
@@ -2234,23 +2670,295 @@ class MainWindow(QMainWindow):
             self.diff_text_edit.setPlaceholderText(f"正在加载 '{base_name}' 的 {diff_type_name} 差异...");
             QApplication.processEvents()
 
-            diff_command = ["git", "diff", "--no-ext-diff"]
-            if staged_diff:
-                diff_command.append("--cached")
-            elif section_type_for_diff == STATUS_UNSTAGED:
-                pass
-            elif section_type_for_diff == STATUS_UNMERGED:
-                 pass
+            if section_type_for_diff == STATUS_UNMERGED:
+                # 未合并文件显示完整的合并差异 (含冲突标记)
+                self.git_handler.execute_command_async(
+                    ["git", "diff", "--no-ext-diff", "--", file_path],
+                    lambda rc, so, se, fp=file_path, sd=staged_diff: self._on_diff_received(rc, so, se, fp, sd)
+                )
+            else:
+                generation = self._status_diff_generation
+                prefetched = None if self._has_pending_file_operations() else self._status_diff_files_cache.get((staged_diff, file_path))
+                if prefetched is not None and prefetched[0] == self._status_diff_stamp(staged_diff, file_path):
+                    self._show_status_diff_files(file_path, prefetched[1], staged_diff, generation)
+                    return
+                # 先获取文件列表和行数统计，补丁在文件展开时才获取
+                self.git_handler.get_diff_files_async(
+                    staged_diff, [file_path],
+                    lambda rc, so, se, fp=file_path, sd=staged_diff, g=generation: self._on_diff_files_received(rc, so, se, fp, sd, g)
+                )
+        else:
+            self.diff_text_edit.setPlainText("❌ 内部错误：Git 处理程序不可用。")
+            self.diff_text_edit.setPlaceholderText("")
 
-            diff_command.extend(["--", file_path])
 
-            self.git_handler.execute_command_async(
-                diff_command,
-                lambda rc, so, se, fp=file_path, sd=staged_diff: self._on_diff_received(rc, so, se, fp, sd)
-            )
+    # 处理差异文件列表: 显示折叠的文件标题，小文件自动展开
+    def _on_diff_files_received(self, return_code: int, stdout: str, stderr: str, file_path: str, staged_diff: bool, generation: int):
+        if not self.diff_text_edit or generation != self._status_diff_generation: return
+        self.diff_text_edit.setPlaceholderText("")
+        if return_code != 0:
+            self.diff_text_edit.setPlainText(f"❌ 获取 '{os.path.basename(file_path)}' 的差异失败:\n{stderr.strip()}")
+            logging.error(f"Git diff 失败 (RC={return_code}) for {file_path}: {stderr.strip()}")
+            return
+        files = parse_raw_numstat_z(stdout)
+        if not files:
+            self._show_status_diff_files(file_path, files, staged_diff, generation)
+            return
+        self._hash_worktree_files(files, lambda fs=files: self._show_status_diff_files(file_path, fs, staged_diff, generation))
+
+
+    # 工作区一侧没有 blob id，用 hash-object 计算后才能按 blob id 查差异缓存 (符号链接的 blob 是链接文本，跳过)；完成后调用 done()
+    def _hash_worktree_files(self, files: list[DiffFile], done, low_priority: bool = False):
+        repo_path = self.git_handler.get_repo_path() or ""
+        worktree_files = [diff_file for diff_file in files
+                          if diff_file.new_oid == NULL_OID and diff_file.status != 'D'
+                          and not os.path.islink(os.path.join(repo_path, diff_file.path))]
+        if not worktree_files:
+            done()
+            return
+        self.git_handler.hash_objects_async(
+            [diff_file.path for diff_file in worktree_files],
+            lambda rc, so, se, wf=worktree_files: self._on_worktree_oids_received(rc, so, se, wf, done),
+            low_priority=low_priority
+        )
+
+
+    def _on_worktree_oids_received(self, return_code: int, stdout: str, stderr: str, worktree_files: list[DiffFile], done):
+        oids = stdout.split()
+        if return_code == 0 and len(oids) == len(worktree_files):
+            for diff_file, oid in zip(worktree_files, oids):
+                diff_file.new_oid = oid
         else:
-            self.diff_text_edit.setPlainText("❌ 内部错误：Git 处理程序不可用。")
+            logging.warning(f"计算工作区文件的 blob id 失败，这些文件的差异不使用缓存: {stderr.strip()}")
+        done()
+
+
+    def _show_status_diff_files(self, file_path: str, files: list[DiffFile], staged_diff: bool, generation: int):
+        if not self.diff_text_edit or generation != self._status_diff_generation: return
+        self.diff_text_edit.setPlaceholderText("")
+        if not files:
+            compare_target = "HEAD" if staged_diff else "暂存区"
+            self.diff_text_edit.setPlainText(f"文件 '{os.path.basename(file_path)}' 与 {compare_target} 没有差异。")
+            return
+        self.diff_text_edit.set_diff_files(
+            "", files,
+            lambda diff_files, done, sd=staged_diff: load_patches(
+                self.diff_cache, diff_files, done,
+                lambda missing, slot: self.git_handler.get_diff_patch_async(sd, [path for f in missing for path in f.pathspecs], slot)))
+
+
+    # 多选文件的合并差异: 每个区段一次 git diff 获取文件列表，补丁在文件展开时按区段获取
+    def _show_status_multi_diff(self, selected_files_data: dict):
+        generation = self._status_diff_generation
+        unstaged_paths = list(dict.fromkeys(selected_files_data.get(STATUS_UNSTAGED, [])))
+        # 同一文件的暂存和未暂存两行都选中时，与单选一样显示未暂存的差异
+        staged_paths = [path for path in dict.fromkeys(selected_files_data.get(STATUS_STAGED, [])) if path not in set(unstaged_paths)]
+        skipped_paths = selected_files_data.get(STATUS_UNTRACKED, []) + selected_files_data.get(STATUS_UNMERGED, [])
+        groups = [(staged_diff, paths) for staged_diff, paths in ((True, staged_paths), (False, unstaged_paths)) if paths]
+        if not groups:
+            self.diff_text_edit.setPlaceholderText(f"选中的 {len(skipped_paths)} 个未跟踪/未合并文件需要单独查看。")
+            return
+        self.diff_text_edit.setPlaceholderText(f"正在加载 {len(staged_paths) + len(unstaged_paths)} 个文件的差异...")
+        results: dict[bool, list[DiffFile]] = {}
+        for staged_diff, paths in groups:
+            # git 2.39 的 diff 不能从标准输入读取路径；选中很多文件时取整个区段的列表再筛选
+            pathspec = paths if len(paths) <= DIFFSTAT_PATHSPEC_LIMIT else None
+            self.git_handler.get_diff_files_async(
+                staged_diff, pathspec,
+                lambda rc, so, se, sd=staged_diff, ps=set(paths): self._on_multi_diff_files_received(
+                    rc, so, se, sd, ps, results, len(groups), skipped_paths, generation)
+            )
+
+
+    def _on_multi_diff_files_received(self, return_code: int, stdout: str, stderr: str, staged_diff: bool, paths: set,
+                                      results: dict, group_count: int, skipped_paths: list, generation: int):
+        if not self.diff_text_edit or generation != self._status_diff_generation: return
+        if return_code != 0:
+            logging.error(f"获取多个文件的差异列表失败 (cached={staged_diff}): {stderr.strip()}")
+            self._status_diff_generation += 1
             self.diff_text_edit.setPlaceholderText("")
+            self.diff_text_edit.setPlainText(f"❌ 获取差异失败:\n{stderr.strip()}")
+            return
+        results[staged_diff] = [diff_file for diff_file in parse_raw_numstat_z(stdout)
+                                if diff_file.path in paths or diff_file.old_path in paths]
+        if len(results) < group_count:
+            return
+        staged_files, unstaged_files = results.get(True, []), results.get(False, [])
+        self._hash_worktree_files(
+            unstaged_files,
+            lambda: self._show_status_multi_diff_files(staged_files, unstaged_files, skipped_paths, generation)
+        )
+
+
+    def _show_status_multi_diff_files(self, staged_files: list[DiffFile], unstaged_files: list[DiffFile], skipped_paths: list, generation: int):
+        if not self.diff_text_edit or generation != self._status_diff_generation: return
+        self.diff_text_edit.setPlaceholderText("")
+        preamble = []
+        if staged_files:
+            preamble.append(f"已暂存的更改 (与 HEAD 比较): {len(staged_files)} 个文件")
+        if unstaged_files:
+            preamble.append(f"{'其后为' if staged_files else ''}未暂存的更改 (与暂存区比较): {len(unstaged_files)} 个文件")
+        if skipped_paths:
+            preamble.append(f"另有 {len(skipped_paths)} 个未跟踪/未合并文件未显示，请单独选中查看。")
+        if not staged_files and not unstaged_files:
+            self.diff_text_edit.setPlainText('\n'.join(preamble + ["选中的文件没有差异。"]))
+            return
+        staged_ids = {id(diff_file) for diff_file in staged_files}
+        self.diff_text_edit.set_diff_files(
+            '\n'.join(preamble), staged_files + unstaged_files,
+            lambda diff_files, done: self._load_status_multi_patches(diff_files, staged_ids, done))
+
+
+    # 多选差异的补丁加载: 按区段分开获取，两部分都完成后一起交给视图
+    def _load_status_multi_patches(self, files: list[DiffFile], staged_ids: set, done):
+        parts = [(staged_diff, part) for staged_diff, part in
+                 ((True, [f for f in files if id(f) in staged_ids]), (False, [f for f in files if id(f) not in staged_ids])) if part]
+        merged: dict[str, str] = {}
+        remaining = [len(parts)]
+
+        def part_done(patches, error):
+            if remaining[0] <= 0:
+                return
+            if patches is None:
+                remaining[0] = 0
+                done(None, error)
+                return
+            merged.update(patches)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done(merged, "")
+
+        for staged_diff, part in parts:
+            load_patches(
+                self.diff_cache, part, part_done,
+                lambda missing, slot, sd=staged_diff: self.git_handler.get_diff_patch_async(sd, [path for f in missing for path in f.pathspecs], slot))
+
+
+    # 空闲时预取状态树中选中项前后几项 (以及较小的整个暂存区) 的差异: 文件列表存入内存，补丁存入差异缓存
+    @pyqtSlot()
+    def _start_status_prefetch(self):
+        if not self.status_tree_view or not self.status_tree_model or self._is_busy or self._has_pending_file_operations():
+            return
+        current = self.status_tree_view.selectionModel().currentIndex()
+        if not current.isValid():
+            return
+        wanted: dict[bool, list[str]] = {True: [], False: []}
+        for step in (self.status_tree_view.indexBelow, self.status_tree_view.indexAbove):
+            index, found = current, 0
+            while found < STATUS_PREFETCH_NEIGHBOURS:
+                index = step(index)
+                if not index.isValid():
+                    break
+                entry = self._status_entry_at(index)
+                if entry is None:
+                    continue
+                found += 1
+                wanted[entry[0]].append(entry[1])
+        staged_files = self.status_tree_model.get_files_in_section(STATUS_STAGED)
+        if len(staged_files) <= STATUS_PREFETCH_STAGED_MAX:
+            wanted[True].extend(staged_files)
+
+        cache = self._status_diff_files_cache
+        queue = []
+        for staged_diff, paths in wanted.items():
+            paths = [path for path in dict.fromkeys(paths) if (staged_diff, path) not in cache]
+            if paths:
+                queue.append((staged_diff, paths))
+        if queue:
+            logging.debug(f"预取状态视图中 {sum(len(paths) for _, paths in queue)} 个文件的差异。")
+            self._prefetch_next_status_group(queue, self._status_diff_generation)
+
+
+    # 状态树中一行对应的 (是否暂存区, 路径)；区段标题、未跟踪和未合并文件返回 None
+    def _status_entry_at(self, index: QModelIndex) -> Optional[tuple[bool, str]]:
+        parent = index.parent()
+        if not parent.isValid():
+            return None
+        section_type = self.status_tree_model.itemFromIndex(parent.siblingAtColumn(0)).data(Qt.ItemDataRole.UserRole)
+        if section_type not in (STATUS_STAGED, STATUS_UNSTAGED):
+            return None
+        path_item = self.status_tree_model.itemFromIndex(index.siblingAtColumn(STATUS_COL_PATH))
+        file_path = path_item.data(Qt.ItemDataRole.UserRole + 1) if path_item else None
+        return (section_type == STATUS_STAGED, file_path) if file_path else None
+
+
+    # 预取队列中的下一组: 文件列表 -> 工作区 blob id -> 自动展开文件的补丁，每步低优先级运行。
+    # 选中项改变 (generation 变化) 后不再启动新的步骤；已完成步骤的结果仍然有效，照常保存
+    def _prefetch_next_status_group(self, queue: list, generation: int):
+        if not queue or generation != self._status_diff_generation or self._is_busy:
+            return
+        staged_diff, paths = queue.pop(0)
+        cache = self._status_diff_files_cache
+        # 时间戳在运行 git 之前取，运行期间文件再有变化时预取结果不会被使用
+        stamps = {path: self._status_diff_stamp(staged_diff, path) for path in paths}
+        self.git_handler.get_diff_files_async(
+            staged_diff, paths,
+            lambda rc, so, se: self._on_status_files_prefetched(rc, so, staged_diff, paths, stamps, cache, queue, generation),
+            low_priority=True
+        )
+
+
+    # 预取的文件列表是否仍然有效的依据: 索引文件和 (工作区差异时) 工作区文件的修改时间与大小
+    def _status_diff_stamp(self, staged_diff: bool, file_path: str) -> tuple:
+        repo_path = self.git_handler.get_repo_path() or ""
+        paths = [os.path.join(repo_path, '.git', 'index')]
+        if not staged_diff:
+            paths.append(os.path.join(repo_path, file_path))
+        stamp = []
+        for path in paths:
+            try:
+                st = os.lstat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+
+    def _on_status_files_prefetched(self, return_code: int, stdout: str, staged_diff: bool, paths: list[str], stamps: dict,
+                                    cache: dict, queue: list, generation: int):
+        if return_code != 0 or cache is not self._status_diff_files_cache:
+            return
+        files_by_path: dict[str, list[DiffFile]] = {path: [] for path in paths}
+        for diff_file in parse_raw_numstat_z(stdout):
+            # 一起请求时可能检测到重命名，与单独显示一个文件时的列表不同，这些路径不预取
+            if diff_file.old_path:
+                files_by_path.pop(diff_file.old_path, None)
+                files_by_path.pop(diff_file.path, None)
+            elif diff_file.path in files_by_path:
+                files_by_path[diff_file.path].append(diff_file)
+        files = [diff_file for path_files in files_by_path.values() for diff_file in path_files]
+        self._hash_worktree_files(
+            files,
+            lambda: self._on_status_prefetch_hashed(staged_diff, files_by_path, stamps, cache, queue, generation),
+            low_priority=True
+        )
+
+
+    def _on_status_prefetch_hashed(self, staged_diff: bool, files_by_path: dict, stamps: dict, cache: dict, queue: list, generation: int):
+        if cache is not self._status_diff_files_cache:
+            return
+        for path, files in files_by_path.items():
+            cache[(staged_diff, path)] = (stamps[path], files)
+        keys = {diff_file.path: diff_cache_key(diff_file)
+                for path_files in files_by_path.values() for diff_file in auto_expand_files(path_files)}
+        missing_keys = self.diff_cache.missing(keys.values())
+        missing = [diff_file for path_files in files_by_path.values() for diff_file in path_files if keys.get(diff_file.path) in missing_keys]
+        if not missing or generation != self._status_diff_generation:
+            self._prefetch_next_status_group(queue, generation)
+            return
+        self.git_handler.get_diff_patch_async(
+            staged_diff, [path for diff_file in missing for path in diff_file.pathspecs],
+            lambda rc, so, se, fs=missing: self._on_status_patches_prefetched(rc, so, fs, queue, generation),
+            low_priority=True
+        )
+
+
+    def _on_status_patches_prefetched(self, return_code: int, stdout: str, files: list[DiffFile], queue: list, generation: int):
+        if return_code == 0:
+            patches = split_patch_by_file(stdout, files)
+            self.diff_cache.put_many([(diff_cache_key(diff_file), patches[diff_file.path])
+                                      for diff_file in files if diff_file.path in patches])
+        self._prefetch_next_status_group(queue, generation)
 
 
     # 处理 Git diff 命令结果并显示
@@ -2274,55 +2982,18 @@ class MainWindow(QMainWindow):
                  self.diff_text_edit.setPlainText(error_message)
                  logging.error(f"Git diff 失败 (RC={return_code}) for {file_path}: {stderr.strip()}")
 
-    # 在指定的 QTextEdit 中显示带颜色格式的差异文本
-    def _display_formatted_diff(self, target_edit: QTextEdit, diff_text: str):
+    # 在差异视图中显示差异文本 (整体载入，颜色在滚动到可见时才设置)
+    def _display_formatted_diff(self, target_edit: DiffView, diff_text: str):
         if not target_edit: return
+        target_edit.set_diff_text(diff_text)
 
-        target_edit.clear()
-        cursor = target_edit.textCursor()
-
-        default_format = target_edit.currentCharFormat()
-        mono_font = QFont("Courier New", default_format.font().pointSize()+1)
-        default_format.setFont(mono_font)
-
-        add_format = QTextCharFormat(default_format); add_format.setForeground(QColor("darkGreen")); add_format.setFontWeight(QFont.Weight.Bold)
-        del_format = QTextCharFormat(default_format); del_format.setForeground(QColor("red"))
-        header_format = QTextCharFormat(default_format); header_format.setForeground(QColor("darkCyan")); header_format.setFontWeight(QFont.Weight.Bold)
-        hunk_header_format = QTextCharFormat(default_format); hunk_header_format.setForeground(QColor("darkCyan")); hunk_header_format.setFontWeight(QFont.Weight.Bold); hunk_header_format.setFontItalic(True)
-        conflict_format = QTextCharFormat(default_format); conflict_format.setForeground(QColor("orange")); conflict_format.setBackground(QColor("#404000")); conflict_format.setFontWeight(QFont.Weight.Bold)
-
-        target_edit.setCurrentCharFormat(default_format)
-
-        lines = diff_text.splitlines()
-        for line in lines:
-            fmt_to_apply = default_format
-            text_to_insert = line
 
-            if line.startswith('diff ') or line.startswith('index ') or line.startswith('--- ') or line.startswith('+++ '):
-                fmt_to_apply = header_format
-            elif line.startswith('@@ '):
-                fmt_to_apply = hunk_header_format
-            elif line.startswith('+'):
-                fmt_to_apply = add_format
-            elif line.startswith('-'):
-                fmt_to_apply = del_format
-            elif line.startswith(('<<<<<<< ', '=======', '>>>>>>> ')):
-                 fmt_to_apply = conflict_format
-
-            cursor.insertText(text_to_insert, fmt_to_apply)
-            cursor.insertText("\n", default_format)
-
-        cursor.movePosition(QTextCursor.MoveOperation.Start)
-        target_edit.setTextCursor(cursor)
-        target_edit.ensureCursorVisible()
-
-
-    # 双击分支列表项，尝试切换到该分支或基于远程分支创建本地分支
-    @pyqtSlot(QListWidgetItem)
-    def _branch_double_clicked(self, item: QListWidgetItem):
-        if not item or not self._check_repo_and_warn(): return
-        branch_name = item.text().strip();
-        if not branch_name: return
+    # 双击分支行，尝试切换到该分支或基于远程分支创建本地分支 (分组行由视图展开/折叠)
+    @pyqtSlot(QModelIndex)
+    def _branch_double_clicked(self, index: QModelIndex):
+        branch = self.branch_tree_model.branch_at(index) if self.branch_tree_model else None
+        if branch is None or branch.is_tag or not self._check_repo_and_warn(): return
+        branch_name = branch.name
 
         if branch_name.startswith("remotes/"):
              remote_parts = branch_name.split('/', 2);
@@ -2337,7 +3008,7 @@ class MainWindow(QMainWindow):
              self._show_information("提示", "当前处于 'Detached HEAD' 状态。\n如需切换到分支，请双击或右键菜单选择一个分支名称。");
              return
 
-        if item.font().bold():
+        if branch.is_current:
              logging.info(f"已在分支 '{branch_name}'.");
              if self.status_bar and not self._is_busy: self.status_bar.showMessage(f"已在分支 '{branch_name}'", 2000);
              return
@@ -2369,21 +3040,40 @@ class MainWindow(QMainWindow):
     # 显示分支列表的右键菜单
     @pyqtSlot(QPoint)
     def _show_branch_context_menu(self, pos: QPoint):
-        if not self.branch_list_widget: return
+        if self.branch_tree_view is None or self.branch_tree_model is None: return
 
-        item = self.branch_list_widget.itemAt(pos);
-        if not item: return
+        branch = self.branch_tree_model.branch_at(self.branch_tree_view.indexAt(pos))
+        if branch is None: return
+
+        selected_branches = self._selected_branches()
+        if len(selected_branches) > 1 and any(selected is branch for selected in selected_branches):
+            self._show_multi_branch_context_menu(selected_branches, pos)
+            return
 
         is_repo_valid = self.git_handler.is_valid_repo() and not self._is_busy
 
         menu = QMenu();
-        branch_name = item.text().strip();
-        is_remote = branch_name.startswith("remotes/");
-        is_current = item.font().bold();
-        is_detached = branch_name.startswith("(Detached HEAD");
+        branch_name = branch.name
+        is_remote = branch.is_remote
+        is_current = branch.is_current
+        is_detached = branch.is_detached
         added_action = False
 
-        if not is_detached:
+        if branch.is_tag:
+            compare_action = QAction(f"比较当前分支与标签 '{branch_name}'...", self)
+            compare_action.triggered.connect(lambda checked=False, b=branch_name: self._open_compare("HEAD", b))
+            compare_action.setEnabled(is_repo_valid)
+            menu.addAction(compare_action)
+            delete_remote_tag_action = QAction(f"从远程删除标签 '{branch_name}'...", self)
+            delete_remote_tag_action.triggered.connect(lambda checked=False, t=branch_name: self._delete_remote_refs_dialog([], [t]))
+            delete_remote_tag_action.setEnabled(is_repo_valid)
+            menu.addAction(delete_remote_tag_action)
+            menu.addSeparator()
+            copy_action = QAction(f"复制名称 '{branch_name}'", self)
+            copy_action.triggered.connect(lambda checked=False, b=branch_name: QApplication.clipboard().setText(b))
+            menu.addAction(copy_action)
+            added_action = True
+        elif not is_detached:
             if not is_current and not is_remote:
                 checkout_action = QAction(f"切换到 '{branch_name}'", self)
                 checkout_action.triggered.connect(lambda checked=False, b=branch_name: self._run_command_list_sequentially([f"git checkout {shlex.quote(b)}"]))
@@ -2391,6 +3081,11 @@ class MainWindow(QMainWindow):
                 menu.addAction(checkout_action)
                 added_action = True
 
+                preview_merge_action = QAction(f"预览合并 '{branch_name}'...", self)
+                preview_merge_action.triggered.connect(lambda checked=False, b=branch_name: self._open_merge_preview(b))
+                preview_merge_action.setEnabled(is_repo_valid)
+                menu.addAction(preview_merge_action)
+
                 merge_action = QAction(f"合并 '{branch_name}' 到当前分支...", self)
                 merge_action.triggered.connect(lambda checked=False, b=branch_name: self._merge_branch_dialog(b))
                 merge_action.setEnabled(is_repo_valid)
@@ -2415,6 +3110,12 @@ class MainWindow(QMainWindow):
                 menu.addAction(delete_action)
                 added_action = True
 
+                compare_action = QAction(f"比较当前分支与 '{branch_name}'...", self)
+                compare_action.triggered.connect(lambda checked=False, b=branch_name: self._open_compare("HEAD", b))
+                compare_action.setEnabled(is_repo_valid)
+                menu.addAction(compare_action)
+                added_action = True
+
                 force_delete_action = QAction(f"强制删除本地分支 '{branch_name}'...", self)
                 force_delete_action.triggered.connect(lambda checked=False, b=branch_name: self._delete_branch_dialog(b, force=True))
                 force_delete_action.setEnabled(is_repo_valid)
@@ -2439,6 +3140,11 @@ class MainWindow(QMainWindow):
                      menu.addAction(create_local_action)
                      added_action = True
 
+                     preview_merge_remote_action = QAction(f"预览合并 '{branch_name}'...", self)
+                     preview_merge_remote_action.triggered.connect(lambda checked=False, b=branch_name: self._open_merge_preview(b))
+                     preview_merge_remote_action.setEnabled(is_repo_valid)
+                     menu.addAction(preview_merge_remote_action)
+
                      merge_remote_action = QAction(f"合并 '{branch_name}' 到当前分支...", self)
                      merge_remote_action.triggered.connect(lambda checked=False, b=branch_name: self._merge_branch_dialog(b))
                      merge_remote_action.setEnabled(is_repo_valid)
@@ -2471,10 +3177,158 @@ class MainWindow(QMainWindow):
                  menu.addAction(copy_action)
 
 
-        if added_action: menu.exec(self.branch_list_widget.mapToGlobal(pos))
+        if added_action: menu.exec(self.branch_tree_view.viewport().mapToGlobal(pos))
         else: logging.debug(f"No applicable context actions for branch item: {branch_name}")
 
 
+    # 分支面板中选中的分支和标签 (不含分组行)
+    def _selected_branches(self) -> list[BranchInfo]:
+        if self.branch_tree_view is None or self.branch_tree_model is None:
+            return []
+        branches = [self.branch_tree_model.branch_at(index) for index in self.branch_tree_view.selectionModel().selectedRows()]
+        return [branch for branch in branches if branch is not None]
+
+
+    # 选中多个分支/标签时的右键菜单
+    def _show_multi_branch_context_menu(self, branches: list[BranchInfo], pos: QPoint):
+        is_repo_valid = self.git_handler.is_valid_repo() and not self._is_busy
+        local_branches = [branch for branch in branches if not branch.is_remote and not branch.is_tag and not branch.is_detached]
+        remote_branches = [branch for branch in branches if branch.is_remote]
+        tags = [branch.name for branch in branches if branch.is_tag]
+        menu = QMenu()
+
+        if local_branches:
+            push_action = QAction(f"推送所选的 {len(local_branches)} 个本地分支...", self)
+            push_action.triggered.connect(lambda checked=False, b=local_branches: self._push_branches_dialog(b))
+            push_action.setEnabled(is_repo_valid)
+            menu.addAction(push_action)
+
+        if remote_branches or tags:
+            parts = []
+            if remote_branches: parts.append(f"{len(remote_branches)} 个远程分支")
+            if tags: parts.append(f"{len(tags)} 个标签")
+            delete_action = QAction(f"从远程删除所选的{'和'.join(parts)}...", self)
+            delete_action.triggered.connect(lambda checked=False, b=remote_branches, t=tags: self._delete_remote_refs_dialog(b, t))
+            delete_action.setEnabled(is_repo_valid)
+            menu.addAction(delete_action)
+            menu.addSeparator()
+
+        names = [branch.name for branch in branches]
+        copy_action = QAction(f"复制所选的 {len(names)} 个名称", self)
+        copy_action.triggered.connect(lambda checked=False, n=names: QApplication.clipboard().setText('\n'.join(n)))
+        menu.addAction(copy_action)
+        menu.exec(self.branch_tree_view.viewport().mapToGlobal(pos))
+
+
+    # 选择远程和选项后用一次原子推送推送多个本地分支；强制推送的期望值取自分支快照中的远程跟踪分支
+    def _push_branches_dialog(self, branches: list[BranchInfo]):
+        if not self._check_repo_and_warn() or not branches: return
+        names = [branch.name for branch in branches]
+        upstream_remotes = {branch.upstream.split('/')[2] for branch in branches if branch.upstream.startswith("refs/remotes/")}
+        default_remote = next(iter(upstream_remotes)) if len(upstream_remotes) == 1 else "origin"
+        dialog = PushBranchesDialog(self, names, self._remote_names(), default_remote)
+        if not dialog.exec(): return
+        data = dialog.get_data()
+        remote_name = data["remote"]
+        if not remote_name: return
+
+        options = ["-u"] if data["set_upstream"] else []
+        if data["force_with_lease"]:
+            remote_oids = {branch.refname: branch.oid for branch in self._branch_snapshot if branch.is_remote}
+            expected = {name: remote_oids.get(f"refs/remotes/{remote_name}/{name}", "") for name in names}
+            options.extend(force_with_lease_options(expected))
+        logging.info(f"请求推送 {len(names)} 个分支到 '{remote_name}' (强制: {data['force_with_lease']})")
+        self._run_atomic_pushes([(remote_name, branch_refspecs(names), options)])
+
+
+    # 仓库配置的远程名称，没有时建议使用 'origin'
+    def _remote_names(self) -> list[str]:
+        remotes_result = self.git_handler.execute_command_sync(["git", "remote"])
+        remotes = remotes_result.stdout.strip().splitlines() if remotes_result and remotes_result.returncode == 0 else []
+        if not remotes:
+            remotes = ["origin"]
+            logging.warning("未找到远程仓库，建议使用 'origin'。")
+        return remotes
+
+
+    # 确认后用原子推送删除远程分支和标签: 每个远程只推送一次；标签需要选择从哪个远程删除
+    def _delete_remote_refs_dialog(self, remote_branches: list[BranchInfo], tags: list[str]):
+        if not self._check_repo_and_warn(): return
+        targets: dict[str, tuple[list[str], list[str]]] = {}
+        for branch in remote_branches:
+            targets.setdefault(branch.remote_name, ([], []))[0].append(branch.short_name)
+        if tags:
+            remotes = self._remote_names()
+            default_remote = next(iter(targets)) if len(targets) == 1 else "origin"
+            current = remotes.index(default_remote) if default_remote in remotes else 0
+            remote_name, ok = QInputDialog.getItem(self, "选择远程仓库", f"从哪个远程仓库删除 {len(tags)} 个标签?", remotes, current, False)
+            if not ok or not remote_name: return
+            targets.setdefault(remote_name, ([], []))[1].extend(tags)
+        if not targets: return
+
+        lines = []
+        for remote_name, (branch_names, tag_names) in targets.items():
+            lines.extend(f"  {remote_name}: 分支 {name}" for name in branch_names)
+            lines.extend(f"  {remote_name}: 标签 {name}" for name in tag_names)
+        total = len(lines)
+        preview = '\n'.join(lines[:20]) + (f"\n  ... (共 {total} 个)" if total > 20 else "")
+        message = (f"确定要从远程仓库删除以下 {total} 个引用吗？\n\n{preview}\n\n"
+                   f"每个远程只执行一次 'git push --atomic'，任何一个引用被拒绝时该远程上的引用都不会删除。\n\n"
+                   f"此操作通常不可撤销，并会影响其他协作者！")
+        reply = QMessageBox.warning(self, "确认删除远程引用", message, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.Cancel, QMessageBox.StandardButton.Cancel)
+        if reply != QMessageBox.StandardButton.Yes: return
+        logging.info(f"请求从 {len(targets)} 个远程删除 {total} 个引用")
+        self._run_atomic_pushes([(remote_name, delete_refspecs(branch_names, tag_names), [])
+                                 for remote_name, (branch_names, tag_names) in targets.items()])
+
+
+    # 依次执行原子推送 (remote, 引用规格, 附加选项)，按 --porcelain 输出逐个引用报告结果，全部完成后刷新视图
+    def _run_atomic_pushes(self, pushes: list[tuple[str, list[str], list[str]]]):
+        if not pushes: return
+        if self._is_busy or self._has_pending_file_operations():
+             logging.warning("UI 正在忙碌，跳过推送请求。")
+             self._show_information("操作繁忙", "当前正在执行其他操作，请稍后再试。")
+             return
+
+        if self.main_tab_widget and self._output_tab_index != -1:
+             self.main_tab_widget.setCurrentIndex(self._output_tab_index)
+        self._append_output("\n--- 开始推送 ---", QColor("darkCyan"))
+        self._set_ui_busy(True)
+
+        def push_next(index):
+            if index >= len(pushes):
+                self._append_output("\n✅ --- 推送完毕 ---", QColor("darkCyan"))
+                self._set_ui_busy(False)
+                self._refresh_all_views()
+                return
+            remote_name, refspecs, options = pushes[index]
+            command = build_push_command(remote_name, refspecs[:10], options)
+            display_cmd = ' '.join(shlex.quote(part) for part in command)
+            if len(refspecs) > 10: display_cmd += f" ... (共 {len(refspecs)} 个引用)"
+            self._append_output(f"\n$ {display_cmd}", QColor("darkGreen"))
+            if self.status_bar: self.status_bar.showMessage(f"正在推送到 '{remote_name}' ({len(refspecs)} 个引用)...", 0)
+            self.git_handler.push_refspecs_async(
+                remote_name, refspecs,
+                lambda rc, so, se, i=index: QTimer.singleShot(0, lambda: push_finished(i, rc, so, se)),
+                options=options
+            )
+
+        def push_finished(index, return_code, stdout, stderr):
+            remote_name = pushes[index][0]
+            results = parse_push_porcelain(stdout)
+            for result in results:
+                self._append_output(f"{'✅' if result.ok else '❌'} {result.describe()}", None if result.ok else QColor("red"))
+            if return_code == 0:
+                self._append_output(f"✅ 推送到 '{remote_name}' 成功: {len(results)} 个引用", QColor("darkCyan"))
+            else:
+                if stderr.strip(): self._append_output(f"stderr:\n{stderr.strip()}")
+                logging.error(f"原子推送到 '{remote_name}' 失败 (RC={return_code}): {stderr.strip()}")
+                self._append_output(f"❌ 推送到 '{remote_name}' 失败 (RC: {return_code})，该远程上的引用均未更新。", QColor("red"))
+            push_next(index + 1)
+
+        push_next(0)
+
+
     # 显示确认对话框并执行 git merge
     def _merge_branch_dialog(self, branch_to_merge: str):
         if not self._check_repo_and_warn(): return
@@ -2485,6 +3339,14 @@ class MainWindow(QMainWindow):
             logging.info(f"请求合并分支: {branch_to_merge}")
             self._run_command_list_sequentially([f"git merge {shlex.quote(branch_to_merge)}"])
 
+    # 打开合并预览窗口 (非模态): 在内存中合并，不改动索引和工作区；确认后再走正常的合并流程
+    def _open_merge_preview(self, branch_name: str):
+        if not self._check_repo_and_warn(): return
+        logging.info(f"预览合并: {branch_name}")
+        dialog = MergePreviewDialog(self.git_handler, self.merge_preview_cache, branch_name, self)
+        dialog.mergeRequested.connect(self._merge_branch_dialog)
+        dialog.show()
+
     # 显示确认对话框并执行 git rebase
     def _rebase_onto_dialog(self, base_branch: str):
         if not self._check_repo_and_warn(): return
@@ -2524,12 +3386,7 @@ class MainWindow(QMainWindow):
              self._show_warning("操作无效", "不能直接推送远程跟踪分支或处于 Detached HEAD 状态。请切换到本地分支。")
              return
 
-        remotes_result = self.git_handler.execute_command_sync(["git", "remote"])
-        remotes = remotes_result.stdout.strip().splitlines() if remotes_result and remotes_result.returncode == 0 else []
-        if not remotes:
-            remotes = ["origin"]
-            logging.warning("未找到远程仓库，建议使用 'origin'。")
-
+        remotes = self._remote_names()
         remote_name, ok_remote = QInputDialog.getItem(self, "选择远程仓库", "推送到哪个远程仓库?", remotes, 0, False)
         if not ok_remote or not remote_name: return
 
@@ -2574,17 +3431,17 @@ class MainWindow(QMainWindow):
              self._run_command_list_sequentially([f"git branch {delete_flag} {shlex.quote(branch_name)}"])
 
 
-    # 显示确认对话框并执行 git push <remote> --delete <branch>
+    # 显示确认对话框并用原子推送删除单个远程分支
     def _delete_remote_branch_dialog(self, remote_name: str, branch_name: str):
         if not self._check_repo_and_warn() or not remote_name or not branch_name:
              logging.error(f"无效的远程/分支名称用于删除: {remote_name}/{branch_name}");
              self._show_warning("操作无效", "无法确定远程仓库或分支名称。")
              return
-        confirmation_message = f"确定要从远程仓库 '{remote_name}' 删除分支 '{branch_name}' 吗？\n\n将执行: git push {remote_name} --delete {branch_name}\n\n此操作通常不可撤销，并会影响其他协作者！"
+        confirmation_message = f"确定要从远程仓库 '{remote_name}' 删除分支 '{branch_name}' 吗？\n\n将执行: git push --atomic --porcelain {remote_name} :refs/heads/{branch_name}\n\n此操作通常不可撤销，并会影响其他协作者！"
         reply = QMessageBox.warning(self, "确认删除远程分支", confirmation_message, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.Cancel, QMessageBox.StandardButton.Cancel)
         if reply == QMessageBox.StandardButton.Yes:
             logging.info(f"请求删除远程分支: {remote_name}/{branch_name}")
-            self._run_command_list_sequentially([f"git push {shlex.quote(remote_name)} --delete {shlex.quote(branch_name)}"])
+            self._run_atomic_pushes([(remote_name, delete_refspecs([branch_name]), [])])
 
     # 显示对话框获取新名称并执行 git branch <newname> <startpoint>
     def _create_branch_from_dialog(self, suggest_name: str, start_point: str):
@@ -2619,7 +3476,7 @@ class MainWindow(QMainWindow):
     # 处理日志表格选择变化，触发提交详情显示更新
     @pyqtSlot()
     def _log_selection_changed(self):
-        if not self.log_table_widget or not self.commit_details_textedit or not self.git_handler:
+        if not self.log_table_view or not self.log_table_model or not self.commit_details_textedit or not self.git_handler:
              if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("")
              return
 
@@ -2627,10 +3484,9 @@ class MainWindow(QMainWindow):
              if self.commit_details_textedit: self.commit_details_textedit.clear(); self.commit_details_textedit.setPlaceholderText("仓库无效");
              return
 
-        selected_items = self.log_table_widget.selectedItems();
         self.commit_details_textedit.clear()
 
-        selected_rows_indices = self.log_table_widget.selectionModel().selectedRows()
+        selected_rows_indices = self.log_table_view.selectionModel().selectedRows()
 
         if not selected_rows_indices:
              self.commit_details_textedit.setPlaceholderText("选中上方提交记录以查看详情...");
@@ -2642,38 +3498,220 @@ class MainWindow(QMainWindow):
         if selected_row < 0:
              self.commit_details_textedit.setPlaceholderText("请选择一个提交记录。"); return
 
-        hash_item = self.log_table_widget.item(selected_row, LOG_COL_COMMIT);
-        if hash_item:
-            commit_hash = hash_item.data(Qt.ItemDataRole.UserRole)
-            if not commit_hash: commit_hash = hash_item.text().strip().split()[0] if hash_item.text() else None
+        commit_hash = self.log_table_model.commit_oid(selected_row)
+        if commit_hash:
+            self._show_commit_details(commit_hash)
+            self._commit_prefetch_timer.start()
+        else:
+            self.commit_details_textedit.setPlaceholderText("无法获取选中提交的 Hash.");
+            logging.error(f"无法从日志模型获取有效 Hash (Row: {selected_row}).")
 
 
-            if commit_hash:
-                logging.debug(f"Log selection changed, requesting details for commit: {commit_hash}")
-                self.commit_details_textedit.setPlaceholderText(f"正在加载 Commit '{commit_hash[:7]}...' 的详情...");
-                QApplication.processEvents()
+    # 提交详情缓存键: git show 受查询范围影响，范围不同结果不同
+    def _commit_details_key(self, commit_hash: str) -> tuple:
+        return (commit_hash, tuple(self.git_handler.get_scope()))
 
-                self.git_handler.execute_command_async(
-                    ["git", "show", "--no-ext-diff", shlex.quote(commit_hash)],
-                    lambda rc, so, se, ch=commit_hash: self._on_commit_details_received(rc, so, se, ch)
-                )
-            else:
-                self.commit_details_textedit.setPlaceholderText("无法获取选中提交的 Hash.");
-                logging.error(f"无法从日志表格项获取有效 Hash (Row: {selected_row}).")
-        else:
-            self.commit_details_textedit.setPlaceholderText("无法确定选中的提交项.");
-            logging.error(f"无法在日志表格中找到行 {selected_row} 的第 {LOG_COL_COMMIT} 列项。")
+
+    # 显示提交详情：缓存命中时立即显示，否则获取提交头部和文件列表 (补丁在文件展开时获取)
+    def _show_commit_details(self, commit_hash: str):
+        if not self.commit_details_textedit: return
+        self._details_commit_hash = commit_hash
+        key = self._commit_details_key(commit_hash)
+        cached = self.commit_details_cache.get(key)
+        if cached is not None:
+            logging.debug(f"提交详情缓存命中: {commit_hash[:7]}")
+            self.commit_details_textedit.setPlaceholderText("")
+            self._display_commit_summary(commit_hash, cached)
+            return
+        logging.debug(f"Log selection changed, requesting details for commit: {commit_hash}")
+        self.commit_details_textedit.clear()
+        self.commit_details_textedit.setPlaceholderText(f"正在加载 Commit '{commit_hash[:7]}...' 的详情...");
+        # 先只取头部和文件列表 (不比较文件内容，几千个文件的合并提交也很快)，行数统计随后补上
+        self.git_handler.get_commit_summary_async(
+            commit_hash,
+            lambda rc, so, se, ch=commit_hash, k=key: self._on_commit_details_received(rc, so, se, ch, k),
+            with_stats=False
+        )
+
+
+    # 在提交详情中显示头部和折叠的文件列表
+    def _display_commit_summary(self, commit_hash: str, summary: str, stats_pending: bool = False):
+        header, files = split_commit_summary(summary)
+        self.commit_details_textedit.set_diff_files(
+            header, files, lambda diff_files, done, ch=commit_hash: self._load_commit_patches(ch, diff_files, done),
+            stats_pending=stats_pending)
+
+
+    # 提交详情的补丁加载: 先查差异缓存，未命中的文件一次 git show 获取
+    def _load_commit_patches(self, commit_hash: str, files: list[DiffFile], done):
+        load_patches(
+            self.diff_cache, files, done,
+            lambda missing, slot: self.git_handler.get_commit_patch_async(commit_hash, [path for f in missing for path in f.pathspecs], slot))
+
+
+    # 空闲时预取选中行附近和可见区域内的提交详情 (逐个低优先级运行)
+    @pyqtSlot()
+    def _start_commit_prefetch(self):
+        if not self.log_table_view or not self.log_table_model or self._is_busy or not self.git_handler.is_valid_repo():
+            return
+        model = self.log_table_model
+        rows: list[int] = []
+        selected = self.log_table_view.selectionModel().selectedRows()
+        if selected:
+            current = selected[0].row()
+            for distance in range(1, COMMIT_PREFETCH_NEIGHBOURS + 1):
+                rows.extend([current + distance, current - distance])
+        viewport_height = self.log_table_view.viewport().height()
+        top = self.log_table_view.rowAt(0)
+        bottom = self.log_table_view.rowAt(viewport_height - 1)
+        if top >= 0:
+            rows.extend(range(top, (bottom if bottom >= 0 else model.rowCount() - 1) + 1))
+
+        queue: list[str] = []
+        for row in rows:
+            commit_hash = model.commit_oid(row)
+            if (commit_hash and commit_hash != self._details_commit_hash and commit_hash not in queue
+                    and self._commit_details_key(commit_hash) not in self.commit_details_cache):
+                queue.append(commit_hash)
+            if len(queue) >= COMMIT_PREFETCH_MAX:
+                break
+        # 新的队列替换旧队列，正在运行的预取完成后从新队列继续
+        self._commit_prefetch_queue = queue
+        if queue and not self._commit_prefetch_running:
+            logging.debug(f"预取 {len(queue)} 个提交的详情。")
+            self._prefetch_next_commit()
+
+
+    def _prefetch_next_commit(self):
+        self._commit_prefetch_running = False
+        while self._commit_prefetch_queue and not self._is_busy:
+            commit_hash = self._commit_prefetch_queue.pop(0)
+            key = self._commit_details_key(commit_hash)
+            summary = self.commit_details_cache.get(key)
+            if summary is not None:
+                if self._prefetch_commit_patches(commit_hash, summary):
+                    return
+                continue
+            self._commit_prefetch_running = True
+            repo_path = self.git_handler.get_repo_path()
+            self.git_handler.get_commit_summary_async(
+                commit_hash,
+                lambda rc, so, se, ch=commit_hash, k=key, rp=repo_path: self._on_commit_prefetched(rc, so, ch, k, rp),
+                low_priority=True
+            )
+            return
+
+
+    # 预取提交中默认展开的文件的补丁；已缓存或没有需要展开的文件时返回 False
+    def _prefetch_commit_patches(self, commit_hash: str, summary: str) -> bool:
+        files = auto_expand_files(split_commit_summary(summary)[1])
+        if not files or self.diff_cache.contains_all(diff_cache_key(diff_file) for diff_file in files):
+            return False
+        self._commit_prefetch_running = True
+        self.git_handler.get_commit_patch_async(
+            commit_hash, [path for diff_file in files for path in diff_file.pathspecs],
+            lambda rc, so, se, fs=files: self._on_commit_patches_prefetched(rc, so, fs),
+            low_priority=True
+        )
+        return True
+
+
+    def _on_commit_prefetched(self, return_code: int, stdout: str, commit_hash: str, key: tuple, repo_path: Optional[str]):
+        if return_code == 0 and stdout.strip() and repo_path == self.git_handler.get_repo_path():
+            self.commit_details_cache.put(key, stdout)
+            if self._prefetch_commit_patches(commit_hash, stdout):
+                return
+        self._prefetch_next_commit()
+
+
+    def _on_commit_patches_prefetched(self, return_code: int, stdout: str, files: list[DiffFile]):
+        # 差异缓存以 blob id 为键，与仓库无关，切换仓库后到达的结果也可以写入
+        if return_code == 0:
+            patches = split_patch_by_file(stdout, files)
+            self.diff_cache.put_many([(diff_cache_key(diff_file), patches[diff_file.path])
+                                      for diff_file in files if diff_file.path in patches])
+        self._prefetch_next_commit()
+
+
+    # 提交详情的右键菜单：在标准菜单之外提供光标所在文件的历史
+    @pyqtSlot(QPoint)
+    def _show_commit_details_context_menu(self, pos: QPoint):
+        if not self.commit_details_textedit: return
+        menu = self.commit_details_textedit.createStandardContextMenu()
+        file_path = self._diff_file_path_at(self.commit_details_textedit, pos)
+        if file_path:
+            menu.addSeparator()
+            history_action = QAction(f"文件历史 '{os.path.basename(file_path)}'...", self)
+            history_action.setToolTip(file_path)
+            history_action.triggered.connect(lambda checked=False, path=file_path: self._open_file_history(path))
+            history_action.setEnabled(self.git_handler.is_valid_repo())
+            menu.addAction(history_action)
+            if self._details_commit_hash:
+                blame_action = QAction(f"追溯 (Blame) '{os.path.basename(file_path)}' @ {self._details_commit_hash[:7]}...", self)
+                blame_action.triggered.connect(lambda checked=False, rev=self._details_commit_hash, path=file_path: self._open_blame(rev, path))
+                blame_action.setEnabled(self.git_handler.is_valid_repo())
+                menu.addAction(blame_action)
+        menu.exec(self.commit_details_textedit.viewport().mapToGlobal(pos))
+
+
+    # 找到位置所在的差异段，返回其文件路径 (按文件显示时取所在文件，否则取 "diff --git a/... b/..." 中的新路径)
+    def _diff_file_path_at(self, text_edit: LazyDiffView, pos: QPoint) -> Optional[str]:
+        block = text_edit.cursorForPosition(pos).block()
+        diff_file = text_edit.file_at_block(block.blockNumber())
+        if diff_file is not None:
+            return diff_file.path
+        while block.isValid():
+            text = block.text()
+            if text.startswith("diff --git "):
+                _, sep, path = text.rpartition(" b/")
+                return path.strip() if sep and path.strip() else None
+            block = block.previous()
+        return None
+
+
+    # 打开文件历史窗口 (非模态，可同时打开多个)
+    def _open_file_history(self, file_path: str):
+        if not self._check_repo_and_warn() or not file_path: return
+        logging.info(f"打开文件历史: {file_path}")
+        dialog = FileHistoryDialog(self.git_handler, file_path, self.syntax_cache, self)
+        dialog.show()
+
+
+    # 打开追溯 (blame) 窗口，多个窗口共享 blame 结果缓存
+    def _open_blame(self, revision: str, file_path: str):
+        if not self._check_repo_and_warn() or not file_path: return
+        logging.info(f"打开追溯: {file_path} @ {revision}")
+        dialog = BlameDialog(self.git_handler, self.blame_cache, revision, file_path, self)
+        dialog.show()
+
+
+    # 打开比较窗口 (非模态)，引用列表取自分支列表
+    def _open_compare(self, base_ref: str = "", tip_ref: str = ""):
+        if not self._check_repo_and_warn(): return
+        refs = ["HEAD"]
+        refs.extend(name[len("remotes/"):] if name.startswith("remotes/") else name for name in self._branch_names())
+        logging.info(f"打开比较窗口: {base_ref or '?'}...{tip_ref or '?'}")
+        dialog = CompareDialog(self.git_handler, self.diff_cache, self.compare_files_cache, self.word_diff_engine,
+                               self.syntax_cache, refs, base_ref, tip_ref, self)
+        dialog.show()
 
 
     # 处理 Git show 命令结果并显示提交详情
-    @pyqtSlot(int, str, str, str)
-    def _on_commit_details_received(self, return_code: int, stdout: str, stderr: str, commit_hash: str):
+    def _on_commit_details_received(self, return_code: int, stdout: str, stderr: str, commit_hash: str, key: tuple):
         if not self.commit_details_textedit: return
+        if commit_hash != self._details_commit_hash:
+            # 已选择其他提交，不再获取行数统计
+            return
         self.commit_details_textedit.setPlaceholderText("");
 
         if return_code == 0:
             if stdout.strip():
-                self._display_formatted_diff(self.commit_details_textedit, stdout)
+                self._display_commit_summary(commit_hash, stdout, stats_pending=True)
+                repo_path = self.git_handler.get_repo_path()
+                self.git_handler.get_commit_numstat_async(
+                    commit_hash,
+                    lambda rc, so, se, ch=commit_hash, k=key, summary=stdout, rp=repo_path: self._on_commit_numstat_received(rc, so, se, ch, k, summary, rp)
+                )
             else:
                  self.commit_details_textedit.setPlainText(f"未获取到提交 '{commit_hash[:7]}' 的详情。")
         else:
@@ -2681,6 +3719,20 @@ class MainWindow(QMainWindow):
             self.commit_details_textedit.setPlainText(error_message)
             logging.error(f"获取 Commit 详情失败 (RC={return_code}) for {commit_hash}: {stderr.strip()}")
 
+    # 补上提交详情的行数统计；与先前的摘要拼接后即为完整摘要 (与一次取 raw + numstat 的输出相同)，放入缓存
+    def _on_commit_numstat_received(self, return_code: int, stdout: str, stderr: str, commit_hash: str, key: tuple, summary: str,
+                                    repo_path: Optional[str]):
+        if repo_path != self.git_handler.get_repo_path():
+            return
+        if return_code != 0:
+            logging.error(f"获取提交 {commit_hash[:7]} 的行数统计失败: {stderr.strip()}")
+            if self.commit_details_textedit and commit_hash == self._details_commit_hash:
+                self.commit_details_textedit.set_file_stats_failed(f"⚠️ 获取行数统计失败，请手动展开文件: {stderr.strip()}")
+            return
+        self.commit_details_cache.put(key, summary + stdout)
+        if self.commit_details_textedit and commit_hash == self._details_commit_hash:
+            self.commit_details_textedit.set_file_stats(parse_numstat_z(stdout))
+
     # 执行 git fetch --all
     def _fetch_all(self):
         if not self._check_repo_and_warn(): return
@@ -2734,18 +3786,20 @@ class MainWindow(QMainWindow):
     def _open_issue_tracker(self):
         QDesktopServices.openUrl(QUrl("https://github.com/424635328/Git-Helper/issues"))
 
+    # 打开本地分支清理窗口 (非模态)，默认以当前分支为基准
+    def _open_branch_cleanup(self):
+        if not self._check_repo_and_warn(): return
+        current = next((branch.name for branch in self._branch_snapshot if branch.is_current and not branch.is_detached), "")
+        logging.info(f"打开本地分支清理: 基准 {current or 'HEAD'}")
+        dialog = BranchCleanupDialog(self.git_handler, self._branch_names(remote=False), current, self)
+        dialog.branchesDeleted.connect(self._refresh_branch_list)
+        dialog.show()
+
     # 显示对话框选择本地分支并执行 git checkout
     def _run_switch_branch(self):
         if not self._check_repo_and_warn(): return
-        branches = []
-        if self.branch_list_widget:
-            for i in range(self.branch_list_widget.count()):
-                item = self.branch_list_widget.item(i)
-                branch_name = item.text().strip()
-                if not branch_name.startswith(("remotes/", "(")) and not item.font().bold():
-                     branch_name = branch_name.lstrip('* ').strip()
-                     if branch_name:
-                         branches.append(branch_name)
+        branches = [branch.name for branch in self._branch_snapshot
+                    if not branch.is_remote and not branch.is_detached and not branch.is_current]
 
         branch_name, ok = QInputDialog.getItem(self,"切换分支","选择或输入要切换到的本地分支名称:", sorted(branches), 0, True)
         if ok and branch_name:
@@ -2874,6 +3928,9 @@ class MainWindow(QMainWindow):
     # 处理窗口关闭事件
     def closeEvent(self, event):
         logging.info("应用程序关闭请求。")
+        if self.log_table_model:
+            # 分页读取中的日志进程和后台缓存更新随时可以丢弃，不算作仍在运行的操作
+            self.log_table_model.shutdown()
         try:
             if self.git_handler and hasattr(self.git_handler, 'get_active_process_count'):
                  active_count = self.git_handler.get_active_process_count()
@@ -2897,6 +3954,8 @@ class MainWindow(QMainWindow):
             logging.exception("关闭窗口时检查或终止 Git 操作出错。")
 
         logging.info("应用程序正在关闭。")
+        self.word_diff_engine.shutdown()
+        self.diff_cache.close()
         if self.loading_movie and self.loading_movie.isValid():
             self.loading_movie.stop()
         self._save_current_repo()
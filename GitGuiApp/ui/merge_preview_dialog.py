@@ -0,0 +1,173 @@
+# ui/merge_preview_dialog.py
+# -*- coding: utf-8 -*-
+import logging
+from typing import Optional
+from PyQt6.QtWidgets import (
+    QDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QListWidget, QListWidgetItem, QSplitter
+)
+from PyQt6.QtGui import QColor
+from PyQt6.QtCore import Qt, pyqtSlot, pyqtSignal
+
+from core.diff_parser import parse_raw_numstat_z, format_diffstat
+from core.lru_cache import LRUCache
+from core.merge_preview import MergePreview, parse_merge_tree_z
+
+_STATUS_COLORS = {'A': QColor("darkGreen"), 'D': QColor("red"), 'R': QColor("darkBlue"), 'C': QColor("darkBlue")}
+
+
+class MergePreviewDialog(QDialog):
+    """
+    合并预览: 用 'git merge-tree --write-tree' 在内存中把对方分支合并到当前分支，列出冲突文件和合并带来的文件变化，
+    不改动索引和工作区。结果按 (我方提交, 对方提交) 放入共享的 LRU 缓存。
+    """
+    mergeRequested = pyqtSignal(str)
+
+    def __init__(self, git_handler, preview_cache: LRUCache, theirs_ref: str, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setWindowTitle(f"预览合并 {theirs_ref}")
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(800, 600)
+
+        self._git_handler = git_handler
+        self._preview_cache = preview_cache
+        self._theirs_ref = theirs_ref
+        self._generation = 0
+
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel("")
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        layout.addWidget(self.summary_label)
+
+        conflict_widget = QWidget()
+        conflict_layout = QVBoxLayout(conflict_widget)
+        conflict_layout.setContentsMargins(0, 0, 0, 0)
+        self.conflict_label = QLabel("冲突文件:")
+        conflict_layout.addWidget(self.conflict_label)
+        self.conflict_list = QListWidget()
+        conflict_layout.addWidget(self.conflict_list, 1)
+
+        files_widget = QWidget()
+        files_layout = QVBoxLayout(files_widget)
+        files_layout.setContentsMargins(0, 0, 0, 0)
+        self.files_label = QLabel("合并带来的变化:")
+        files_layout.addWidget(self.files_label)
+        self.file_list = QListWidget()
+        files_layout.addWidget(self.file_list, 1)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(conflict_widget)
+        splitter.addWidget(files_widget)
+        splitter.setSizes([200, 400])
+        layout.addWidget(splitter, 1)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.merge_button = QPushButton("合并...")
+        self.merge_button.setEnabled(False)
+        self.merge_button.clicked.connect(self._request_merge)
+        button_layout.addWidget(self.merge_button)
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+        self._start_preview()
+
+    @pyqtSlot()
+    def _start_preview(self):
+        self._generation += 1
+        generation = self._generation
+        self.summary_label.setText(f"正在解析 HEAD 和 {self._theirs_ref}...")
+        self._git_handler.resolve_commits_async(
+            ["HEAD", self._theirs_ref],
+            lambda rc, so, se, g=generation: self._on_refs_resolved(g, rc, so, se)
+        )
+
+    def _on_refs_resolved(self, generation: int, return_code: int, stdout: str, stderr: str):
+        if generation != self._generation:
+            return
+        oids = stdout.split()
+        if return_code != 0 or len(oids) != 2:
+            error = stderr.strip().split('\n')[0]
+            self.summary_label.setText(f"❌ 无法解析 HEAD 或 '{self._theirs_ref}': {error}")
+            return
+        ours, theirs = oids
+        key = (ours, theirs)
+        cached = self._preview_cache.get(key)
+        if cached is not None:
+            logging.debug(f"合并预览缓存命中: {ours[:7]} + {theirs[:7]}")
+            self._show_preview(cached, ours, theirs)
+            return
+        self.summary_label.setText(f"正在内存中合并 {ours[:7]} 和 {theirs[:7]}...")
+        self._git_handler.get_merge_tree_async(
+            ours, theirs, lambda rc, so, se, g=generation: self._on_merge_tree_received(g, rc, so, se, ours, theirs))
+
+    def _on_merge_tree_received(self, generation: int, return_code: int, stdout: str, stderr: str, ours: str, theirs: str):
+        if generation != self._generation:
+            return
+        preview = parse_merge_tree_z(stdout) if return_code in (0, 1) else None
+        if preview is None:
+            self.summary_label.setText(f"❌ 无法预览合并: {stderr.strip() or f'git merge-tree 返回 {return_code}'}")
+            return
+        self._git_handler.get_merge_preview_files_async(
+            ours, preview.tree,
+            lambda rc, so, se, g=generation: self._on_files_received(g, rc, so, se, preview, ours, theirs))
+
+    def _on_files_received(self, generation: int, return_code: int, stdout: str, stderr: str,
+                           preview: MergePreview, ours: str, theirs: str):
+        if generation != self._generation:
+            return
+        if return_code != 0:
+            self.summary_label.setText(f"❌ 获取合并结果的文件列表失败: {stderr.strip()}")
+            return
+        preview.files_output = stdout
+        self._preview_cache.put((ours, theirs), preview)
+        self._show_preview(preview, ours, theirs)
+
+    def _show_preview(self, preview: MergePreview, ours: str, theirs: str):
+        files = parse_raw_numstat_z(preview.files_output or "")
+        added = sum(diff_file.added or 0 for diff_file in files)
+        removed = sum(diff_file.removed or 0 for diff_file in files)
+        if not files and preview.clean:
+            result = "✅ 已是最新，合并不会带来任何变化。"
+        elif preview.clean:
+            result = "✅ 可以干净地合并，没有冲突。"
+        else:
+            result = f"⚠️ 合并将产生 {len(preview.conflicts)} 个冲突文件。"
+        self.summary_label.setText(
+            f"将 {self._theirs_ref} ({theirs[:7]}) 合并到 HEAD ({ours[:7]}): {result}\n"
+            f"{len(files)} 个文件变化，+{added} -{removed} (冲突文件按带冲突标记的内容统计)。索引和工作区未被改动。")
+
+        self.conflict_list.clear()
+        for path in preview.conflicts:
+            item = QListWidgetItem(path)
+            item.setForeground(QColor("red"))
+            item.setToolTip('\n'.join(preview.messages_for(path)))
+            self.conflict_list.addItem(item)
+        self.conflict_label.setText(f"冲突文件 ({len(preview.conflicts)}):")
+
+        conflicts = set(preview.conflicts)
+        self.file_list.setUpdatesEnabled(False)
+        self.file_list.clear()
+        for diff_file in files:
+            marker = "  [冲突]" if diff_file.path in conflicts else ""
+            item = QListWidgetItem(f"{diff_file.status}  {diff_file.display_path}  ({format_diffstat(diff_file.added, diff_file.removed)}){marker}")
+            color = QColor("red") if marker else _STATUS_COLORS.get(diff_file.status)
+            if color is not None:
+                item.setForeground(color)
+            self.file_list.addItem(item)
+        self.file_list.setUpdatesEnabled(True)
+        self.files_label.setText(f"合并带来的变化 ({len(files)} 个文件):")
+
+        self.merge_button.setText("仍然合并..." if conflicts else "合并...")
+        self.merge_button.setEnabled(bool(files) or not preview.clean)
+
+    @pyqtSlot()
+    def _request_merge(self):
+        self.mergeRequested.emit(self._theirs_ref)
+        self.close()
+
+    def closeEvent(self, event):
+        self._generation += 1
+        super().closeEvent(event)
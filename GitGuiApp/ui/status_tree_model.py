@@ -2,11 +2,13 @@
 import logging
 import os
 import re
-from typing import Optional, List, Dict, Set
+from typing import Optional, List, Dict, Iterable, Set, Tuple
 from PyQt6.QtGui import QStandardItemModel, QStandardItem, QIcon, QColor, QFont
 from PyQt6.QtCore import Qt, QObject, QModelIndex, QItemSelection
 from PyQt6.QtWidgets import QApplication, QStyle
 
+from core.diff_parser import format_diffstat
+
 STATUS_STAGED = "已暂存的更改"
 STATUS_UNSTAGED = "未暂存的更改"
 STATUS_UNTRACKED = "未跟踪的文件"
@@ -52,11 +54,19 @@ _STATUS_ICON_CHAR_MAP = {
 }
 
 
+def _staged_color(status_char: str) -> QColor:
+    return QColor("darkGreen") if status_char in 'AC' else QColor("blue") if status_char in 'M' else QColor("red") if status_char in 'D' else QColor("purple")
+
+
+def _unstaged_color(status_char: str) -> Optional[QColor]:
+    return QColor("blue") if status_char in 'M' else QColor("red") if status_char in 'D' else None
+
+
 class StatusTreeModel(QStandardItemModel):
     """管理 Git 状态树视图的模型和数据解析"""
     def __init__(self, parent: Optional['QObject'] = None):
         super().__init__(parent)
-        self.setHorizontalHeaderLabels(["状态", "文件路径"])
+        self.setHorizontalHeaderLabels(["状态", "文件路径", "+/-"])
 
         self.STATUS_ICONS: Dict[str, QIcon] = {}
         for key, enum in _STATUS_ICON_CHAR_MAP.items():
@@ -91,16 +101,17 @@ class StatusTreeModel(QStandardItemModel):
         self.unmerged_root.setEditable(False)
         self.unmerged_root.setFont(root_font)
 
-        self.invisibleRootItem().appendRow([self.staged_root, QStandardItem()])
-        self.invisibleRootItem().appendRow([self.unstage_root, QStandardItem()])
-        self.invisibleRootItem().appendRow([self.untracked_root, QStandardItem()])
-        self.invisibleRootItem().appendRow([self.unmerged_root, QStandardItem()])
+        self.invisibleRootItem().appendRow([self.staged_root, QStandardItem(), QStandardItem()])
+        self.invisibleRootItem().appendRow([self.unstage_root, QStandardItem(), QStandardItem()])
+        self.invisibleRootItem().appendRow([self.untracked_root, QStandardItem(), QStandardItem()])
+        self.invisibleRootItem().appendRow([self.unmerged_root, QStandardItem(), QStandardItem()])
 
         for i in range(self.invisibleRootItem().rowCount()):
-            placeholder_item = self.invisibleRootItem().child(i, 1)
-            if placeholder_item:
-                placeholder_item.setEditable(False)
-                placeholder_item.setSelectable(False)
+            for col in (1, 2):
+                placeholder_item = self.invisibleRootItem().child(i, col)
+                if placeholder_item:
+                    placeholder_item.setEditable(False)
+                    placeholder_item.setSelectable(False)
 
 
     def clear_status(self):
@@ -170,89 +181,22 @@ class StatusTreeModel(QStandardItemModel):
 
 
                     if status_codes == '??':
-                        status_text = status_codes
-                        icon_char = '?'
-                        color = QColor("darkCyan")
-                        root = self.untracked_root
-                        if root:
-                             item_status = QStandardItem(status_text)
-                             item_path = QStandardItem(display_path)
-                             item_status.setIcon(self.STATUS_ICONS.get(icon_char, self.DEFAULT_ICON))
-                             item_status.setForeground(color)
-                             item_path.setForeground(color)
-                             item_status.setToolTip(tooltip)
-                             item_path.setToolTip(tooltip)
-                             item_path.setData(file_path_data, Qt.ItemDataRole.UserRole + 1)
-                             item_path.setData(True, Qt.ItemDataRole.UserRole + 2)
-                             item_status.setEditable(False)
-                             item_path.setEditable(False)
-                             root.appendRow([item_status, item_path])
-
+                        self._append_file_row(self.untracked_root, status_codes, display_path, file_path_data, tooltip, '?', QColor("darkCyan"))
 
                     elif status_codes[0] == 'U' or status_codes[1] == 'U' or status_codes in ('AA', 'DD'):
-                         status_text = status_codes
-                         icon_char = 'U'
-                         color = QColor('red')
-                         root = self.unmerged_root
-                         if root:
-                             item_status = QStandardItem(status_text)
-                             item_path = QStandardItem(display_path)
-                             item_status.setIcon(self.STATUS_ICONS.get(icon_char, self.DEFAULT_ICON))
-                             item_status.setForeground(color)
-                             item_path.setForeground(color)
-                             item_status.setToolTip(tooltip)
-                             item_path.setToolTip(tooltip)
-                             item_path.setData(file_path_data, Qt.ItemDataRole.UserRole + 1)
-                             item_path.setData(True, Qt.ItemDataRole.UserRole + 2)
-                             item_status.setEditable(False)
-                             item_path.setEditable(False)
-                             root.appendRow([item_status, item_path])
-
+                        self._append_file_row(self.unmerged_root, status_codes, display_path, file_path_data, tooltip, 'U', QColor('red'))
 
                     else:
                          staged_status_char = status_codes[0]
                          unstaged_status_char = status_codes[1]
 
                          if staged_status_char != ' ':
-                             status_text = status_codes
-                             icon_char = staged_status_char
-                             color = QColor("darkGreen") if icon_char in 'AC' else QColor("blue") if icon_char in 'M' else QColor("red") if icon_char in 'D' else QColor("purple")
-                             root = self.staged_root
-                             if root:
-                                 item_status = QStandardItem(status_text)
-                                 item_path = QStandardItem(display_path)
-                                 item_status.setIcon(self.STATUS_ICONS.get(icon_char, self.DEFAULT_ICON))
-                                 item_status.setForeground(color)
-                                 item_path.setForeground(color)
-                                 item_status.setToolTip(tooltip)
-                                 item_path.setToolTip(tooltip)
-                                 item_path.setData(file_path_data, Qt.ItemDataRole.UserRole + 1)
-                                 item_path.setData(True, Qt.ItemDataRole.UserRole + 2)
-                                 item_status.setEditable(False)
-                                 item_path.setEditable(False)
-                                 root.appendRow([item_status, item_path])
-
+                             self._append_file_row(self.staged_root, status_codes, display_path, file_path_data, tooltip,
+                                                   staged_status_char, _staged_color(staged_status_char))
 
                          if unstaged_status_char != ' ' and unstaged_status_char != '?':
-                             status_text = status_codes
-                             icon_char = unstaged_status_char
-                             color = QColor("blue") if icon_char in 'M' else QColor("red") if icon_char in 'D' else None
-                             root = self.unstage_root
-                             if root:
-                                 item_status = QStandardItem(status_text)
-                                 item_path = QStandardItem(display_path)
-                                 item_status.setIcon(self.STATUS_ICONS.get(icon_char, self.DEFAULT_ICON))
-                                 if color:
-                                     item_status.setForeground(color)
-                                     item_path.setForeground(color)
-
-                                 item_status.setToolTip(tooltip)
-                                 item_path.setToolTip(tooltip)
-                                 item_path.setData(file_path_data, Qt.ItemDataRole.UserRole + 1)
-                                 item_path.setData(True, Qt.ItemDataRole.UserRole + 2)
-                                 item_status.setEditable(False)
-                                 item_path.setEditable(False)
-                                 root.appendRow([item_status, item_path])
+                             self._append_file_row(self.unstage_root, status_codes, display_path, file_path_data, tooltip,
+                                                   unstaged_status_char, _unstaged_color(unstaged_status_char))
 
                 except Exception as e:
                     logging.error(f"解析或处理状态行出错: '{line}' - {e}", exc_info=True)
@@ -263,6 +207,199 @@ class StatusTreeModel(QStandardItemModel):
             self._update_root_counts()
 
 
+    def _append_file_row(self, root: Optional[QStandardItem], status_text: str, display_path: str, file_path_data: str,
+                         tooltip: str, icon_char: str, color: Optional[QColor]):
+        """向指定区段追加一行 (状态, 路径, 行数统计)"""
+        if not root:
+            return
+        item_status = QStandardItem(status_text)
+        item_path = QStandardItem(display_path)
+        item_stat = QStandardItem("")
+        item_status.setIcon(self.STATUS_ICONS.get(icon_char, self.DEFAULT_ICON))
+        if color:
+            item_status.setForeground(color)
+            item_path.setForeground(color)
+        item_status.setToolTip(tooltip)
+        item_path.setToolTip(tooltip)
+        item_path.setData(file_path_data, Qt.ItemDataRole.UserRole + 1)
+        item_path.setData(True, Qt.ItemDataRole.UserRole + 2)
+        item_stat.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        item_status.setEditable(False)
+        item_path.setEditable(False)
+        item_stat.setEditable(False)
+        root.appendRow([item_status, item_path, item_stat])
+
+
+    def apply_diffstat(self, section_type: str, stats: Dict[str, Tuple[Optional[int], Optional[int]]]):
+        """将 numstat 结果填入指定区段的 '+/-' 列，stats 为 {路径: (新增, 删除)}"""
+        root_item = self._section_root(section_type)
+        if not root_item or not stats:
+            return
+        for row in range(root_item.rowCount()):
+            path_item = root_item.child(row, 1)
+            stat_item = root_item.child(row, 2)
+            if not path_item or not stat_item:
+                continue
+            file_path = path_item.data(Qt.ItemDataRole.UserRole + 1)
+            value = stats.get(file_path)
+            if value is None:
+                continue
+            added, removed = value
+            stat_item.setText(format_diffstat(added, removed))
+            stat_item.setToolTip(f"新增 {added} 行, 删除 {removed} 行" if added is not None and removed is not None else "二进制文件")
+
+
+    def _section_root(self, section_type: str) -> Optional[QStandardItem]:
+        if section_type == STATUS_STAGED: return self.staged_root
+        if section_type == STATUS_UNSTAGED: return self.unstage_root
+        if section_type == STATUS_UNTRACKED: return self.untracked_root
+        if section_type == STATUS_UNMERGED: return self.unmerged_root
+        return None
+
+
+    def _row_index(self, root: Optional[QStandardItem]) -> Dict[str, int]:
+        """一次遍历区段，得到 文件路径 -> 行号 (批量操作中只建一次，避免每个文件线性查找)"""
+        index: Dict[str, int] = {}
+        if not root:
+            return index
+        for row in range(root.rowCount()):
+            path_item = root.child(row, 1)
+            if path_item:
+                index.setdefault(path_item.data(Qt.ItemDataRole.UserRole + 1), row)
+        return index
+
+
+    def _remove_rows(self, root: QStandardItem, rows: Iterable[int]):
+        """从后往前按连续区间删除行，整段删除只需一次 removeRows"""
+        ordered = sorted(set(rows), reverse=True)
+        position = 0
+        while position < len(ordered):
+            end = ordered[position]
+            start = end
+            position += 1
+            while position < len(ordered) and ordered[position] == start - 1:
+                start -= 1
+                position += 1
+            root.removeRows(start, end - start + 1)
+
+
+    def _take_rows(self, root: Optional[QStandardItem], file_paths: Set[str]) -> Dict[str, str]:
+        """移除指定区段中这些文件的行，返回 文件路径 -> XY 状态码 (不在区段中的文件不出现)"""
+        taken: Dict[str, str] = {}
+        if not root or not file_paths:
+            return taken
+        rows = []
+        for row in range(root.rowCount()):
+            path_item = root.child(row, 1)
+            file_path = path_item.data(Qt.ItemDataRole.UserRole + 1) if path_item else None
+            if file_path in file_paths:
+                status_item = root.child(row, 0)
+                taken.setdefault(file_path, status_item.text() if status_item else "  ")
+                rows.append(row)
+        self._remove_rows(root, rows)
+        return taken
+
+
+    def _set_row_status(self, root: QStandardItem, row: int, status_text: str, icon_char: str, color: Optional[QColor]):
+        status_item = root.child(row, 0)
+        path_item = root.child(row, 1)
+        if status_item:
+            status_item.setText(status_text)
+            status_item.setIcon(self.STATUS_ICONS.get(icon_char, self.DEFAULT_ICON))
+            if color:
+                status_item.setForeground(color)
+        if path_item and color:
+            path_item.setForeground(color)
+
+
+    def optimistic_stage(self, files: List[str]):
+        """
+        暂存操作发出后立即把文件移动到 '已暂存' 区段，无需等待 git status。
+        真实状态稍后由后台刷新校正。
+        """
+        files = list(dict.fromkeys(files))
+        wanted = set(files)
+        unstaged = self._take_rows(self.unstage_root, wanted)
+        untracked = self._take_rows(self.untracked_root, wanted)
+        unmerged = self._take_rows(self.unmerged_root, wanted)
+        staged_rows = self._row_index(self.staged_root) if unstaged else {}
+        # 已暂存区段中要移除的行在循环结束后统一删除，循环中追加的新行不影响已有行号
+        removed_staged_rows = []
+        for file_path in files:
+            unstaged_status = unstaged.get(file_path)
+            if unstaged_status is None and file_path not in untracked and file_path not in unmerged:
+                continue
+
+            if file_path in untracked:
+                staged_char = 'A'
+            elif file_path in unmerged:
+                staged_char = 'M'
+            else:
+                worktree_deleted = unstaged_status[1:2] == 'D'
+                staged_char = 'D' if worktree_deleted else 'M'
+                existing_row = staged_rows.get(file_path, -1)
+                if existing_row >= 0:
+                    existing_item = self.staged_root.child(existing_row, 0)
+                    existing_char = existing_item.text()[:1] if existing_item else 'M'
+                    if existing_char == 'A' and worktree_deleted:
+                        # 新增后又在工作区删除：暂存后文件从两侧消失
+                        removed_staged_rows.append(existing_row)
+                    else:
+                        staged_char = 'D' if worktree_deleted else existing_char
+                        self._set_row_status(self.staged_root, existing_row, f"{staged_char} ", staged_char, _staged_color(staged_char))
+                    continue
+
+            status_text = f"{staged_char} "
+            self._append_file_row(self.staged_root, status_text, file_path, file_path,
+                                  f"状态: {status_text}\n路径: {file_path}", staged_char, _staged_color(staged_char))
+        if removed_staged_rows:
+            self._remove_rows(self.staged_root, removed_staged_rows)
+        self._update_root_counts()
+
+
+    def optimistic_unstage(self, files: List[str]):
+        """撤销暂存操作发出后立即把文件移回 '未暂存' 或 '未跟踪' 区段"""
+        files = list(dict.fromkeys(files))
+        staged = self._take_rows(self.staged_root, set(files))
+        if not staged:
+            return
+        unstaged_paths = self._row_index(self.unstage_root)
+        for file_path in files:
+            staged_status = staged.get(file_path)
+            if staged_status is None or file_path in unstaged_paths:
+                continue
+            staged_char = staged_status[:1]
+            if staged_char == 'A':
+                self._append_file_row(self.untracked_root, "??", file_path, file_path,
+                                      f"状态: ??\n路径: {file_path}", '?', QColor("darkCyan"))
+            else:
+                unstaged_char = 'D' if staged_char == 'D' else 'M'
+                status_text = f" {unstaged_char}"
+                self._append_file_row(self.unstage_root, status_text, file_path, file_path,
+                                      f"状态: {status_text}\n路径: {file_path}", unstaged_char, _unstaged_color(unstaged_char))
+        self._update_root_counts()
+
+
+    def optimistic_discard(self, files: List[str]):
+        """丢弃工作区更改后立即移除 '未暂存' 区段中的对应文件"""
+        self._take_rows(self.unstage_root, set(files))
+        self._update_root_counts()
+
+
+    def is_in_head(self, file_path: str) -> bool:
+        """文件是否在 HEAD 中: 未跟踪、已暂存为新增/重命名/复制 (新路径) 以及 intent-to-add 的文件不在"""
+        if file_path in self._row_index(self.untracked_root):
+            return False
+        for root in (self.staged_root, self.unstage_root):
+            row = self._row_index(root).get(file_path)
+            status_item = root.child(row, 0) if row is not None else None
+            if status_item is not None:
+                status_text = status_item.text()
+                if status_text[:1] in ('A', 'R', 'C') or status_text[1:2] == 'A':
+                    return False
+        return True
+
+
     def _update_root_counts(self):
         """更新根节点显示的计数"""
         if self.staged_root: self.staged_root.setText(f"{STATUS_STAGED} ({self.staged_root.rowCount()})")
@@ -1,6 +1,12 @@
 # src/advanced/branch_cleanup.py
+import time
 from src.utils import clear_screen
-from src.git_utils import run_git_command
+from src.git_utils import run_git_command, parse_push_porcelain
+
+# for-each-ref 字段: 引用名、上游、上游状态 (gone 表示上游已删除)、最后提交时间、是否当前分支
+CLEANUP_FORMAT = "%(refname)%00%(upstream)%00%(upstream:track,nobracket)%00%(committerdate:unix)%00%(HEAD)"
+STALE_DAYS_DEFAULT = 90
+CATEGORY_TITLES = {"merged": "已合并", "gone": "上游已删除", "stale": "过期", "active": "活跃"}
 
 def delete_local_branch():
     """删除本地分支
@@ -65,18 +71,19 @@ def delete_local_branch():
 
 
 def delete_remote_branch():
-    """删除远程分支
-    命令: git push origin --delete <remote_branch_name>
+    """删除远程分支和标签 (可一次删除多个)
+    命令: git push --atomic --porcelain <remote> :refs/heads/<分支>... :refs/tags/<标签>...
     """
     clear_screen()
     print("=====================================================")
-    print(" [高级] 删除远程分支")
+    print(" [高级] 删除远程分支/标签")
     print("=====================================================")
     print("\n")
 
-    remote_branch = input(" 请输入要删除的远程分支名称: ")
-    if not remote_branch:
-        print("\n **错误**: 分支名称不能为空！")
+    remote_branches = input(" 请输入要删除的远程分支名称 (多个用空格分隔，可留空): ").split()
+    remote_tags = input(" 请输入要删除的远程标签名称 (多个用空格分隔，可留空): ").split()
+    if not remote_branches and not remote_tags:
+        print("\n **错误**: 分支和标签名称不能都为空！")
         input("按任意键继续...") # 保持输入在这里以暂停
         return
 
@@ -84,24 +91,171 @@ def delete_remote_branch():
     if not remote_name:
         remote_name = "origin"
 
-    print(f"\n **警告：** 你确定要删除远程仓库 '{remote_name}' 上的分支 '{remote_branch}' 吗？")
+    print(f"\n **警告：** 你确定要从远程仓库 '{remote_name}' 删除以下引用吗？")
+    for branch in remote_branches:
+        print(f"   分支 {branch}")
+    for tag in remote_tags:
+        print(f"   标签 {tag}")
+    print(" 所有删除在一次原子推送中完成：任何一个被拒绝时，所有引用都不会删除。")
     confirmation = input("  输入 'yes' 继续，输入其他任何内容取消操作： ")
     if confirmation.lower() != "yes":
         print("\n操作已取消。")
         input("按任意键继续...") # 保持输入在这里以暂停
         return
 
-    print(f"\n 正在删除远程分支 '{remote_branch}' 在 '{remote_name}' 上...")
-    return_code, stdout, stderr = run_git_command(
-        ["git", "push", remote_name, "--delete", remote_branch]
-    )
+    refspecs = [f":refs/heads/{branch}" for branch in remote_branches] + [f":refs/tags/{tag}" for tag in remote_tags]
+    print(f"\n 正在从 '{remote_name}' 删除 {len(refspecs)} 个引用...")
+    return_code, stdout, stderr = run_git_command(["git", "push", "--atomic", "--porcelain", remote_name] + refspecs)
+
+    results = parse_push_porcelain(stdout or "")
+    for flag, refname, summary in results:
+        status = "已删除" if flag == "-" else ("被拒绝" if flag == "!" else summary)
+        print(f"  {'✓' if flag != '!' else '✗'} {refname}: {status}{'  ' + summary if flag == '!' else ''}")
     if return_code != 0:
-        print(f"\n **错误**: 删除远程分支 '{remote_branch}' 失败。")
+        print("\n **错误**: 删除失败，原子推送没有删除任何引用。")
         print("\n  常见错误：")
-        print("  - 没有删除权限：确认你对该远程仓库有删除分支的权限。")
-        print("  - 远程分支不存在：确认远程分支名称是否正确。")
+        print("  - 没有删除权限或引用受保护：确认你对该远程仓库有删除分支/标签的权限。")
         print("  - 网络问题：确认网络连接正常。")
+        print("  - 远程仓库不支持原子推送：请逐个删除。")
     else:
-        print(f"\n 远程分支 '{remote_branch}' 在 '{remote_name}' 上已成功删除。")
+        print(f"\n 已从 '{remote_name}' 删除 {len(results)} 个引用。")
+
+    input("\n按任意键继续...")
+
+def _list_local_branches():
+    """一次列出全部本地分支: [(名称, 上游, 上游已删除, 最后提交时间, 是否当前)]，失败返回 None"""
+    return_code, stdout, stderr = run_git_command(["git", "for-each-ref", f"--format={CLEANUP_FORMAT}", "refs/heads"])
+    if return_code != 0:
+        return None
+    branches = []
+    for line in stdout.splitlines():
+        fields = line.split("\0")
+        if len(fields) < 5:
+            continue
+        refname, upstream, track, date, head = fields[:5]
+        branches.append((refname[len("refs/heads/"):], upstream, track == "gone", int(date) if date.isdigit() else 0, head == "*"))
+    return branches
+
+
+def _parse_selection(text, count):
+    """解析 "1,3-5" 形式的编号，返回 0 起始的下标集合；格式错误返回 None"""
+    selected = set()
+    for part in text.replace("，", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        if not start.strip().isdigit() or (end and not end.strip().isdigit()):
+            return None
+        first, last = int(start), int(end) if end else int(start)
+        if not 1 <= first <= last <= count:
+            return None
+        selected.update(range(first - 1, last))
+    return selected
+
+
+def cleanup_stale_branches():
+    """清理本地分支
+    分类: git for-each-ref refs/heads (上游状态 [gone]、最后提交时间) 和 git for-each-ref --merged=<基准>
+    删除: git branch -d <分支1> <分支2> ... (一次删除所有选中的分支)
+    """
+    clear_screen()
+    print("=====================================================")
+    print(" [高级] 清理本地分支 (已合并 / 上游已删除 / 过期)")
+    print("=====================================================")
+    print("\n")
+
+    _, current_stdout, _ = run_git_command(["git", "branch", "--show-current"])
+    current_branch = current_stdout.strip()
+    base_branch = input(f" 请输入基准分支 (已合并到它的分支可删除，默认为 {current_branch or 'HEAD'}): ").strip() or current_branch or "HEAD"
+    if base_branch.startswith("-"):
+        print("\n **错误**: 分支名不能以 '-' 开头。")
+        input("按任意键继续...")
+        return
+    stale_input = input(f" 最后提交超过多少天算过期 (默认为 {STALE_DAYS_DEFAULT}): ").strip()
+    stale_days = int(stale_input) if stale_input.isdigit() else STALE_DAYS_DEFAULT
+
+    print("\n 正在分析本地分支...")
+    branches = _list_local_branches()
+    if branches is None:
+        print("\n **错误**: 获取本地分支列表失败。")
+        input("按任意键继续...")
+        return
+    return_code, merged_stdout, _ = run_git_command(["git", "for-each-ref", f"--merged={base_branch}", "--format=%(refname)", "refs/heads"])
+    if return_code != 0:
+        print(f"\n **错误**: 无法确定已合并到 '{base_branch}' 的分支，请检查基准分支名称。")
+        input("按任意键继续...")
+        return
+    merged = {line[len("refs/heads/"):] for line in merged_stdout.splitlines() if line.startswith("refs/heads/")}
+
+    # 分类优先级: 已合并 > 上游已删除 > 过期 > 活跃；当前分支和基准分支不参与
+    now = time.time()
+    candidates = []
+    for name, upstream, gone, committer_time, is_current in branches:
+        if is_current or name == base_branch:
+            continue
+        age_days = int((now - committer_time) // 86400) if committer_time else 0
+        if name in merged:
+            category = "merged"
+        elif gone:
+            category = "gone"
+        elif committer_time and age_days >= stale_days:
+            category = "stale"
+        else:
+            category = "active"
+        candidates.append((category, name, age_days, upstream))
+    order = list(CATEGORY_TITLES)
+    candidates.sort(key=lambda candidate: (order.index(candidate[0]), -candidate[2]))
+
+    if not candidates:
+        print("\n 除当前分支和基准分支外没有其他本地分支。")
+        input("按任意键继续...")
+        return
+
+    print(f"\n 本地分支 (基准 {base_branch}):")
+    for number, (category, name, age_days, upstream) in enumerate(candidates, 1):
+        upstream_text = f"  上游: {upstream[len('refs/remotes/'):]}" if upstream.startswith("refs/remotes/") else ""
+        print(f" [{number:>3}] {CATEGORY_TITLES[category]:<6} {name}  ({age_days} 天前){upstream_text}")
+
+    print("\n 输入要删除的分支编号 (如 1,3-5)，或 m = 全部已合并，g = 全部上游已删除，s = 全部过期。")
+    choice = input(" 请选择 (直接回车取消): ").strip().lower()
+    shortcuts = {"m": "merged", "g": "gone", "s": "stale"}
+    if not choice:
+        print("\n操作已取消。")
+        input("按任意键继续...")
+        return
+    if choice in shortcuts:
+        selected = [name for category, name, _, _ in candidates if category == shortcuts[choice]]
+    else:
+        indexes = _parse_selection(choice, len(candidates))
+        if indexes is None:
+            print("\n **错误**: 无效的编号。")
+            input("按任意键继续...")
+            return
+        selected = [candidates[index][1] for index in sorted(indexes)]
+    if not selected:
+        print("\n 没有选中任何分支。")
+        input("按任意键继续...")
+        return
+
+    print(f"\n 将删除 {len(selected)} 个本地分支: {', '.join(selected)}")
+    force_delete = input(" 未合并分支是否强制删除 (-D)? (yes/no, 默认为 no): ")
+    confirmation = input("  输入 'yes' 确认删除，输入其他任何内容取消操作： ")
+    if confirmation.lower() != "yes":
+        print("\n操作已取消。")
+        input("按任意键继续...")
+        return
+
+    # 一条命令删除全部选中的分支；能删除的都会删除，其余的由 git 逐个报错
+    command = ["git", "branch", "-D" if force_delete.lower() == "yes" else "-d", "--"] + selected
+    run_git_command(command)
+
+    remaining = {branch[0] for branch in (_list_local_branches() or [])}
+    failed = [name for name in selected if name in remaining]
+    print(f"\n 已删除 {len(selected) - len(failed)} 个分支。")
+    if failed:
+        print(f" **警告**: 以下分支未删除: {', '.join(failed)}")
+        if force_delete.lower() != "yes":
+            print(" **提示**: 未合并的分支需要使用强制删除选项 (-D)。")
 
-    input("\n按任意键继续...")
\ No newline at end of file
+    input("\n按任意键继续...")
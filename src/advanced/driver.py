@@ -6,7 +6,7 @@ from .stash_ops import manage_stash
 from .cherry_pick_ops import cherry_pick_commit
 from .tag_ops import manage_tags
 from .remote_ops import manage_remotes
-from .branch_cleanup import delete_local_branch, delete_remote_branch
+from .branch_cleanup import delete_local_branch, delete_remote_branch, cleanup_stale_branches
 from .pr_ops import create_pull_request
 from .dangerous_ops import clean_commits
 
@@ -25,14 +25,15 @@ def advanced_menu():
     print(" [14] 管理标签            (git tag)")
     print(" [15] 管理远程仓库        (git remote add/remove/rename)") # 将添加远程仓库等合并到此
     print(" [16] 删除本地分支        (git branch -d)")
-    print(" [17] 删除远程分支        (git push --delete)")
+    print(" [17] 删除远程分支/标签   (git push --atomic, 可一次删除多个)")
     print(" [18] 创建 Pull Request    (生成 URL 手动创建)")
     print(" [19] 清理 Commits (极其危险!)  (git reset --hard)")
+    print(" [20] 清理本地分支        (已合并/上游已删除/过期，git branch -d)")
     print("\n [0]  返回主菜单") # 返回主菜单的选项
     while True:
-        # 只允许选择 10-19 和 0
-        choice = input(" 请选择 (0, 10-19): ")
-        if choice == "0" or (choice.isdigit() and 10 <= int(choice) <= 19):
+        # 只允许选择 10-20 和 0
+        choice = input(" 请选择 (0, 10-20): ")
+        if choice == "0" or (choice.isdigit() and 10 <= int(choice) <= 20):
             return choice
         else:
             print("\n **错误**: 无效的选择，请重新选择.")
@@ -66,4 +67,6 @@ def run_advanced_menu():
             create_pull_request()
         elif choice == "19":
             clean_commits()
+        elif choice == "20":
+            cleanup_stale_branches()
         # 无效选择的 'else' 情况由 advanced_menu() 循环本身处理
\ No newline at end of file
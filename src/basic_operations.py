@@ -107,17 +107,86 @@ def show_diff():
             input("\n按任意键继续...")
             return
         commit2 = input(" 请输入第二个提交哈希或分支名 (默认为当前 HEAD): ")
-        if not commit2:
-            command.extend([commit1, "HEAD"])
-        else:
-            command.extend([commit1, commit2])
+        # 先列出文件，再按编号逐个查看差异，避免一次输出全部差异
+        _compare_refs(commit1, commit2 or "HEAD")
+        return
     else:
         print("\n **错误**: 无效的选择！ 操作已取消。")
         input("\n按任意键继续...")
         return
 
     print("\n 正在获取文件差异...")
-    # Diff 输出也可能很长，使用 Popen
+    _stream_command(command)
+    input("\n按任意键继续...")
+
+
+# 比较的文件列表缓存: {(合并基础, 比较端): [(状态, 路径, 旧路径)]}，同一次运行中重复比较时不再重新列出
+_compare_file_cache = {}
+
+
+def _parse_name_status_z(output):
+    """解析 'git diff --name-status -z' 的输出为 [(状态, 路径, 旧路径或 None)]"""
+    tokens = output.split('\0')
+    files = []
+    i = 0
+    while i + 1 < len(tokens) and tokens[i]:
+        status = tokens[i]
+        if status[:1] in ('R', 'C') and i + 2 < len(tokens):
+            files.append((status, tokens[i + 2], tokens[i + 1]))
+            i += 3
+        else:
+            files.append((status, tokens[i + 1], None))
+            i += 2
+    return files
+
+
+def _compare_refs(base_ref, tip_ref):
+    """比较 base_ref...tip_ref: 列出合并基础到 tip_ref 之间改动的文件 (检测重命名)，再按编号查看单个文件的差异"""
+    print("\n 正在查找合并基础...")
+    return_code, stdout, _ = run_git_command(["git", "rev-parse", f"{tip_ref}^{{commit}}"])
+    if return_code != 0:
+        input("\n按任意键继续...")
+        return
+    tip = stdout.strip()
+    return_code, stdout, _ = run_git_command(["git", "merge-base", base_ref, tip])
+    if return_code != 0 or not stdout.strip():
+        print(f"\n **错误**: 找不到 '{base_ref}' 和 '{tip_ref}' 的合并基础 (没有共同祖先?)。")
+        input("\n按任意键继续...")
+        return
+    base = stdout.strip()
+
+    files = _compare_file_cache.get((base, tip))
+    if files is None:
+        return_code, stdout, _ = run_git_command(["git", "diff", "--name-status", "-z", "-M", base, tip])
+        if return_code != 0:
+            input("\n按任意键继续...")
+            return
+        files = _parse_name_status_z(stdout)
+        _compare_file_cache[(base, tip)] = files
+    if not files:
+        print(f"\n '{base_ref}...{tip_ref}' 之间没有差异。")
+        input("\n按任意键继续...")
+        return
+
+    while True:
+        print(f"\n {base_ref}...{tip_ref} (合并基础 {base[:7]})，共 {len(files)} 个文件:")
+        for index, (status, path, old_path) in enumerate(files, 1):
+            print(f" [{index:>3}] {status:<5} {f'{old_path} -> {path}' if old_path else path}")
+        choice = input("\n 输入文件编号查看差异 (直接回车返回): ").strip()
+        if not choice:
+            return
+        if not choice.isdigit() or not 1 <= int(choice) <= len(files):
+            print("\n **错误**: 无效的文件编号！")
+            continue
+        status, path, old_path = files[int(choice) - 1]
+        # 重命名/复制需要同时给出旧路径，git 才能检测到
+        paths = [old_path, path] if old_path else [path]
+        _stream_command(["git", "diff", "-M", base, tip, "--"] + paths)
+        input("\n按任意键返回文件列表...")
+
+
+def _stream_command(command):
+    """运行命令并逐行打印输出 (差异输出可能很长)"""
     import subprocess # 需要导入 subprocess 用于 Popen
     try:
         process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8")
@@ -145,9 +214,6 @@ def show_diff():
          print(f"\n **错误**: 执行命令时发生未知错误: {e}")
 
 
-    input("\n按任意键继续...")
-
-
 def add_changes():
     """添加修改
     命令: git add .  (添加所有文件)
@@ -43,4 +43,20 @@ def run_git_command(command_list, cwd=None):
     except Exception as e:
         # 捕获其他可能的异常
         print(f"\n **错误**: 执行命令时发生未知错误: {e}")
-        return 1, "", str(e) # 返回一个非零状态码表示失败
\ No newline at end of file
+        return 1, "", str(e) # 返回一个非零状态码表示失败
+
+
+def parse_push_porcelain(output):
+    """
+    解析 'git push --porcelain' 的标准输出。
+    返回 [(标志, 远程引用, 摘要)]，标志 '!' 表示被拒绝，'-' 表示已删除 (其余见 git push 文档)。
+    """
+    results = []
+    for line in output.splitlines():
+        if len(line) < 2 or line[1] != "\t":
+            continue
+        fields = line[2:].split("\t")
+        if len(fields) < 2:
+            continue
+        results.append((line[0], fields[0].rpartition(":")[2], fields[1]))
+    return results